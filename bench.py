@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite of the engines without plots: Euler method (pycodyn), trapezoidal rule (trapComponents)
+and DAE (pycodynDAE) on the models of main scripts and on synthetic N-section strings (see rodString.py).
+Each case runs in a new process (cold SymPy caches, the cache of compiled models is disabled) and reports
+times (s) of symbolic build, compilation, code generation, compilation and solution of the static problem
+and simulation, steps per second, residual calls per second and peak memory (RSS, MB).
+Usage:
+    python bench.py [-o results.json] [-s 2,10,100] [-c main2]
+    python bench.py --compare old.json new.json
+    python bench.py --events 2 # steps and residual calls per period of the 2-section string without and with state events
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import sys, io, time, json, math, platform, subprocess, contextlib, argparse
+import multiprocessing
+import profiling
+
+scripts=[('euler','main1.py'), ('euler','main2s.py'), ('euler','main2.py'), ('euler','main2V.py'),
+         ('trapezoidal','main1T.py'), ('dae','main1DAE.py'), ('dae','main2sDAE.py'), ('dae','main2DAE.py')]
+sizes=[2, 5, 10, 20, 50, 100, 200, 500] # numbers of sections of strings
+daeMax=100 # max number of sections of strings for DAE
+calls=20000 # number of residual calls for residual calls per second
+fr=-18499.0 # liquid weight above the plunger
+freq=6.4/60 # frequency of the upper point
+keys=['build','compile','codegen','staticCompile','static','simulation','steps/s','residual/s','memory'] # compared metrics
+
+class Profile(profiling.Profile):
+    """Profile, which also saves the end time of each record (for compilation inside the simulation)"""
+    def __init__(self):
+        profiling.Profile.__init__(self)
+        self.records=[] # (name, end time, time)
+    def add(self, name, dt, n=1):
+        profiling.Profile.add(self, name, dt, n)
+        self.records.append((name, time.time(), dt))
+
+def inside(p, name, outer):
+    """returns time of records name inside of records outer of profile p"""
+    spans=[(end-dt, end) for n,end,dt in p.records if n==outer]
+    return sum([dt for n,end,dt in p.records if n==name and any([a<=end-dt and end<=b for a,b in spans])])
+
+def assimulo():
+    try: import assimulo.solvers
+    except ImportError: return False
+    return True
+
+def memory():
+    """returns peak resident memory of the process (MB) or None"""
+    try: import resource
+    except ImportError: return None # Windows
+    m=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return m/2.0**20 if sys.platform=='darwin' else m/2.0**10
+
+def throughput(f, n, *args):
+    """returns the number of calls f(*args) per second"""
+    f(*args) # warm-up
+    start=time.time()
+    for i in range(n): f(*args)
+    return n/(time.time()-start)
+
+def metrics(p, build, total):
+    """returns metrics of the case from profile p, time of build and total time"""
+    ph=lambda k: p.phases.get(k, [0, 0.0])
+    r=dict(build=build, total=total, memory=memory(), phases=p.report()['phases'])
+    r['compile']=ph('createCurEqs')[1]+ph('createResidual')[1]
+    r['codegen']=ph('lambdify')[1]+ph('residualSource')[1]+ph('createJacobian')[1]+ph('kernelSource')[1]
+    r['staticCompile']=ph('static compile')[1]
+    r['static']=ph('static solve')[1]
+    r['simulation']=ph('simulation')[1]-inside(p, 'createCurEqs', 'simulation') # without compilation
+    if ph('step')[0]: # Euler method, trapezoidal rule
+        r['steps']=ph('step')[0]
+    elif 'IDA' in p.stats: # DAE
+        r['steps']=p.stats['IDA'].get('nsteps')
+    if r.get('steps') and r['simulation']: r['steps/s']=r['steps']/r['simulation']
+    return r
+
+def script(engine, name):
+    """runs the main script name (without plots) and returns metrics
+    The script is divided into the build of the model (before the static solve) and the rest."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.show=lambda *args, **kw: None
+    src=open(name,'rb').read().decode('utf-8').replace('\r\n','\n').split('\n')
+    i=[n for n,l in enumerate(src) if 's.solve(' in l][0] # static problem
+    j=len(src)
+    if engine=='dae' and not assimulo(): # only the residual
+        j=[n for n,l in enumerate(src) if '.solveDAE(' in l][0]
+    g={'__name__':'bench'}
+    with contextlib.redirect_stdout(io.StringIO()), Profile() as p:
+        start=time.time()
+        exec(compile('\n'.join(src[:i]), name, 'exec'), g)
+        build=time.time()-start
+        exec(compile('\n'*i+'\n'.join(src[i:j]), name, 'exec'), g)
+        if engine=='dae' and j<len(src): g['s'].createResidual(g['s'].applyBC(g['s'].eqs, g['bc']))
+        total=time.time()-start
+    r=metrics(p, build, total)
+    s=g['s']
+    if engine=='dae': r.update({'unknowns':len(s.y), 'residual/s':residualCalls(s, g['state'])})
+    else: r.update(unknowns=len(s.vrsc))
+    return r
+
+def residualCalls(s, state):
+    """returns residual calls per second of DAE system s at state"""
+    import numpy as np
+    y=np.array([float(state.get(v, 0.0)) for v in s.y])
+    yd=np.array([float(state.get(v, 0.0)) for v in s.yd]+[0.0]*(len(s.y)-len(s.yd)))
+    return throughput(s.residual, calls, 0.0, y, yd)
+
+def sections(n):
+    """returns n sections of the string (the same string for any n)"""
+    return [(1e5*n, 5e3*n, 4000.0/n, -35000.0/n)]*n # stiffness, damping, mass, weight
+
+def string(engine, n):
+    """simulates the n-section string by Euler method or trapezoidal rule and returns metrics"""
+    import rodString, trapComponents
+    class TrapString(rodString.RodString):
+        Mass, SpringDamper = trapComponents.Mass, trapComponents.SpringDamper
+    cls=TrapString if engine=='trapezoidal' else rodString.RodString
+    with Profile() as p:
+        start=time.time()
+        s=cls(sections(n))
+        build=time.time()-start
+        d=s.solve(s.staticICs(fr))
+        def fnBC(d, t):
+            return {s.top: 1.05*math.sin(2*math.pi*6.4/60*t), s.plunger: fr if d[s.masses[-1].v]>0 else 0.0}
+        fnBC.vrs=s.top, s.plunger
+        T,R=s.solveDyn(d, 2*60/6.4, fnBC)
+        total=time.time()-start
+    r=metrics(p, build, total)
+    r.update(unknowns=len(s.vrsc), solver=type(s.lin.lu).__name__ if s.lin else None)
+    return r
+
+def daeSystem(n):
+    """returns DAE System of the n-section string, its springs, masses and the force of the plunger"""
+    import pycodynDAE as dae
+    ss=[dae.SpringDamper(name='s%d'%(i+1), c=c, d=d) for i,(c,d,m,w) in enumerate(sections(n))]
+    ms=[dae.Mass(name='m%d'%(i+1), m=m) for i,(c,d,m,w) in enumerate(sections(n))]
+    fs=[dae.Force(name='f%d'%(i+1), f=w) for i,(c,d,m,w) in enumerate(sections(n))]
+    fp=dae.Force(name='fp')
+    peqs=[]
+    for i in range(n):
+        peqs+=ss[i].pinEqs(1,[ms[i].pins[0]])
+        peqs+=ms[i].pinEqs(1,[(ss[i+1] if i+1<n else fp).pins[0], fs[i].pins[0]])
+    return dae.System(els=ss+ms+fs+[fp], eqs=peqs), ss, ms, fp
+
+def staticState(s, ss, ms, fp):
+    """returns the state of the string under the maximum static loads"""
+    ics={ss[0].x1:0.0, ss[0].Dx1:0.0, fp.f:fr}
+    for e in ms: ics.update({e.v:0.0, e.a:0.0})
+    for e in ss: ics.update({e.Dx1:0.0, e.Dx2:0.0})
+    state=s.solve(s.eqs, ics)
+    state.update(ics)
+    return state
+
+def daeString(n):
+    """simulates the n-section string by DAE (only the residual without Assimulo) and returns metrics"""
+    import pycodynDAE as dae
+    from sympy import sin, pi
+    with Profile() as p:
+        start=time.time()
+        s,ss,ms,fp=daeSystem(n)
+        build=time.time()-start
+        state=staticState(s, ss, ms, fp)
+        x1=1.05*sin(2*pi*6.4/60*dae.t)
+        eq=s.eqs.xreplace({ss[0].x1:x1, ss[0].Dx1:x1.diff(dae.t), fp.f:fr})
+        if assimulo(): s.solveDAE(eq, state, 2*60/6.4)
+        else: s.createResidual(eq)
+        total=time.time()-start
+    r=metrics(p, build, total)
+    r.update({'unknowns':len(s.y), 'residual/s':residualCalls(s, state)})
+    return r
+
+def pumping(n=2, events=True):
+    """solves DAE of the n-section string, which pumps the liquid during 2 periods:
+    the plunger is loaded by the liquid only at its upward motion (Piecewise of its velocity)
+    events - switching of Piecewise by state events (see pycodynDAE.System.events)
+    returns T, Y, Yd"""
+    import pycodynDAE as dae
+    from sympy import sin, pi, tanh, Abs, Piecewise
+    s,ss,ms,fp=daeSystem(n)
+    state=staticState(s, ss, ms, fp)
+    v=ms[-1].v
+    bc={ss[0].x1: 1.05*sin(2*pi*freq*dae.t), fp.f: Piecewise((0.0, v<0), (fr*tanh(Abs(v)/0.01), v>=0))}
+    return s.solveDAE(s.eqs, state, 2/freq, bc=bc, events=events)
+
+def events(n=2):
+    """solves DAE of the n-section string (see pumping) without and with state events of Piecewise
+    returns list of steps, residual calls, Jacobian calls and events per period of both"""
+    res=[]
+    for ev in (False, True):
+        with Profile() as p:
+            T,Y,Yd=pumping(n, events=ev)
+        periods=T[-1]*freq
+        ph=lambda k: p.phases.get(k, [0, 0.0])
+        res.append(dict(events=ev, steps=p.stats['IDA'].get('nsteps')/periods, residual=ph('residual')[0]/periods,
+                        jacobian=ph('jacobian')[0]/periods, switches=p.stats.get('events', 0)/periods,
+                        simulation=ph('simulation')[1]))
+    return res
+
+def run(case):
+    """runs case (engine, model, n) in this process and returns its record"""
+    import cache
+    cache.enabled=False # cold compilation
+    engine,model,n=case
+    r=dict(engine=engine, model=model, n=n)
+    try:
+        if model=='string': r.update(daeString(n) if engine=='dae' else string(engine, n))
+        else: r.update(script(engine, model))
+    except Exception as e:
+        r['error']='%s: %s'%(type(e).__name__, e)
+    return r
+
+def cases(sz=sizes, only=None):
+    """returns list of cases (engine, model, n), only - substring of names of models"""
+    L=[(e,m,None) for e,m in scripts]
+    L+=[(e,'string',n) for e in ('euler','trapezoidal','dae') for n in sz if e!='dae' or n<=daeMax]
+    return [c for c in L if not only or only in c[1]]
+
+def info():
+    """returns description of the environment"""
+    import numpy, sympy, scipy
+    try: commit=subprocess.check_output(['git','rev-parse','HEAD'], stderr=subprocess.STDOUT).decode().strip()
+    except Exception: commit=None
+    return dict(python=platform.python_version(), platform=platform.platform(), numpy=numpy.__version__,
+                sympy=sympy.__version__, scipy=scipy.__version__, assimulo=assimulo(), commit=commit,
+                date=time.strftime('%Y-%m-%d %H:%M:%S'))
+
+def bench(path=None, sz=sizes, only=None):
+    """runs cases, each in a new process, and saves results to JSON file path
+    returns results"""
+    ctx=multiprocessing.get_context('spawn')
+    res=dict(info=info(), cases=[])
+    for c in cases(sz, only):
+        with ctx.Pool(1) as pool: r=pool.apply(run, (c,))
+        res['cases'].append(r)
+        print('%-12s %-12s %5s %s'%(c[0], c[1], c[2] or '', r.get('error') or
+              ' '.join(['%s=%.4g'%(k,r[k]) for k in keys if r.get(k) is not None])))
+        if path:
+            with open(path,'w') as f: json.dump(res, f, indent=1, sort_keys=True)
+    return res
+
+def compare(old, new):
+    """prints ratios new/old of metrics of the same cases of JSON files old and new"""
+    o,n=[json.load(open(f)) for f in (old,new)]
+    od=dict([((c['engine'],c['model'],c['n']),c) for c in o['cases']])
+    print('%-12s %-12s %5s '%('engine','model','n')+' '.join(['%10s'%k for k in keys]))
+    for c in n['cases']:
+        a=od.get((c['engine'],c['model'],c['n']))
+        if a is None: continue
+        r=[c[k]/a[k] if a.get(k) and c.get(k) is not None else None for k in keys]
+        print('%-12s %-12s %5s '%(c['engine'], c['model'], c['n'] or '')+' '.join([' '*10 if x is None else '%10.3f'%x for x in r]))
+
+if __name__=='__main__':
+    ap=argparse.ArgumentParser(description='Benchmark suite of pycodyn engines')
+    ap.add_argument('-o', '--output', default='bench.json', help='JSON file of results')
+    ap.add_argument('-s', '--sizes', help='numbers of sections of strings, e.g. 2,10,100')
+    ap.add_argument('-c', '--cases', help='only models, which names contain this string')
+    ap.add_argument('--compare', nargs=2, metavar=('OLD','NEW'), help='compare two JSON files')
+    ap.add_argument('--events', type=int, metavar='N', help='steps and residual calls per period of DAE of N-section string without and with state events')
+    a=ap.parse_args()
+    if a.compare: compare(*a.compare)
+    elif a.events is not None:
+        r=events(a.events)
+        for x in r: print('events=%-5s steps=%.1f residual=%.1f jacobian=%.1f switches=%.1f simulation=%.3g'
+                          %(x['events'], x['steps'], x['residual'], x['jacobian'], x['switches'], x['simulation']))
+        print('saved per period: steps=%.1f residual=%.1f'%(r[0]['steps']-r[1]['steps'], r[0]['residual']-r[1]['residual']))
+    else: bench(a.output, [int(i) for i in a.sizes.split(',')] if a.sizes else sizes, a.cases)
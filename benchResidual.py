@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of the residual calls of the main2DAE model (calls per second):
+lambdified residual (before) and generated in-place residual (Python and Numba).
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import os, sys, time
+import numpy as np
+from pycodynDAE import *
+
+def model():
+    """returns System, equations and initial state of main2DAE.py (without the simulation)"""
+    src=open(os.path.join(os.path.dirname(os.path.abspath(__file__)),'main2DAE.py'),'rb').read().decode('utf-8')
+    src=src[:src.index('T,Y,Yd=s.solveDAE')].replace('prnt(s.eqs)','')
+    g={'__name__':'model'}
+    exec(src, g)
+    s=g['s']
+    return s, s.applyBC(s.eqs, g['bc']), g['state']
+
+def throughput(f, t, y, yd, n):
+    """returns the number of calls f(t, y, yd) per second"""
+    f(t, y, yd) # warm-up (Numba compilation)
+    start=time.time()
+    for i in range(n): f(t, y, yd)
+    return n/(time.time()-start)
+
+def lambdified(s, eq):
+    """returns the residual of the previous versions (lambdify and argument splat)
+    of equations eq with eliminated aliases (as the generated residual)"""
+    eq=s.aliases(eq)[0]
+    f=lambdify([t]+s.y+s.yd, [e.rhs-e.lhs for e in eq], 'numpy')
+    nv=len(s.y+s.yd)+1
+    def residual(t, y, yd):
+        yyd=np.concatenate([[t],y,yd])[:nv]
+        return np.array(f(*yyd))
+    return residual
+
+if __name__=='__main__':
+    n=int(sys.argv[1]) if len(sys.argv)>1 else 100000
+    s,eq,state=model()
+    s.createResidual(eq, jac=None)
+    y=np.array([float(state[i]) for i in s.y])
+    yd=np.array([float(state[i]) for i in s.yd]+[0.0]*(len(s.y)-len(s.yd)))
+    old=lambdified(s, eq)
+    print('max difference', np.abs(old(1.0, y, yd)-s.residual(1.0, y, yd)).max())
+    print('lambdify %12.0f calls/s'%throughput(old, 1.0, y, yd, n))
+    print('in-place %12.0f calls/s'%throughput(s.residual, 1.0, y, yd, n))
+    s.createResidual(eq, jac=None, jit=True)
+    print('numba    %12.0f calls/s'%throughput(s.residual, 1.0, y, yd, n))
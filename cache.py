@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache of compiled models.
+Entries are keyed by the hash of the canonical form of equations, the BC variables,
+the integration scheme and the source code of the component modules,
+so they are invalidated automatically when the components change.
+Environment variable PYCODYN_CACHE sets the cache folder (0 - disable the cache).
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import os, sys, hashlib, pickle, inspect
+from collections import OrderedDict
+import sympy
+
+path=os.environ.get('PYCODYN_CACHE', os.path.join(os.path.expanduser('~'),'.cache','pycodyn')) # cache folder
+enabled=path!='0' # use the cache
+maxSize=64*2**20 # max size of the cache folder in bytes
+memorySize=16 # max number of entries (and of functions) held by this process
+memory=OrderedDict() # entries loaded by this process (least recently used first)
+functions=OrderedDict() # functions created by lambdaFunction (least recently used first)
+hashes={} # source hashes by source files (the sources are constant in the process)
+
+def sourceHash(objs):
+    """returns hash of source files of modules where classes of objects objs are defined
+    (and of the modules of the solver and of the symbolic phase)"""
+    files=set([os.path.abspath(__file__)])
+    for o in objs:
+        for c in type(o).__mro__:
+            m=sys.modules.get(c.__module__)
+            if getattr(m,'__file__',None): files.add(os.path.abspath(m.__file__))
+    for m in ('pycodyn','pycodynDAE','codegen','structure','eliminate','discretize','statics'):
+        if getattr(sys.modules.get(m),'__file__',None): files.add(os.path.abspath(sys.modules[m].__file__))
+    files=tuple(sorted(files))
+    if files not in hashes: # read the files once per process
+        h=hashlib.sha1()
+        for f in files:
+            f=f[:-1] if f.endswith('.pyc') else f
+            if os.path.exists(f):
+                with open(f,'rb') as fl: h.update(fl.read())
+        hashes[files]=h.hexdigest()
+    return hashes[files]
+
+def key(eqs, *parts):
+    """returns key of equations eqs (canonical form) and other parts (strings, symbols)"""
+    h=hashlib.sha1()
+    h.update(sympy.__version__.encode())
+    for e in sorted([sympy.srepr(e) for e in eqs]):
+        h.update(e.encode())
+    for p in parts:
+        h.update(repr(p).encode())
+    return h.hexdigest()
+
+def remember(d, k, v):
+    """puts v by key k to the end of dict d (entries or functions) and evicts its least recently used items
+    returns v"""
+    d.pop(k, None)
+    d[k]=v
+    while len(d)>memorySize: d.pop(next(iter(d)))
+    return v
+
+def load(k):
+    """returns the entry by key k or None"""
+    if not enabled: return None
+    if k in memory: return remember(memory, k, memory[k])
+    f=os.path.join(path, k+'.pkl')
+    try:
+        with open(f,'rb') as fl: obj=pickle.load(fl)
+        os.utime(f, None) # for eviction of least recently used
+        return remember(memory, k, obj)
+    except Exception: # no entry or broken entry
+        return None
+
+def save(k, obj):
+    """saves the entry obj (picklable) by key k and evicts old entries"""
+    if not enabled: return
+    remember(memory, k, obj)
+    try:
+        if not os.path.isdir(path): os.makedirs(path)
+        f=os.path.join(path, k+'.pkl')
+        with open(f+'.tmp','wb') as fl: pickle.dump(obj, fl, 2)
+        getattr(os,'replace',os.rename)(f+'.tmp', f)
+        evict()
+    except (IOError, OSError): # read-only or concurrent access
+        pass
+
+def evict():
+    """removes least recently used entries while the cache is larger than maxSize"""
+    files=[os.path.join(path,f) for f in os.listdir(path) if f.endswith('.pkl')]
+    files=[(os.path.getmtime(f),os.path.getsize(f),f) for f in files]
+    size=sum([s for m,s,f in files])
+    for m,s,f in sorted(files):
+        if size<=maxSize: break
+        os.remove(f)
+        size-=s
+
+def clear():
+    """removes all entries"""
+    if os.path.isdir(path):
+        for f in os.listdir(path):
+            if f.endswith('.pkl'): os.remove(os.path.join(path,f))
+    forget()
+
+def forget():
+    """removes entries and functions held by this process (the files stay)"""
+    memory.clear()
+    functions.clear()
+
+def lambdaSource(f):
+    """returns source code of the function created by sympy.lambdify"""
+    return inspect.getsource(f)
+
+def lambdaFunction(src):
+    """returns the function from source code created by lambdaSource (without SymPy)"""
+    if src in functions: return remember(functions, src, functions[src])
+    ns=dict(sympy.lambdify([], 0, 'numpy').__globals__) # numpy namespace of lambdify
+    exec(src, ns)
+    name=src.split('def ',1)[1].split('(',1)[0]
+    return remember(functions, src, ns[name])
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Generation of Python source code of numerical kernels from SymPy expressions.
+Generated functions use only math and numpy and can be compiled by Numba (if installed).
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import math
+import numpy as np
+from sympy import Symbol, Function, Pow, cse, numbered_symbols
+from sympy.printing.pycode import PythonCodePrinter
+try: from sympy.printing.numpy import NumPyPrinter # SymPy>=1.7
+except ImportError: from sympy.printing.pycode import NumPyPrinter
+
+def printSymbol(self, s): # symbol by name of local variable (without rebuilding of expression)
+    if s in self.names: return self.names[s]
+    return PythonCodePrinter._print_Symbol(self, s)
+
+class Call(Function):
+    """Call of the global function of the generated module by the name of the class
+    (e.g. the numerical solution of the linear block, see pycodyn.linBlock)"""
+
+def printCall(self, e):
+    return '%s(%s)'%(type(e).__name__, ', '.join([self._print(a) for a in e.args]))
+
+def printIndexed(self, e): # item of the array (e.g. the result of Call)
+    return '%s[%s]'%(self._print(e.base.label), ', '.join([self._print(i) for i in e.indices]))
+
+def printFloat(self, f): # all digits of the double (15 digits by default)
+    if f._prec<=53: return repr(float(f))
+    return PythonCodePrinter._print_Float(self, f)
+
+class Printer(PythonCodePrinter):
+    names={} # symbol:code name
+    _print_Symbol=_print_Dummy=printSymbol
+    _print_Float=printFloat
+    _print_Indexed=printIndexed
+    def _print_Function(self, e):
+        return printCall(self, e) if isinstance(e, Call) else PythonCodePrinter._print_Function(self, e)
+
+class NpPrinter(NumPyPrinter):
+    names={}
+    _print_Symbol=_print_Dummy=printSymbol
+    _print_Float=printFloat
+    _print_Indexed=printIndexed
+    def _print_Function(self, e):
+        return printCall(self, e) if isinstance(e, Call) else NumPyPrinter._print_Function(self, e)
+
+printer=Printer({'fully_qualified_modules':True}) # math.sin, math.tanh, ...
+npPrinter=NpPrinter({'fully_qualified_modules':True}) # numpy.sin, ... (for arrays)
+
+def code(expr, names, printer=printer):
+    """returns Python code of expression expr
+    names - dict symbol:code name (local variable)"""
+    printer.names=names
+    try: return printer.doprint(expr)
+    finally: printer.names={}
+
+def sumCode(expr, names):
+    """returns Python code of sums and products of numbers and symbols
+    (without the printer and assumptions, fast for large linear expressions) or None"""
+    if expr.is_Symbol: return names.get(expr, expr.name)
+    if expr.is_Number: return repr(float(expr))
+    if expr.is_Add or expr.is_Mul:
+        args=[sumCode(a, names) for a in expr.args]
+        if None in args: return None
+        return '(%s)'%'+'.join(args) if expr.is_Add else '*'.join(args)
+    return None
+
+def assigns(pairs, names, indent='    ', temp='w', printer=printer, ordered=False):
+    """returns lines of code of ordered assignments pairs [(name, expr),...]
+    with common subexpressions hoisted into temporary variables temp0, temp1,...
+    names - dict symbol:code name of known variables
+    ordered - expressions use the variables of previous assignments (names must contain them),
+    so common subexpressions are hoisted in each expression separately"""
+    if ordered:
+        lines=[]
+        for i,(n,e) in enumerate(pairs):
+            c=None if e.has(Function, Pow) else sumCode(e, names) # linear sum
+            if c is None: lines+=assigns([(n,e)], names, indent, '%s%d_'%(temp,i), printer)
+            else: lines.append(indent+'%s=%s'%(n,c))
+        return lines
+    reps,exprs=cse([e for n,e in pairs], symbols=numbered_symbols('_'+temp))
+    names=dict(names)
+    lines=[]
+    for i,(s,e) in enumerate(reps): # common subexpressions
+        lines.append(indent+'%s%d=%s'%(temp,i,code(e,names,printer)))
+        names[s]='%s%d'%(temp,i)
+    for (n,_),e in zip(pairs,exprs):
+        lines.append(indent+'%s=%s'%(n,code(e,names,printer)))
+    return lines
+
+def compileSource(src, name, glb=None, jit=False):
+    """executes source code src and returns function name
+    glb - dict of additional global names of the function
+    jit - compile by numba.njit if numba is installed"""
+    ns={'math':math, 'np':np, 'numpy':np}
+    ns.update(glb or {})
+    exec(compile(src, '<pycodyn %s>'%name, 'exec'), ns)
+    f=ns[name]
+    f.source=src # for cache and export
+    if jit:
+        try: import numba
+        except ImportError: return f
+        for k,v in list(ns.items()): # jit the called Python functions (BC hooks)
+            if k not in ('math','np','numpy') and callable(v) and hasattr(v,'__code__') and v is not f:
+                ns[k]=numba.njit(v)
+        f=numba.njit(ns[name])
+        f.source=src
+    return f
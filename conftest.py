@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""Settings of tests (python -m pytest): the cache of compiled models is disabled"""
+
+import cache
+cache.enabled=False
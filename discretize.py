@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Discretization of continuous equations of components (derivatives are variables name_Dx,
+see pycodynDAE) into difference equations of pycodyn by the integration scheme.
+Previous values of variables have suffix 'p', values two steps ago - suffix 'pp', DT is the time step.
+Schemes: 'euler' (backward Euler, 1st order), 'trapezoid' (Crank-Nicolson, 2nd order),
+'bdf2' (2-step backward differentiation formula, 2nd order, for the constant time step).
+Usage:
+    import pycodynDAE as dae
+    m1=dae.Mass(name='m1', m=2112.0) # continuous components
+    ...
+    s=System(els=[...], eqs=peqs, scheme='trapezoid')
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+from sympy import Symbol, Eq, Tuple
+
+def prev(v, k=1): # variable of v k steps ago
+    return Symbol(v.name+'p'*k)
+
+def isDerivative(v): # derivative variable (name_Dx)
+    return '_D' in v.name
+
+def state(d): # variable of derivative d (name_Dx -> name_x)
+    return Symbol(d.name.replace('_D','_',1))
+
+def euler(d, x, DT):
+    return [Eq(d, (x-prev(x))/DT, evaluate=False)]
+
+def trapezoid(d, x, DT):
+    return [Eq((d+prev(d))/2, (x-prev(x))/DT, evaluate=False)]
+
+def bdf2(d, x, DT):
+    return [Eq(d, (3*x-4*prev(x)+prev(x,2))/(2*DT), evaluate=False)]
+
+schemes={'euler':euler, 'trapezoid':trapezoid, 'crank-nicolson':trapezoid, 'bdf2':bdf2}
+
+def derivatives(eqs): # derivative variables of equations
+    return sorted([v for v in Tuple(*eqs).free_symbols if isDerivative(v)], key=repr)
+
+def discretize(eqs, scheme='euler'):
+    """Returns difference equations of continuous equations eqs by scheme (name or function(d, x, DT))
+    and the history: pairs (previous variable, variable), which are equal at rest
+    (initial previous values are the values of the static problem)"""
+    from pycodyn import DT
+    f=schemes[scheme] if scheme in schemes else scheme
+    deqs=[]
+    for d in derivatives(eqs):
+        deqs+=f(d, state(d), DT)
+    ss=Tuple(*deqs).free_symbols-Tuple(*eqs).free_symbols # new variables
+    history=[(v, Symbol(v.name.rstrip('p'))) for v in sorted(ss, key=repr) if v.name.endswith('p')] # xp -> x, xpp -> x
+    return list(eqs)+deqs, history
@@ -1,11 +1,82 @@
 from sympy import *
+
+def aliasOf(e, group):
+    """returns (a, s, b) if equation e is alias a=s*b (s=1 or -1) else None"""
+    c={}
+    for side,sg in ((e.lhs,1),(e.rhs,-1)):
+        for term,k in side.as_coefficients_dict().items():
+            if not term.is_Symbol: return None # constant or nonlinear term
+            c[term]=c.get(term,0)+sg*k
+    c=[(v,k) for v,k in c.items() if k!=0]
+    if len(c)!=2 or abs(c[0][1])!=abs(c[1][1]): return None
+    (a,ka),(b,kb)=c
+    if group and group(a)!=group(b): return None
+    return a, -kb/ka, b
+
+def replace(e, rule):
+    """returns equation e with variables replaced by rule (xreplace);
+    the equation is evaluated to True/False only if it is trivial (fast for large systems)"""
+    if not isinstance(e, Equality): return e.xreplace(rule)
+    l,r=sympify(e.lhs.xreplace(rule)), sympify(e.rhs.xreplace(rule))
+    if l==r: return true
+    if l.free_symbols or r.free_symbols: return Eq(l, r, evaluate=False)
+    return Eq(l, r)
+
+def aliases(eqs, keep=(), key=repr, group=None):
+    """Fast elimination of alias equations a=b and a=-b by union-find (without SymPy solve)
+    keep - variables, which are not eliminated (they become representatives of their alias sets)
+    key - function of variable, the representative of the set is the variable with the least key
+    (the same key for related variables, e.g. x and xp, gives the same choice in their sets)
+    group - function of variable, only variables of the same group are aliases
+    returns equations without aliases and mapping {eliminated variable: s*representative}"""
+    kk=set([key(v) for v in keep])
+    rank=lambda v: (key(v) not in kk, key(v), repr(v)) # kept variables are preferred
+    parent={} # variable: (parent, sign), v=sign*parent
+    def find(v):
+        path=[]
+        s=1
+        while v in parent:
+            path.append((v,s))
+            p,sp=parent[v]
+            s*=sp; v=p
+        for u,su in path: # path compression
+            parent[u]=(v, s*su) # u=su*... => u=s*su*root (signs are +-1)
+        return v, s
+    rest=[]
+    for e in eqs:
+        if e==True: continue
+        al=aliasOf(e, group) if isinstance(e, Equality) else None
+        if al is None:
+            rest.append(e)
+            continue
+        a,s,b=al
+        ra,sa=find(a); rb,sb=find(b) # a=sa*ra, b=sb*rb, a=s*b
+        k=s*sb*sa # ra=k*rb
+        if ra==rb:
+            if k!=1: rest.append(e) # a=-a, variable is 0
+            continue # redundant equation
+        if rank(ra)<rank(rb): ra,rb=rb,ra # rb is the representative
+        if key(ra) in kk and key(rb) in kk: # both must be kept
+            rest.append(e)
+            continue
+        parent[ra]=(rb, k)
+    amap=dict([(v,s*r) for v,(r,s) in [(v,find(v)) for v in list(parent)]])
+    res=[]
+    for e in rest:
+        e=replace(e, amap)
+        if e==False: raise ValueError('inconsistent equations')
+        if e!=True: res.append(e)
+    return res, amap
+
 def eliminate(eq, keep, maxEqLen=2):
     """Eliminate variables from equations eq
     keep - try to keep these variables 
     maxEqLen - max number of equations after elimination"""
+    eq,amap=aliases(eq, keep) # aliases first (fast)
+    eq=Tuple(*eq)
     while len(eq)>maxEqLen:
         e=solve(eq, eq.free_symbols-keep, exclude=keep) # for elimination
         e=sorted(e.items(), key=lambda x:len(x[1].atoms())) # first shortest expressions
         eq=eq.subs(e[0][0], e[0][1]) # eliminate
         eq=Tuple(*set(eq)-set([True])) # without dublicates and True
-    return eq
\ No newline at end of file
+    return eq
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Ensemble runner for parameter sweeps and Monte-Carlo runs in a process pool.
+Each worker process builds (or loads from the cache) the compiled model once
+and reuses it for many cases. Results are written to a memory-mapped .npy file.
+If a case terminates its worker process (e.g. crash of the solver), only this case fails:
+cases in flight are run again one by one, other unfinished cases - in a new pool.
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import os, tempfile, traceback
+import numpy as np
+import cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+case=None # case function of the worker process
+out=None # memory-mapped results of the worker process
+status=None # memory-mapped states of cases (0 - not started, 1 - started, 2 - finished, 3 - failed)
+
+def init(build, path, spath):
+    """initializer of the worker process: builds the model and opens the results and states of cases"""
+    global case, out, status
+    cache.forget() # entries inherited from the parent process
+    case=build()
+    out=np.load(path, mmap_mode='r+')
+    status=np.load(spath, mmap_mode='r+')
+
+def runChunk(cases, P):
+    """runs cases (indexes) with parameters P in the worker process
+    returns dict of errors {case: traceback}"""
+    errors={}
+    for i,p in zip(cases, P):
+        status[i]=1
+        try:
+            out[i]=case(p)
+            status[i]=2
+        except Exception: # failure of the case (e.g. IDA convergence failure)
+            out[i]=np.nan
+            errors[i]=traceback.format_exc()
+            status[i]=3
+    out.flush()
+    return errors
+
+def runPool(build, path, spath, chunks, P, workers, errors):
+    """runs chunks of cases in a new process pool, updates errors
+    returns chunks, which are not finished, because a worker process is terminated"""
+    broken=[]
+    with ProcessPoolExecutor(workers, initializer=init, initargs=(build, path, spath)) as ex:
+        fs=[(c, ex.submit(runChunk, c, P[c])) for c in chunks]
+        for c,f in fs: # in order of cases
+            try: errors.update(f.result())
+            except BrokenProcessPool: # the worker process is terminated (crash of the solver)
+                broken.append(c)
+    return broken
+
+def runEnsemble(build, P, shape, path=None, workers=None, chunk=None):
+    """Runs cases in a process pool
+    build - picklable (module level) function, which builds the model and returns
+    function case(p) -> array of shape `shape` (results of the case with parameters p)
+    P - array (cases, parameters)
+    path - .npy file of results (temporary file if None)
+    workers - number of processes (number of cores if None)
+    chunk - number of cases in one task
+    returns memory-mapped array (cases,)+shape of results (NaN for failed cases)
+    and dict of errors {case: traceback}"""
+    P=np.asarray(P, dtype=float)
+    if path is None:
+        fd,path=tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+    fd,spath=tempfile.mkstemp(suffix='.npy') # states of cases
+    os.close(fd)
+    np.lib.format.open_memmap(spath, mode='w+', dtype=np.int8, shape=(len(P),)).flush() # zeros
+    res=np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(len(P),)+tuple(shape))
+    res[:]=np.nan
+    res.flush()
+    del res
+    workers=workers or os.cpu_count() or 1
+    chunk=chunk or max(1, len(P)//(4*workers)) # several tasks per worker for load balancing
+    chunks=[list(range(i, min(i+chunk, len(P)))) for i in range(0, len(P), chunk)]
+    errors={}
+    try:
+        while chunks:
+            chunks=runPool(build, path, spath, chunks, P, workers, errors)
+            st=np.load(spath, mmap_mode='r')
+            if chunks and not any([st[i] for c in chunks for i in c]): # the pool is broken before cases (e.g. by build)
+                errors.update([(i, 'worker process terminated') for c in chunks for i in c])
+                break
+            for i in [i for c in chunks for i in c if st[i]==1]: # cases in flight alone, the case, which terminates the process, fails
+                if runPool(build, path, spath, [[i]], P, 1, errors): errors[i]='worker process terminated'
+            # not started cases (and failed cases without tracebacks) in a new pool:
+            chunks=[[i for i in c if st[i]==0 or st[i]==3 and i not in errors] for c in chunks]
+            chunks=[c for c in chunks if c]
+            del st
+    finally:
+        os.remove(spath)
+    return np.load(path, mmap_mode='r'), errors
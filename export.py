@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Export of compiled models to standalone Python modules, which require only NumPy
+(without SymPy, matplotlib and pycodyn), e.g. for workers, which only run designed models.
+Usage:
+    s.createCurEqs(fnBC)
+    s.export('model2.py', state=d, bc={s1.x1:1.05*sin(2*pi*6.4/60*t), ...})
+    import model2 # in the worker
+    T,X=model2.simulate(timeEnd=18.75) # X[:,model2.idx['m2_x']]
+DAE (pycodynDAE):
+    s.export('model2dae.py', eq, state, params) # residual and Jacobian for Assimulo
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import codegen
+
+header='''# -*- coding: utf-8 -*-
+"""%s
+Generated by pycodyn (export.py), only NumPy is required."""
+
+import math
+import numpy
+import numpy as np
+
+'''
+
+runtime='''
+def vector(state=None, h=None):
+    """returns the state vector from dictionary {name: value} of initial state
+    (absent values are the exported state, default values of parameters and time step h)"""
+    d=dict(defaults); d.update(initial); d['dt']=h or dt
+    d.update(state or {})
+    return np.array([float(d[v]) for v in vrs])
+
+def simulate(state=None, timeEnd=10.0, bc=bc, h=None):
+    """Solves the dynamic problem by steps h (default dt) from state (see vector)
+    bc - function bc(t, x), which sets boundary conditions in the state vector x (columns idx)
+    returns array of time values and array of results (steps, vrs)"""
+    h=h or dt
+    x=vector(state, h)
+    n=int(math.ceil(round(timeEnd/h, 9))) # number of steps
+    T=np.arange(n)*h
+    X=np.empty((n, len(vrs)))
+    for i in range(n):
+        x[ip]=x[ib] # previous values "xp=x"...
+        if bc: bc(T[i], x)
+        x[ic]=ceqsf(x[ik]) # current values
+        X[i]=x
+    return T,X
+'''
+
+linear='''
+steps={} # (M, m) of each set of values of symbols of coefficients
+def linStep(v):
+    """returns matrix [M, m] of unknowns x=M*k+m for tuple v of values of symbols of coefficients"""
+    if v not in steps:
+        c=cs.copy()
+        c[isym]=coefficients(v)
+        A=np.zeros((n,n)); B=np.zeros((n,nk+1))
+        np.add.at(A, (ai,aj), c[:len(ai)])
+        np.add.at(B, (bi,bj), c[len(ai):len(ai)+len(bi)])
+        B[:,nk]=c[len(ai)+len(bi):]
+        steps[v]=np.linalg.solve(A, B)
+    return steps[v]
+
+def ceqsf(k): # values of unknowns for known values k
+    X=linStep(tuple(k[icoef].tolist()))
+    return X[:,:-1].dot(k)+X[:,-1]
+'''
+
+def array(a, dtype='float'):
+    return 'np.array(%r, dtype=%s)'%([float(i) if dtype=='float' else int(i) for i in a], dtype)
+
+def names(vs): # names of variables
+    return [repr(v) for v in vs]
+
+def values(d): # dictionary {name: float}
+    return dict([(repr(k), float(v)) for k,v in d.items()])
+
+def linearSource(lins, vrsp):
+    """returns source code of the linear current equations with coefficients of symbols (see pycodyn.LinSteps)"""
+    A,B,b=lins.form
+    isym=lins.isym
+    cs=[c for i,j,c in A]+[c for i,j,c in B]+list(b)
+    nm=dict([(v,'a[%d]'%i) for i,v in enumerate(lins.syms)])
+    L=['n=%d # number of unknowns'%lins.n, 'nk=%d # number of knowns'%lins.nk,
+       'ai=%s; aj=%s # entries of A'%(array([i for i,j,c in A],'int'), array([j for i,j,c in A],'int')),
+       'bi=%s; bj=%s # entries of B'%(array([i for i,j,c in B],'int'), array([j for i,j,c in B],'int')),
+       'cs=%s # numeric coefficients of A, B, b'%array(lins.cs),
+       'isym=%s # symbolic coefficients'%array(isym,'int'),
+       'icoef=%s # known values of symbols of coefficients %s'%(array(lins.icoef,'int'), names(lins.syms)),
+       '', 'def coefficients(a): # values of symbolic coefficients for values a of symbols',
+       '    r=np.empty(%d)'%len(isym)]
+    L+=codegen.assigns([('r[%d]'%n, cs[i]) for n,i in enumerate(isym)], nm)
+    L.append('    return r')
+    return '\n'.join(L)+'\n'+linear
+
+def bcSource(bc, idx, t):
+    """returns source code of function bc(t, x) of BC {variable: SymPy expression of t and variables}"""
+    if not bc: return 'bc=None # boundary conditions\n'
+    nm=dict([(v,'x[%d]'%i) for v,i in idx.items()]); nm[t]='t'
+    vs=list(bc)
+    L=['def bc(t, x): # boundary conditions (expressions use the values of the previous step)']
+    L+=codegen.assigns([('b%d'%n, bc[v]) for n,v in enumerate(vs)], nm)
+    L+=['    x[%d]=b%d # %r'%(idx[v],n,v) for n,v in enumerate(vs)]
+    return '\n'.join(L)+'\n'
+
+def system(s, path, state=None, bc=None, doc='Model exported from pycodyn.System'):
+    """writes the module of System s (after createCurEqs) to path
+    state - dictionary of initial state, bc - dictionary {variable: SymPy expression of t and variables}"""
+    from pycodyn import stepSource, DT, t
+    if not hasattr(s, 'vrsc'): raise ValueError('create current equations before export (see createCurEqs)')
+    if getattr(s, 'blocks', None): raise ValueError('linear blocks of BLT solved at run time are not exported (use mode linear)')
+    state=dict(state or {})
+    s.compileIndex(set(s.vrsp)|set(s.vrsc)|set(state)|set(bc or ()))
+    L=[header%doc,
+       'dt=%r # default time step'%float(s.dt),
+       'vrs=%r # variables of columns of the state vector'%names(s.vrs),
+       'idx=dict([(v,i) for i,v in enumerate(vrs)]) # column of variable',
+       'ik=%s # columns of known values'%array(s.ik,'int'),
+       'ic=%s # columns of unknowns'%array(s.ic,'int'),
+       'ip=%s; ib=%s # columns of previous and current values'%(array(s.ip,'int'), array(s.ib,'int')),
+       'params=%r # parameters'%names(s.params),
+       'defaults=%r # default values of parameters'%values(s.defaults),
+       'initial=%r # initial state'%values(dict([(k,v) for k,v in state.items() if k in s.idx])), '']
+    if s.lins is not None: L.append(linearSource(s.lins, s.vrsp))
+    else: L.append(stepSource(s.ceqsi, s.vrsp))
+    L.append(bcSource(bc, s.idx, t))
+    L.append(runtime)
+    with open(path, 'w') as f: f.write('\n'.join(L))
+
+daeRuntime='''
+def column(v, Y, Yd=None):
+    """returns values of variable v (name) from results Y (and Yd for derivatives)
+    also for variables eliminated by aliases"""
+    if v in aliases:
+        s,r=aliases[v]
+        return s*column(r, Y, Yd)
+    if v in y: return np.asarray(Y)[:,y.index(v)]
+    return np.asarray(Yd)[:,yd.index(v)]
+'''
+
+def dae(s, path, eq, state=None, params=None, doc='DAE model exported from pycodynDAE.System'):
+    """writes the module of residual(out, t, y, yd, p) and jacobian(J, c, t, y, yd, p) of eq
+    of DAE System s to path, state - dictionary of initial state, params - values of parameters"""
+    params=params or {}
+    pk=sorted(params, key=repr)
+    s.createResidual(eq, params) # the same functions as for the solver
+    al=dict([(repr(v), (float(e.as_coeff_Mul()[0]), repr(e.as_coeff_Mul()[1]))) for v,e in s.alias.items()])
+    st=dict([(k,v) for k,v in (state or {}).items() if k in s.y or k in s.yd])
+    L=[header%doc,
+       'y=%r # variables'%names(s.y),
+       'yd=%r # derivatives'%names(s.yd),
+       'params=%r # parameters'%names(pk),
+       'p=%s # values of parameters'%array([params[k] for k in pk]),
+       'aliases=%r # eliminated variables {name: (scale, representative)}'%al,
+       'y0=%s # initial state'%array([st.get(v, 0.0) for v in s.y]),
+       'yd0=%s'%array([st.get(v, 0.0) for v in s.yd]), '',
+       s.resfun.source, s.jacfun.source, daeRuntime]
+    with open(path, 'w') as f: f.write('\n'.join(L))
@@ -25,13 +25,13 @@ eq=eq.subs({m1.f2:0.0}) # additional BC
 T,Y,Yd=s.solveDAE(eq, state, 10.0)
 
 import matplotlib.pyplot as plt
-index=s.y.index(m1.x)
-plt.plot(T, [v[index] for v in Y])
+X=s.column(m1.x, Y) # values of m1.x (also if it is eliminated by aliases)
+plt.plot(T, X)
 plt.show()
 '''
 import csv
 with open('res.csv','wb') as f:
     w=csv.writer(f, delimiter=';')
-    for r in zip(T, [v[index] for v in Y]):
+    for r in zip(T, X):
         w.writerow(r)
 '''
\ No newline at end of file
@@ -22,13 +22,13 @@ fnBC.vrs = s.elsd['s1'].x1, s.elsd['m1'].f2
 
 #solve the dynamic problem — free vibrations of the string
 T,R=s.solveDyn(d, timeEnd=10, fnBC=fnBC)
-plt.plot(T, [d[m1.x] for d in R])
+plt.plot(T, R[m1.x])
 plt.xlabel('t, s'); plt.ylabel('m1.x, m')
 plt.show()
 '''
 import csv
 with open('res.csv','wb') as f:
     w=csv.writer(f, delimiter=';')
-    for r in zip(T, [d[m1.x] for d in R]):
+    for r in zip(T, R[m1.x]):
         w.writerow(r)
 '''
\ No newline at end of file
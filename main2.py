@@ -32,36 +32,24 @@ print(d[m2.x])
 # for k in sorted(d.keys(), key=lambda k:repr(k)):
 #     print(k,d[k])
 
-def motion(t):
-    """describes the harmonic motion of the upper point and returns its position at time t"""
-    A=2.1/2 # amplitude
-    n=6.4/60 # frequency
-    return A*math.sin(2*math.pi*n*t) # position
-   
-def force(v):
-    """returns the value of the force on the pump plunger F, depending on the value of its speed v"""
-    F=fs[1] # weight of the second section
-    if v>0: # if uprstroke
-        F+=fr # increase the force by value of the fluid weight
-    return F*math.tanh(abs(v)/0.01) # smoothing near the point v=0
-
-def fnBC(d, t):
-    """boundary conditions at time t for fnBC.vrs components"""
-    val = motion(t), force(d[m2.v]) 
-    return dict(zip(fnBC.vrs, val))
-fnBC.vrs = s.elsd['s1'].x1, s.elsd['f2'].f
+# boundary conditions — SymPy expressions of time t and state variables (values of the previous step)
+A=2.1/2 # amplitude
+n=6.4/60 # frequency
+motion=A*sin(2*pi*n*t) # harmonic motion of the upper point
+force=Piecewise((fs[1]+fr, m2.v>0), (fs[1], True))*tanh(Abs(m2.v)/0.01) # force on the pump plunger (with the fluid weight at upstroke), smoothing near v=0
+bc={s1.x1: motion, f2.f: force}
 
 # solve the dynamic problem — the upper point has a harmonic motion
-T,R=s.solveDyn(d, timeEnd=2*60/6.4, fnBC=fnBC)
-R=[r for t,r in zip(T,R) if t>60/6.4] # only last period
-plt.plot([d[s1.x1] for d in R], [d[s1.f1]/1000 for d in R]) # wellhead dynamometer card
-plt.plot([d[m2.x] for d in R], [(-d[m2.f2]+fs[1])/1000 for d in R]) # plunger dynamometer card
+T,R=s.solveDyn(d, timeEnd=2*60/6.4, fnBC=bc)
+R=R[T>60/6.4] # only last period
+plt.plot(R[s1.x1], R[s1.f1]/1000) # wellhead dynamometer card
+plt.plot(R[m2.x], (-R[m2.f2]+fs[1])/1000) # plunger dynamometer card
 plt.xlabel('x, m'); plt.ylabel('f, kN')
 plt.show()
 '''
 import csv
 with open('res.csv','wb') as f:
     w=csv.writer(f, delimiter=';')
-    for r in zip([d[s1.x1] for d in R], [d[s1.f1]/1000 for d in R]):
+    for r in zip(R[s1.x1], R[s1.f1]/1000):
         w.writerow(r)
 '''
\ No newline at end of file
@@ -0,0 +1,51 @@
+# encoding: utf-8
+"""Simulation of the pumping process by two-section strings of many wells
+Euler method, batch of wells with different parameters.
+[s1]---[m1]-+-[s2]---[m2]-+
+            |             |
+           [f1]          [f2]
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+from pycodyn import *
+
+fs=(-18494.0, -16193.0) # sections weights
+fr=-18499.0 # liquid weight above the plunger
+# parameters of wells:
+c1,d1,c2,d2,M1,M2,A,n=params=symbols('c1 d1 c2 d2 M1 M2 A n')
+p0={c1:114926.0, d1:5458.0, c2:73021.0, d2:3468.0, M1:2112.0, M2:1850.0, A:2.1/2, n:6.4/60}
+# components:
+s1=SpringDamper(name='s1', c=c1, d=d1)
+m1=Mass(name='m1',m=M1)
+f1=Force(name='f1', f=fs[0])
+s2=SpringDamper(name='s2', c=c2, d=d2)
+m2=Mass(name='m2', m=M2)
+f2=Force(name='f2')
+# additional equations of the string model, formed by connecting of the components flanges
+peqs=s1.pinEqs(1,[m1.pins[0]])
+peqs+=m1.pinEqs(1,[s2.pins[0],f1.pins[0]])
+peqs+=s2.pinEqs(1,[m2.pins[0]])
+peqs+=m2.pinEqs(1,[f2.pins[0]])
+s=System(els=[s1,m1,s2,m2,f1,f2], eqs=peqs) # system
+
+# static problem — the string under the maximum static loads
+ics={m1.v:0.0, m1.a:0.0, m2.v:0.0, m2.a:0.0, s1.x1:0.0, s1.x1p:0.0, f2.f:fs[1]+fr}
+ics.update(p0)
+d=s.solve(ics)
+
+def bc(t, v, A, n):
+    """boundary conditions at time t for bc.vrs components of all wells (arrays)"""
+    F=np.where(v>0, fs[1]+fr, fs[1]) # force on the pump plunger
+    return A*np.sin(2*np.pi*n*t), F*np.tanh(np.abs(v)/0.01)
+bc.vrs = s1.x1, f2.f
+bc.args = m2.v, A, n
+
+# parameters of 100 wells — random deviations from p0
+N=100
+P=np.array([p0[p] for p in params])*np.random.uniform(0.9, 1.1, (N, len(params)))
+
+# solve the dynamic problem for all wells together
+T,R=s.solveDynBatch(d, timeEnd=2*60/6.4, bc=bc, params=params, P=P)
+R=R[T>60/6.4] # only last period
+for j in range(0, N, 10): # wellhead dynamometer cards of some wells
+    plt.plot(R[s1.x1][j], R[s1.f1][j]/1000)
+plt.xlabel('x, m'); plt.ylabel('f, kN')
+plt.show()
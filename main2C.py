@@ -0,0 +1,60 @@
+# encoding: utf-8
+"""Simulation of the pumping process by two-section string
+Continuous components (pycodynDAE) discretized by the trapezoidal rule (2nd order),
+so the time step is larger than for Euler method with the same accuracy.
+[s1]---[m1]-+-[s2]---[m2]-+
+            |             |
+           [f1]          [f2]
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+from pycodyn import *
+import pycodynDAE as dae, discretize
+
+fs=(-18494.0, -16193.0) # sections weights
+fr=-18499.0 # liquid weight above the plunger
+# continuous components:
+s1=dae.SpringDamper(name='s1', c=114926.0, d=5458.0)
+m1=dae.Mass(name='m1',m=2112.0)
+f1=dae.Force(name='f1', f=fs[0])
+s2=dae.SpringDamper(name='s2', c=73021.0, d=3468.0)
+m2=dae.Mass(name='m2', m=1850.0)
+f2=dae.Force(name='f2')
+# additional equations of the string model, formed by connecting of the components flanges
+peqs=s1.pinEqs(1,[m1.pins[0]])
+peqs+=m1.pinEqs(1,[s2.pins[0],f1.pins[0]])
+peqs+=s2.pinEqs(1,[m2.pins[0]])
+peqs+=m2.pinEqs(1,[f2.pins[0]])
+s=System(els=[s1,m1,s2,m2,f1,f2], eqs=peqs, scheme='trapezoid') # system
+s.dt=0.2 # time step
+
+# static problem — the string at rest (all derivatives are zero) under the maximum static loads
+ics=dict([(v,0.0) for v in discretize.derivatives(s.continuous)])
+ics.update({s1.x1:0.0, f2.f:fs[1]+fr})
+d=s.solve(ics)
+print(d[m2.x])
+
+def motion(t):
+    """describes the harmonic motion of the upper point and returns its position at time t"""
+    A=2.1/2 # amplitude
+    n=6.4/60 # frequency
+    return A*math.sin(2*math.pi*n*t) # position
+   
+def force(v):
+    """returns the value of the force on the pump plunger F, depending on the value of its speed v"""
+    F=fs[1] # weight of the second section
+    if v>0: # if uprstroke
+        F+=fr # increase the force by value of the fluid weight
+    return F*math.tanh(abs(v)/0.01) # smoothing near the point v=0
+
+def fnBC(d, t):
+    """boundary conditions at time t for fnBC.vrs components"""
+    val = motion(t), force(d[m2.v]) 
+    return dict(zip(fnBC.vrs, val))
+fnBC.vrs = s1.x1, f2.f
+
+# solve the dynamic problem — the upper point has a harmonic motion
+T,R=s.solveDyn(d, timeEnd=2*60/6.4, fnBC=fnBC)
+R=R[T>60/6.4] # only last period
+plt.plot(R[s1.x1], R[s1.f1]/1000) # wellhead dynamometer card
+plt.plot(R[m2.x], (-R[m2.f2]+fs[1])/1000) # plunger dynamometer card
+plt.xlabel('x, m'); plt.ylabel('f, kN')
+plt.show()
@@ -0,0 +1,53 @@
+# encoding: utf-8
+"""Online estimation of the plunger load by two-section string
+Euler method, the model is driven by the stream of measured positions of the polished rod
+(irregular times of samples), see Stepper.
+[s1]---[m1]-+-[s2]---[m2]-+
+            |             |
+           [f1]          [f2]
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+from pycodyn import *
+
+fs=(-18494.0, -16193.0) # sections weights
+fr=-18499.0 # liquid weight above the plunger
+# components:
+s1=SpringDamper(name='s1', c=114926.0, d=5458.0)
+m1=Mass(name='m1',m=2112.0)
+f1=Force(name='f1', f=fs[0])
+s2=SpringDamper(name='s2', c=73021.0, d=3468.0)
+m2=Mass(name='m2', m=1850.0)
+f2=Force(name='f2')
+# additional equations of the string model, formed by connecting of the components flanges
+peqs=s1.pinEqs(1,[m1.pins[0]])
+peqs+=m1.pinEqs(1,[s2.pins[0],f1.pins[0]])
+peqs+=s2.pinEqs(1,[m2.pins[0]])
+peqs+=m2.pinEqs(1,[f2.pins[0]])
+s=System(els=[s1,m1,s2,m2,f1,f2], eqs=peqs) # system
+
+# static problem — the string under the maximum static loads
+ics={m1.v:0.0, m1.a:0.0, m2.v:0.0, m2.a:0.0, s1.x1:0.0, s1.x1p:0.0, f2.f:fs[1]+fr}
+d=s.solve(ics)
+
+def force(v):
+    """returns the value of the force on the pump plunger F, depending on the value of its speed v"""
+    F=fs[1] # weight of the second section
+    if v>0: # if uprstroke
+        F+=fr # increase the force by value of the fluid weight
+    return F*math.tanh(abs(v)/0.01) # smoothing near the point v=0
+
+def fnBC(d, t):
+    """boundary conditions at time t for fnBC.vrs components"""
+    return {f2.f: force(d[m2.v])}
+fnBC.vrs = f2.f,
+
+# stepper: samples of the position of the upper point, outputs - wellhead and plunger loads
+st=Stepper(s, d, bc=[s1.x1], outputs=[s1.f1, m2.x, m2.f2], fnBC=fnBC, size=200)
+t=0.0
+while t<2*60/6.4: # stream of samples (sensor of the polished rod)
+    x=2.1/2*math.sin(2*math.pi*6.4/60*t)+np.random.normal(0, 0.002) # measured position
+    f,xp,fp=st.push(t, [x]) # estimated loads at time st.t
+    t+=np.random.uniform(0.05, 0.15) # irregular time of the next sample
+H=st.last(94) # last period
+plt.plot(H[:,2], (-H[:,3]+fs[1])/1000) # estimated plunger dynamometer card
+plt.xlabel('x, m'); plt.ylabel('f, kN')
+plt.show()
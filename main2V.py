@@ -1,20 +1,10 @@
 # encoding: utf-8
-"""Simulation of the variable structure system (breakage of the second section) by event handling.
+"""Simulation of the variable structure system (breakage of the second section) by hybrid modes.
 [s1]---[m1]-+-[s2]---[m2]-+
             |             |
            [f1]          [f2]
 Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
 from pycodyn import *
-        
-def event(self, state): # event handler
-    # simulation of the breakage of the second section when force>56000
-    if state[s1.f1]>56000:
-        self.fnBC=fnBC2
-        peqs=s1.pinEqs(1,[m1.pins[0]])
-        peqs+=m1.pinEqs(1,[f1.pins[0]])
-        self.__init__(els=[s1,m1,f1], eqs=peqs) # changing the system             
-        self.createCurEqs(fnBC2) # new current equations
-System.event=event            
                 
 fs=(-18494.0, -16193.0) # sections weights
 fr=-18499.0 # liquid weight          
@@ -62,8 +52,16 @@ def fnBC2(d, t):
     return dict(zip(fnBC.vrs, val))
 fnBC2.vrs = (s.elsd['s1'].x1, )
 
+# system after the breakage of the second section
+peqs2=s1.pinEqs(1,[m1.pins[0]])
+peqs2+=m1.pinEqs(1,[f1.pins[0]])
+s2=System(els=[s1,m1,f1], eqs=peqs2)
+
+# modes are compiled before the simulation, the breakage happens when force>56000
+h=Hybrid(modes={'full':(s,fnBC), 'broken':(s2,fnBC2)}, trans=[('full', s1.f1-56000, 'broken')])
 # solve the dynamic problem — the upper point has a harmonic motion
-T,R=s.solveDyn(d, timeEnd=2*60/6.4+10, fnBC=fnBC)
-plt.plot([d[s1.x1] for d in R], [d[s1.f1]/1000 for d in R]) # wellhead dynamometer card
+T,R=h.solveDyn(d, timeEnd=2*60/6.4+10, mode='full')
+print(h.events)
+plt.plot(R[s1.x1], R[s1.f1]/1000) # wellhead dynamometer card
 plt.xlabel('x, m'); plt.ylabel('f, kN')
 plt.show()
\ No newline at end of file
@@ -48,15 +48,15 @@ fnBC.vrs = s.elsd['s1'].x1, s.elsd['f1'].f
 
 # solve the dynamic problem — the upper point has a harmonic motion
 T,R=s.solveDyn(d, timeEnd=2*60/6.4, fnBC=fnBC)
-R=[r for t,r in zip(T,R) if t>60/6.4] # only last period
-plt.plot([d[s1.x1] for d in R], [d[s1.f1]/1000 for d in R]) # wellhead dynamometer card
-plt.plot([d[m1.x] for d in R], [(-d[m1.f2]+fs)/1000 for d in R]) # plunger dynamometer card
+R=R[T>60/6.4] # only last period
+plt.plot(R[s1.x1], R[s1.f1]/1000) # wellhead dynamometer card
+plt.plot(R[m1.x], (-R[m1.f2]+fs)/1000) # plunger dynamometer card
 plt.xlabel('x, m'); plt.ylabel('f, kN')
 plt.show()
 '''
 import csv
 with open('res.csv','wb') as f:
     w=csv.writer(f, delimiter=';')
-    for r in zip([d[s1.x1] for d in R], [d[s1.f1]/1000 for d in R]):
+    for r in zip(R[s1.x1], R[s1.f1]/1000):
         w.writerow(r)
 '''
\ No newline at end of file
@@ -25,21 +25,21 @@ state.update(ics)
 # dynamic problem — the upper point has a harmonic motion
 A=2.1/2 # amplitude
 n=6.4/60 # frequency
-eq=s.eqs.subs({s1.x1: A*sin(2*pi*n*t), s1.Dx1: A*sin(2*pi*n*t).diff(t), m1.f2: Piecewise((fs, m1.v<0), (fs+fr*tanh(abs(m1.v)/0.01), m1.v>=0))})
+bc={s1.x1: A*sin(2*pi*n*t), m1.f2: Piecewise((fs, m1.v<0), (fs+fr*tanh(abs(m1.v)/0.01), m1.v>=0))} # s1.Dx1 is added by applyBC
 #or add equations:
 #eq=s.eqs+Tuple(Eq(s1.x1, A*sin(2*pi*n*t)), Eq(m1.f2, Piecewise((fs, m1.v<0), (fs+fr*tanh(abs(m1.v)/0.01), m1.v>=0))) )
-T,Y,Yd=s.solveDAE(eq, state, 20.0)
+T,Y,Yd=s.solveDAE(s.eqs, state, 20.0, bc=bc)
 
 import matplotlib.pyplot as plt
-index=s.y.index(s1.f1)
-Y=[y for t,y in zip(T,Y) if t>60/6.4] # only last period
+F=s.column(s1.f1, Y) # values of s1.f1 (also if it is eliminated by aliases)
+F=[f for t,f in zip(T,F) if t>60/6.4] # only last period
 T=[t for t in T if t>60/6.4]
-plt.plot(A*np.sin(2*np.pi*n*np.array(T)), [v[index]/1000 for v in Y])
+plt.plot(A*np.sin(2*np.pi*n*np.array(T)), [f/1000 for f in F])
 plt.show()
 ''' 
 import csv
 with open('res.csv','wb') as f:
     w=csv.writer(f, delimiter=';')
-    for r in zip(A*np.sin(2*np.pi*n*np.array(T)), [v[index]/1000 for v in Y]):
+    for r in zip(A*np.sin(2*np.pi*n*np.array(T)), [f/1000 for f in F]):
         w.writerow(r)
 '''
\ No newline at end of file
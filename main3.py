@@ -0,0 +1,49 @@
+# encoding: utf-8
+"""Simulation of the pumping process by multi-section string (three-step tapered string,
+each step is divided into many sections)
+Euler method, banded solver (see rodString.py).
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+from rodString import *
+
+E=2.1e11 # Young's modulus of steel, Pa
+rho=7850.0 # density of steel, kg/m3
+g=9.81
+steps=[(0.025, 500.0), (0.022, 500.0), (0.019, 500.0)] # (diameter, length) of steps of the string
+n=30 # number of sections of each step
+fr=-18499.0 # liquid weight above the plunger
+
+sections=[]
+for D,L in steps:
+    A=math.pi*D**2/4; l=L/n
+    c=E*A/l # stiffness
+    sections+=[(c, 0.0475*c, rho*A*l, -rho*A*l*g)]*n # stiffness, damping, mass, weight
+s=RodString(sections) # system
+
+# static problem — the string under the maximum static loads
+d=s.solve(s.staticICs(fr))
+print(d[s.masses[-1].x])
+
+def motion(t):
+    """describes the harmonic motion of the upper point and returns its position at time t"""
+    A=2.1/2 # amplitude
+    n=6.4/60 # frequency
+    return A*math.sin(2*math.pi*n*t) # position
+
+def force(v):
+    """returns the value of the force on the pump plunger F, depending on the value of its speed v"""
+    return fr*math.tanh(max(v,0.0)/0.01) # liquid weight at upstroke, smoothing near the point v=0
+
+def fnBC(d, t):
+    """boundary conditions at time t for fnBC.vrs components"""
+    val = motion(t), force(d[s.masses[-1].v])
+    return dict(zip(fnBC.vrs, val))
+fnBC.vrs = s.top, s.plunger
+
+# solve the dynamic problem — the upper point has a harmonic motion
+T,R=s.solveDyn(d, timeEnd=2*60/6.4, fnBC=fnBC)
+R=R[T>60/6.4] # only last period
+m=s.masses[-1]
+plt.plot(R[s.top], R[s.springs[0].f1]/1000) # wellhead dynamometer card
+plt.plot(R[m.x], -R[s.plunger]/1000) # plunger dynamometer card
+plt.xlabel('x, m'); plt.ylabel('f, kN')
+plt.show()
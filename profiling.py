@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Opt-in instrumentation: wall time and number of calls of phases of model building and simulation.
+Usage:
+    with Profile() as p:
+        s=System(...)
+        T,R=s.solveDyn(...)
+    p.json('profile.json')
+Times of nested phases are inclusive. When no profile is active, phase() and wrap() cost nearly nothing.
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import time, json
+
+active=None # active Profile or None
+
+class Profile(object):
+    """Records of phases {name: [number of calls, wall time]} and statistics of solvers"""
+    def __init__(self):
+        self.phases={}
+        self.stats={}
+        self.prev=None
+
+    def add(self, name, dt, n=1): # add n calls with time dt to phase name
+        p=self.phases.setdefault(name, [0, 0.0])
+        p[0]+=n; p[1]+=dt
+
+    def report(self): # dictionary for JSON
+        return dict(phases=dict([(k, dict(count=n, time=t)) for k,(n,t) in self.phases.items()]),
+                    stats=self.stats)
+
+    def json(self, path=None): # JSON string or file
+        s=json.dumps(self.report(), indent=1, sort_keys=True, default=str)
+        if path:
+            with open(path,'w') as f: f.write(s)
+        return s
+
+    def __str__(self):
+        L=['%-20s %10s %12s'%('phase','calls','time, s')]
+        for k,(n,t) in sorted(self.phases.items(), key=lambda i:-i[1][1]):
+            L.append('%-20s %10d %12.6f'%(k,n,t))
+        return '\n'.join(L)
+
+    def __enter__(self):
+        global active
+        self.prev=active
+        active=self
+        return self
+
+    def __exit__(self, *args):
+        global active
+        active=self.prev
+
+class Timer(object):
+    """Context manager, which adds its wall time to the phase of the profile"""
+    def __init__(self, profile, name):
+        self.profile=profile; self.name=name
+    def __enter__(self):
+        self.t=time.time()
+        return self
+    def __exit__(self, *args):
+        self.profile.add(self.name, time.time()-self.t)
+
+class NoTimer(object):
+    """Context manager, which does nothing (profile is not active)"""
+    def __enter__(self): return self
+    def __exit__(self, *args): pass
+
+noTimer=NoTimer()
+
+def phase(name):
+    """returns context manager of the phase name"""
+    return Timer(active, name) if active else noTimer
+
+def wrap(f, name):
+    """returns function f, which adds its calls to the phase name (f itself if profile is not active)"""
+    if not active: return f
+    profile=active
+    def timed(*args):
+        t=time.time()
+        r=f(*args)
+        profile.add(name, time.time()-t)
+        return r
+    return timed
+
+def stat(name, value):
+    """saves statistics value (e.g. of IDA) with name"""
+    if active: active.stats[name]=value
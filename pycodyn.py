@@ -4,27 +4,373 @@ Difference equations with Euler method.
 Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
 
 from sympy import *
-import math, time
-import matplotlib.pyplot as plt
+import math, time, warnings
+from collections import OrderedDict
+import numpy as np
+try: import matplotlib.pyplot as plt # for plots of main scripts
+except ImportError: plt=None
+import codegen, cache, profiling, structure, eliminate, statics, discretize, export
+
+def isPrev(v): return repr(v)[-1]=='p' # variable of the previous step
+def prevKey(v): return repr(v)[:-1] if isPrev(v) else repr(v) # same key for x and xp
+
+def aliases(eqs, keep=()):
+    """Eliminates alias equations (x_a=x_b, f_a=-f_b) of eqs (see eliminate.aliases)
+    returns equations and mapping {eliminated variable: s*representative}"""
+    with profiling.phase('aliases'):
+        return eliminate.aliases(eqs, keep, key=prevKey, group=isPrev)
 
 def byName(d,name): # return value by symbol name
     for k in d:
         if repr(k)==name: return d[k]
 
-dt=0.1 # time step
-#dt=Symbol('dt') # only to obtain equations in a symbolic form
+def linearForm(eqs, vrs, vrsk, coefs=()):
+    """Returns sparse triplets (i,j,c) of A and B and vector b for linear equations
+    A*vrs=B*vrsk+b or None if equations are not linear with numeric coefficients
+    vrs - unknown variables, vrsk - known variables
+    coefs - symbols allowed in coefficients (e.g. DT), such coefficients are SymPy expressions"""
+    iv=dict([(v,i) for i,v in enumerate(vrs)]) # column of unknown
+    ik=dict([(v,i) for i,v in enumerate(vrsk)]) # column of known
+    cs=set(coefs)
+    A=[];B=[];b=[0.0]*len(eqs)
+    for i,e in enumerate(eqs):
+        for side,s in ((e.lhs,1.0),(e.rhs,-1.0)): # without building of lhs-rhs
+            for term,c in expand(side).as_coefficients_dict().items():
+                c=s*float(c)
+                if cs and term not in ik and term.free_symbols & cs: # symbolic coefficient, e.g. x/dt
+                    term,f=term.as_independent(*cs, as_Add=False)
+                    c=c*f
+                if term==1: b[i]-=c # constant term
+                elif term in iv: A.append((i,iv[term],c))
+                elif term in ik: B.append((i,ik[term],-c))
+                else: return None # nonlinear term or symbolic coefficient
+    return A,B,b
+
+def linearSum(terms, c=0.0):
+    """Returns unevaluated expression sum(a*v)+c of terms [(a, v),...] (fast for large sums)"""
+    args=[Mul(Float(a), v, evaluate=False) for a,v in terms if a!=0.0]
+    if c!=0.0 or not args: args.append(Float(c))
+    return Add(*args, evaluate=False) if len(args)>1 else args[0]
+
+def luEqs(form, bv, kb):
+    """Returns ordered expressions of linear block A*bv=B*kb+b by substitutions of the sparse LU
+    factorization of A (the number of terms grows as nonzeros of LU, not as n**2).
+    Auxiliary variables of the forward substitution are Dummy symbols"""
+    import scipy.sparse, scipy.sparse.linalg
+    A,B,b=form
+    n=len(bv)
+    i,j,c=zip(*A)
+    lu=scipy.sparse.linalg.splu(scipy.sparse.csc_matrix((c,(i,j)), shape=(n,n))) # Pr*A*Pc=L*U
+    L=lu.L.tocsr(); U=lu.U.tocsr()
+    rows=[[] for r in range(n)] # terms of rows of B*kb
+    for r,k,a in B: rows[r].append((a,kb[k]))
+    q=[None]*n # Pr*(B*kb+b)
+    for r in range(n): q[lu.perm_r[r]]=(rows[r], b[r])
+    w=[Dummy('w') for r in range(n)]
+    pairs=[]
+    for r in range(n): # forward substitution L*w=q
+        row,c=q[r]
+        row=row+[(-a,w[k]) for k,a in zip(L.indices[L.indptr[r]:L.indptr[r+1]], L.data[L.indptr[r]:L.indptr[r+1]]) if k<r]
+        pairs.append((w[r], linearSum(row, c)))
+    z=[None]*n # z=inv(Pc)*bv
+    for r in range(n): z[lu.perm_c[r]]=bv[r]
+    for r in reversed(range(n)): # back substitution U*z=w
+        row=dict(zip(U.indices[U.indptr[r]:U.indptr[r+1]], U.data[U.indptr[r]:U.indptr[r+1]]))
+        d=row.pop(r)
+        pairs.append((z[r], linearSum([(1.0/d,w[r])]+[(-a/d,z[k]) for k,a in sorted(row.items())])))
+    return pairs
+
+class linBlock(codegen.Call):
+    """Values of unknowns of the linear block i of BLT with coefficients of symbols (the time step DT, parameters)
+    linBlock(i, *knowns), the block is solved numerically by LinSteps at run time (see System.linBlock)"""
+
+def bltEqs(eqs, vrs, vrsk, coefs=(), blocks=None):
+    """Returns ordered explicit expressions [(unknown, expr),...] of equations eqs
+    solved by blocks of BLT order. Expressions use known variables vrsk and unknowns of previous blocks.
+    Linear blocks with numeric coefficients are solved numerically, linear blocks with coefficients
+    of symbols coefs (the time step DT, parameters) - by symbolic LU (if they are small)
+    or numerically at run time (the list blocks gets their (form, knowns), see linBlock),
+    other blocks by SymPy solve"""
+    ceqsi=[]
+    known=list(vrsk)
+    for be,bv in structure.blt(eqs, vrs):
+        kb=sorted(set().union(*[e.free_symbols for e in be])-set(bv), key=repr) # knowns of the block
+        form=linearForm(be, bv, kb, coefs)
+        if form and not all([isinstance(c,float) for c in [c for i,j,c in form[0]+form[1]]+form[2]]):
+            if len(bv)<=blockSymbolic: # A(dt)*bv=B(dt)*kb+b(dt)
+                A,B,b=form
+                Am=zeros(len(bv)); r=Matrix(b)
+                for i,j,c in A: Am[i,j]+=c
+                for i,j,c in B: r[i]+=c*kb[j]
+                ceqsi+=list(zip(bv, Am.LUsolve(r)))
+                known+=bv
+                continue
+            if blocks is None: form=None # SymPy solve
+            else: # bv=linBlock(i, *kb), A(dt) is factored once for each time step
+                w=IndexedBase(Dummy('w'))
+                ceqsi.append((w.label, linBlock(Integer(len(blocks)), *kb)))
+                ceqsi+=[(v, w[i]) for i,v in enumerate(bv)]
+                blocks.append((form, kb))
+                known+=bv
+                continue
+        if form and len(bv)>blockDense: # large linear block
+            ceqsi+=luEqs(form, bv, kb)
+        elif form: # A*bv=B*kb+b, bv=M*kb+m
+            A,B,b=form
+            Ad=np.zeros((len(bv),len(bv))); Bd=np.zeros((len(bv),len(kb)))
+            for i,j,c in A: Ad[i,j]+=c
+            for i,j,c in B: Bd[i,j]+=c
+            M=np.linalg.solve(Ad,Bd); m=np.linalg.solve(Ad,b)
+            for i,v in enumerate(bv):
+                ceqsi.append((v, linearSum(zip(M[i],kb), m[i])))
+        else:
+            sol=solve(be, bv, dict=True)
+            if not sol or any([v not in sol[0] for v in bv]):
+                raise ValueError('algebraic loop can not be solved for %s'%bv)
+            ceqsi+=[(v,sol[0][v]) for v in bv] # the first solution
+        known+=bv
+    return ceqsi
+
+def stepSource(ceqsi, vrsp):
+    """Returns source code of function ceqsf(k) of ordered expressions ceqsi
+    (values of unknowns without auxiliary Dummy variables),
+    k - vector of values of vrsp (or array (knowns, instances))"""
+    names=dict([(a,'k%d'%n) for n,a in enumerate(vrsp)])
+    L=['def ceqsf(k):']
+    L+=['    k%d=k[%d]'%(n,n) for n in range(len(vrsp))]
+    names.update([(a,'c%d'%n) for n,(a,e) in enumerate(ceqsi)])
+    L+=codegen.assigns([('c%d'%n,e) for n,(a,e) in enumerate(ceqsi)], names, printer=codegen.npPrinter, ordered=True)
+    L.append('    return [%s]'%', '.join(['c%d'%n for n,(a,e) in enumerate(ceqsi) if not isinstance(a,Dummy)]))
+    return '\n'.join(L)+'\n'
+
+class BandLU(object):
+    """LU factorization of sparse matrix A (triplets) with small bandwidth by LAPACK gbtrf.
+    Rows are permuted by the matching of equations and unknowns (nonzero diagonal),
+    rows and columns - by reverse Cuthill-McKee ordering (small bandwidth, see structure.bandOrder)
+    maxBand - max kl+ku (ValueError if the band is wider)"""
+    def __init__(self, A, n, maxBand=None):
+        import scipy.linalg.lapack
+        i,j,c=[np.array(a) for a in zip(*A)]
+        inc=[set() for r in range(n)]
+        for r,k in zip(i,j): inc[r].add(k)
+        me,mv=structure.matching([sorted(a) for a in inc], n)
+        if None in me: raise np.linalg.LinAlgError('structurally singular matrix')
+        me=np.array(me) # equation e is the row me[e]
+        graph=[set() for r in range(n)] # symmetric graph of the matrix with the matched diagonal
+        for r,k in zip(me[i],j):
+            if r!=k: graph[r].add(k); graph[k].add(r)
+        p=structure.bandOrder([sorted(a) for a in graph])
+        q=np.empty(n, dtype=int); q[p]=np.arange(n) # new index of old
+        ri=q[me[i]]; cj=q[j]
+        self.kl=int(max(0,(ri-cj).max())); self.ku=int(max(0,(cj-ri).max()))
+        if maxBand is not None and self.kl+self.ku>maxBand:
+            raise ValueError('wide band %d'%(self.kl+self.ku))
+        ab=np.zeros((2*self.kl+self.ku+1, n)) # band storage with kl rows for fill-in
+        np.add.at(ab, (self.kl+self.ku+ri-cj, cj), c)
+        self.ab,self.piv,info=scipy.linalg.lapack.dgbtrf(ab, self.kl, self.ku)
+        if info: raise np.linalg.LinAlgError('singular matrix')
+        self.gbtrs=scipy.linalg.lapack.dgbtrs
+        self.row=q[me] # row of equation
+        self.col=q # position of unknown
+
+    def solve(self, r): # r - vector or array (n, k)
+        rp=np.empty_like(r)
+        rp[self.row]=r
+        x,info=self.gbtrs(self.ab, self.kl, self.ku, rp, self.piv)
+        return x[self.col]
+
+class LinStep(object):
+    """Linear current equations A*x=B*k+b, where A is factored once.
+    Call with the vector of known values k to get the vector of unknowns x
+    solver - 'dense' (x=M*k+m), 'sparse' (sparse LU), 'banded' (band LU)
+    or 'auto' (dense for small systems, banded if the band is narrow, else sparse)"""
+    dense=500 # max number of unknowns for the dense precomputed matrix
+    band=50 # max kl+ku of the band for solver 'auto'
+    def __init__(self, form, n, nk, solver='auto'):
+        A,B,b=form
+        if solver in ('banded','auto') and not (solver=='auto' and n<=self.dense):
+            try: self.lu=BandLU(A, n, self.band if solver=='auto' else None) # x=lu.solve(B*k+b)
+            except ValueError: solver='sparse'
+            else: solver='banded'
+        if solver=='dense' or solver=='auto' and n<=self.dense: # x=M*k+m, M=inv(A)*B, m=inv(A)*b
+            Ad=np.zeros((n,n)); Bd=np.zeros((n,nk))
+            for i,j,c in A: Ad[i,j]+=c
+            for i,j,c in B: Bd[i,j]+=c
+            self.M=np.linalg.solve(Ad,Bd) # LU factorization of A
+            self.m=np.linalg.solve(Ad,b)
+            self.lu=None
+            return
+        import scipy.sparse, scipy.sparse.linalg
+        def csc(T, shape):
+            i,j,c=zip(*T) if T else ((),(),())
+            return scipy.sparse.csc_matrix((c,(i,j)), shape=shape)
+        if solver!='banded': # sparse LU of A, x=lu.solve(B*k+b)
+            self.lu=scipy.sparse.linalg.splu(csc(A,(n,n)))
+        self.B=csc(B,(n,nk)).tocsr()
+        self.b=np.array(b, dtype=float)
+    
+    def __call__(self, k):
+        if k.ndim==2: # k - array (instances, knowns)
+            if self.lu is None: return k.dot(self.M.T)+self.m
+            return self.lu.solve(self.B.dot(k.T)+self.b[:,None]).T
+        if self.lu is None: return self.M.dot(k)+self.m
+        return self.lu.solve(self.B.dot(k)+self.b)
+        
+    def matrices(self): # matrices M, m of x=M*k+m (also for LU)
+        if self.lu is not None and not hasattr(self, 'M'):
+            self.M=self.lu.solve(self.B.toarray()); self.m=self.lu.solve(self.b)
+        return self.M, self.m
+
+class LinSteps(object):
+    """Linear current equations A*x=B*k+b with coefficients, which depend on the time step DT
+    and parameters. LinStep is created once for each set of their values (without SymPy).
+    vrsk - known variables (columns of k), DT is among them
+    Call with the vector of known values k (or array (instances, knowns)).
+    Instances are grouped by values of symbols of coefficients, each group is factored once,
+    groups with dense matrices are solved together by one batched product"""
+    maxSteps=1000 # max number of cached LinStep (least recently used are removed)
+    maxBatch=2**24 # max number of elements of matrices of instances of the batched product
+    def __init__(self, form, n, vrsk, solver='auto'):
+        self.form=form; self.n=n; self.nk=len(vrsk); self.solver=solver
+        A,B,b=form
+        cs=[c for i,j,c in A]+[c for i,j,c in B]+list(b) # all coefficients
+        self.isym=[i for i,c in enumerate(cs) if not isinstance(c,float)] # symbolic coefficients
+        self.cs=np.array([c if isinstance(c,float) else 0.0 for c in cs])
+        used=set([DT]).union(*[cs[i].free_symbols for i in self.isym])
+        self.syms=[v for v in vrsk if v in used] # symbols of coefficients
+        self.icoef=np.array([vrsk.index(v) for v in self.syms], dtype=int) # their columns of k
+        self.coefs=lambdify(self.syms, [cs[i] for i in self.isym], 'math') # values of symbolic coefficients
+        self.steps=OrderedDict() # LinStep of each set of values of self.syms
+        self.groups=None # values of symbols of instances and their groups (see batch)
+        
+    def at(self, values): # LinStep for the tuple of values of self.syms
+        if values in self.steps: self.steps.move_to_end(values)
+        else:
+            while len(self.steps)>=self.maxSteps: self.steps.popitem(last=False) # e.g. many instances with different parameters
+            A,B,b=self.form
+            cs=self.cs.copy()
+            cs[self.isym]=self.coefs(*values)
+            na,nb=len(A),len(B)
+            form=([(i,j,cs[n]) for n,(i,j,c) in enumerate(A)], [(i,j,cs[na+n]) for n,(i,j,c) in enumerate(B)], cs[na+nb:])
+            self.steps[values]=LinStep(form, self.n, self.nk, self.solver)
+        return self.steps[values]
+        
+    def batch(self, v):
+        """returns groups of instances with values v (instances, symbols) of symbols of coefficients:
+        instances of groups, LinStep of groups and matrices (M, m) of instances (if they are not too large) or None.
+        Groups are reused while values of instances are the same (e.g. parameters of the batch)"""
+        if self.groups is None or self.groups[0].shape!=v.shape or (self.groups[0]!=v).any():
+            keys,inv=np.unique(v, axis=0, return_inverse=True)
+            inv=inv.ravel()
+            order=np.argsort(inv, kind='stable')
+            idx=np.split(order, np.cumsum(np.bincount(inv))[:-1]) # instances of each group
+            steps=[self.at(tuple(a.tolist())) for a in keys]
+            Mm=None
+            if len(v)*self.n*(self.nk+1)<=self.maxBatch:
+                Mm=[np.array(a)[inv] for a in zip(*[s.matrices() for s in steps])]
+            self.groups=v.copy(), (idx, steps, Mm)
+        return self.groups[1]
+        
+    def __call__(self, k):
+        if k.ndim==1: return self.at(tuple(k[self.icoef].tolist()))(k)
+        v=k[:,self.icoef]
+        if (v==v[0]).all(): return self.at(tuple(v[0].tolist()))(k) # same coefficients of instances
+        idx,steps,Mm=self.batch(v)
+        if Mm is not None: # x=M*k+m of each instance
+            return np.matmul(Mm[0], k[:,:,None])[:,:,0]+Mm[1]
+        x=np.empty((len(k), self.n))
+        for j,st in zip(idx, steps): x[j]=st(k[j])
+        return x
+
+dt=0.1 # default time step (value of DT)
+DT=Symbol('dt') # time step in equations, it is the argument of compiled current equations
+t=Symbol('t') # time in expressions of BC
+blockDense=10 # max size of linear block of BLT, which is solved by the inverse matrix
+blockSymbolic=20 # max size of linear block of BLT with coefficients of DT, which is solved by symbolic LU (larger - by linBlock)
+
+class BC(object):
+    """Boundary conditions {variable: SymPy expression of time t and state variables},
+    the same dictionary is accepted by pycodynDAE (see System.applyBC). Expressions can contain Piecewise,
+    state variables have values of the previous step (e.g. the velocity of the plunger).
+    Expressions are compiled once for columns of the state vector, so steps do not call Python functions:
+    BC of time are computed for the time grid by one array (values), other BC - by the generated function,
+    the kernel inlines all BC (see System.kernelSource).
+    bc(d, t) returns the dictionary of values (as fnBC)"""
+    def __init__(self, exprs):
+        self.vrs=tuple(exprs) # variables of BC
+        self.exprs=[sympify(exprs[v]) for v in self.vrs]
+        self.args=tuple(sorted(Tuple(*self.exprs).free_symbols-set([t]), key=repr)) # state variables of expressions
+        self.itime=[i for i,e in enumerate(self.exprs) if not e.free_symbols-set([t])] # BC of time
+        self.istate=[i for i in range(len(self.vrs)) if i not in self.itime] # BC of state
+        self.f=None # lambda function of values of BC
+        self.fns={} # generated functions for columns of variables
+        self.idx=None # index of the last functions
+
+    def __call__(self, d, tv):
+        if self.f is None: self.f=lambdify([t]+list(self.args), self.exprs, 'math')
+        return dict(zip(self.vrs, self.f(tv, *[d[a] for a in self.args])))
+
+    def lines(self, idx, which, col='x[%d]', indent='    ', printer=codegen.printer):
+        """returns lines of code, which set BC which (indexes) in the state vector (code col of the column idx)"""
+        names=dict([(v,col%i) for v,i in idx.items()]); names[t]='t'
+        L=codegen.assigns([('b%d'%i, self.exprs[i]) for i in which], names, indent, printer=printer) # values of the previous step
+        return L+[indent+'%s=b%d # %r'%(col%idx[self.vrs[i]], i, self.vrs[i]) for i in which]
+
+    def functions(self, idx):
+        """returns generated functions apply(x, t) (all BC), applyState(x, t) (BC of state), applyBatch(X, t)
+        (all BC for arrays (instances, vars)) and values(T) (BC of time for array T) for columns idx"""
+        if idx is self.idx: return self.fn
+        k=tuple([idx[v] for v in self.vrs+self.args])
+        if k not in self.fns:
+            ck=cache.key([], 'BC', self.vrs, self.exprs, k, cache.sourceHash(()))
+            src=cache.load(ck) # generated source from the cache
+            if src is None:
+                src=self.source(idx)
+                cache.save(ck, src)
+            ns=codegen.compileSource(src, 'apply').__globals__ # all functions of the source
+            self.fns[k]=dict([(n, ns[n]) for n in ('apply','applyState','applyBatch','values')])
+            self.fns[k]['itime']=np.array([idx[self.vrs[i]] for i in self.itime], dtype=int) # columns of BC of time
+        self.idx,self.fn=idx,self.fns[k]
+        return self.fn
+
+    def source(self, idx): # source code of functions (see functions)
+        every=range(len(self.vrs))
+        return '\n'.join(['def apply(x, t):']+(self.lines(idx, every) or ['    pass'])+
+                         ['def applyState(x, t):']+(self.lines(idx, self.istate) or ['    pass'])+
+                         ['def applyBatch(X, t):']+(self.lines(idx, every, 'X[:,%d]', printer=codegen.npPrinter) or ['    pass'])+
+                         ['def values(T):', '    B=np.empty((len(T), %d))'%len(self.itime)]+
+                         codegen.assigns([('B[:,%d]'%n, self.exprs[i]) for n,i in enumerate(self.itime)],
+                                         {t:'T'}, printer=codegen.npPrinter)+['    return B'])+'\n'
+
+    def apply(self, idx, x, t, b=None):
+        """sets BC at time t in the state vector x (columns idx), b - values of BC of time (see values)"""
+        f=self.functions(idx)
+        if b is None: f['apply'](x, t)
+        else:
+            x[f['itime']]=b
+            f['applyState'](x, t)
+
+def boundary(fnBC): # BC of the dictionary of expressions
+    return BC(fnBC) if isinstance(fnBC, dict) else fnBC
 
 class Translational1D(object):
     """Base class of mechanical 1D components that have translational motion"""
+    parametric=False # float arguments are parameters (symbols name_k) with default values self.params
     def __init__(self, name, args):
         self.name=name # component name
+        self.params={} # parameters {symbol: default value}
         for k,v in args.items(): # for each key-value pair
             if k in ['name','self']: continue # except name and self
             if v==None: # if value is None
                 # create symbolic variable with name name+'_'+k
                 self.__dict__[k]=Symbol(name+'_'+k)
+            elif type(v) in [float,Float] and self.parametric: # parameter
+                self.__dict__[k]=Symbol(name+'_'+k)
+                self.params[self.__dict__[k]]=float(v)
             elif type(v) in [float,Float]: # if value is float
                 self.__dict__[k]=Number(v) # create constant
+            elif isinstance(v,Basic): # if value is symbolic (parameter)
+                self.__dict__[k]=v
         self.eqs=[] # equations list
         self.pins=[] # pins list
         
@@ -33,10 +379,10 @@ class Translational1D(object):
         f=Number(0) # sum of forces on flanges of other components
         for pin in pins: # for each flange of the other components
             # add equations describing the equality on the flange:
-            eqs.append(Eq(self.pins[pindex]['x'], pin['x'])) # positions
-            eqs.append(Eq(self.pins[pindex]['xp'], pin['xp'])) # positions at time t-dt
+            eqs.append(Eq(self.pins[pindex]['x'], pin['x'], evaluate=False)) # positions
+            eqs.append(Eq(self.pins[pindex]['xp'], pin['xp'], evaluate=False)) # positions at the previous step
             f+=pin['f'] # add to the sum of forces
-        eqs.append(Eq(self.pins[pindex]['f'], -f)) # equality to zero the sum of forces on the flange 
+        eqs.append(Eq(self.pins[pindex]['f'], -f, evaluate=False)) # equality to zero the sum of forces on the flange 
         return eqs
     
 class Mass(Translational1D):
@@ -44,9 +390,9 @@ class Mass(Translational1D):
     def __init__(self, name, m=1.0, x=None, xp=None, v=None, vp=None, a=None, f1=None, f2=None):
         Translational1D.__init__(self, name, locals()) # base class constructor call
         # system of equations
-        self.eqs=[Eq(self.m*self.a, self.f1+self.f2),
-                  Eq(self.a, (self.v-self.vp)/dt),
-                  Eq(self.v, (self.x-self.xp)/dt)]
+        self.eqs=[Eq(self.m*self.a, self.f1+self.f2, evaluate=False), # not evaluated (fast for long strings)
+                  Eq(self.a, (self.v-self.vp)/DT, evaluate=False),
+                  Eq(self.v, (self.x-self.xp)/DT, evaluate=False)]
         self.pins=[dict(x=self.x, xp=self.xp, f=self.f1),
                    dict(x=self.x, xp=self.xp, f=self.f2)] # two flanges
 
@@ -55,9 +401,9 @@ class SpringDamper(Translational1D):
     def __init__(self, name, c=1.0, d=0.1, x1=None, x2=None, x1p=None, x2p=None, vrel=None, f1=None, f2=None):
         Translational1D.__init__(self, name, locals())
         # system of equations
-        self.eqs=[Eq(self.c*(self.x2-self.x1)+self.d*self.vrel, self.f2),
-                  Eq(-self.f2, self.f1),
-                  Eq(self.vrel, (self.x2-self.x2p)/dt-(self.x1-self.x1p)/dt)]
+        self.eqs=[Eq(self.c*(self.x2-self.x1)+self.d*self.vrel, self.f2, evaluate=False),
+                  Eq(-self.f2, self.f1, evaluate=False),
+                  Eq(self.vrel, (self.x2-self.x2p)/DT-(self.x1-self.x1p)/DT, evaluate=False)]
         
         self.pins=[dict(x=self.x1, xp=self.x1p, f=self.f1),
                    dict(x=self.x2, xp=self.x2p, f=self.f2)] # two flanges 
@@ -68,15 +414,58 @@ class Force(Translational1D):
         Translational1D.__init__(self, name, locals())
         self.pins=[dict(x=self.x, xp=self.xp, f=-self.f)] # one flange
 
+class Row(object):
+    """Dict-like view of the state vector x by variables"""
+    def __init__(self, x, idx):
+        self.x=x # state vector
+        self.idx=idx # column of variable
+    def __getitem__(self, k): return self.x[self.idx[k]]
+    def __setitem__(self, k, v): self.x[self.idx[k]]=v
+    def __contains__(self, k): return k in self.idx
+    def keys(self): return self.idx.keys()
+    
+class Result(object):
+    """Simulation results with named columns.
+    R[symbol] or R[name] returns the column (values of the variable at each step),
+    other keys (slice, index array, boolean mask) select time steps"""
+    def __init__(self, data, vrs):
+        self.data=data # array (steps, vars) or (instances, steps, vars)
+        self.vrs=list(vrs) # variables of columns
+        self.idx=dict([(v,i) for i,v in enumerate(self.vrs)])
+        self.idx.update([(repr(v),i) for i,v in enumerate(self.vrs)]) # by name
+    def __getitem__(self, k):
+        if isinstance(k, (Symbol, str)): return self.data[..., self.idx[k]]
+        return Result(self.data[(slice(None),)*(self.data.ndim-2)+(k,)], self.vrs)
+    def __len__(self): return self.data.shape[-2]
+    def instance(self, j): return Result(self.data[j], self.vrs) # results of instance j of batch
+    def names(self): return [repr(v) for v in self.vrs]
+    def structured(self): # as numpy structured array
+        return np.rec.fromarrays([self.data[...,i] for i in range(len(self.vrs))], names=self.names())
+
 class System(object):
-    """System of components connected by flanges"""
-    def __init__(self, els, eqs):
-        self.els=els # components list
-        self.elsd=dict([(e.name,e) for e in els]) # same, but dict.
-        self.eqs=[] # list of system equations
-        for e in self.els: # for each component
-            self.eqs+=e.eqs # join with component equations
-        self.eqs=self.eqs+eqs # join with additional equations
+    """System of components connected by flanges
+    Equations of continuous components (with derivatives name_Dx, e.g. of pycodynDAE)
+    are discretized by the integration scheme (see discretize)"""
+    solver='auto' # solver of linear equations (see LinStep)
+    scheme='euler' # integration scheme of continuous equations
+    def __init__(self, els, eqs, scheme=None):
+        with profiling.phase('System'):
+            self.els=els # components list
+            self.elsd=dict([(e.name,e) for e in els]) # same, but dict.
+            self.eqs=[] # list of system equations
+            for e in self.els: # for each component
+                self.eqs+=e.eqs # join with component equations
+            self.eqs=self.eqs+eqs # join with additional equations
+            if scheme: self.scheme=scheme
+            self.continuous=None # continuous equations (for the static problem)
+            self.history=[] # pairs (previous variable, variable) of the discretization
+            if discretize.derivatives(self.eqs):
+                self.continuous=self.eqs
+                self.eqs,self.history=discretize.discretize(self.eqs, self.scheme)
+            self.statics={} # compiled static problems by inputs and time step
+            self.dt=dt # time step (value of DT)
+            self.defaults={} # parameters of components {symbol: default value} (see Translational1D.parametric)
+            for e in self.els: self.defaults.update(getattr(e, 'params', {}))
         
     def solveN(self, eqs): # solve alg. system by scipy
         import scipy.optimize
@@ -95,73 +484,619 @@ class System(object):
         d=dict(zip(vrs,sol.x))
         return d
                                                
+    def static(self, inputs):
+        """returns the static problem compiled once for known variables inputs (see statics.Static)"""
+        k=frozenset(inputs),self.dt
+        if k not in self.statics:
+            eqs=[eliminate.replace(e, {DT:self.dt}) for e in self.continuous or self.eqs]
+            self.statics[k]=statics.Static(eqs, sorted(k[0], key=repr), self.solver, prevKey, isPrev)
+        return self.statics[k]
+        
     def solve(self, ics): # solve alg. system at t
-        eqs=[e.subs(ics) for e in self.eqs] # substitution of ics
-        eqs=[e for e in eqs if e not in (True,False)] # discard all degenerate equations
-        # solve the system of equations by:
-        #sol=nsolve(eqs) # SymPy (slow) #or solve
-        sol=self.solveN(eqs) # SciPy (faster)
-        sol.update(ics) # update dictionary by dictionary ics
-        return sol
-        
-    def solv(self, preState): # solve by subs. to sympy expr.
+        ics=dict(list(self.defaults.items())+list(ics.items())) # with default values of parameters
+        st=self.static(ics) # compiled with ics as arguments
+        with profiling.phase('static solve'):
+            d=st(ics) # linear - by factorized matrix, nonlinear - by Newton method
+            for v,x in self.history: d[v]=d[x] # previous values of the continuous system at rest
+            return d
+        
+    def solv(self, preState): # solve by subs. to sympy expr. (only for mode 'solve')
         state=preState.copy()
         for k in self.ceqs: # current equations
             state[k]=self.ceqs[k].subs(preState).evalf()
             #assert type(state[k]) in [float,Float]
         return state
         
-    def solvN(self, preState): # same but by lambdafunction
+    def solvN(self, preState): # same but by lambdafunction or matrix
         #use Python 3.7 for fastest execution
         state=preState.copy()
-        ls=dict([(repr(a),state[a]) for a in self.vrsp]) # arg. dict
-        res=self.ceqsf(**ls) # lambdafunction call
-        for a,v in zip([i[0] for i in self.ceqsi], res):
+        d=dict(self.defaults); d[DT]=self.dt; d.update(state) # default parameters and time step
+        res=self.ceqsf(np.array([float(d[a]) for a in self.vrsp])) # function call
+        for a,v in zip(self.vrsc, res):
             state[a]=v # update state
         return state
         
-    def createCurEqs(self, fnBC): # create current 'fast equations'
-        eqs=Tuple(*self.eqs)
+    def curEqs(self, fnBC, mode, params): # symbolic phase of createCurEqs
+        vrsbc=list(fnBC.vrs)
+        eqs,amap=aliases(self.eqs, vrsbc+list(params))
+        eqs=Tuple(*eqs)
+        ea=sorted([(v,e) for v,e in amap.items() if not isPrev(v)], key=lambda i:repr(i[0])) # eliminated unknowns
         vrs={i for i in eqs.atoms(Symbol) if repr(i)[-1]!='p'} # vars without 'p'
-        vrsbc=set(fnBC.vrs)
-        vrs=vrs-vrsbc # unknown vars at current step
-        self.ceqs=solve(eqs,vrs) # current expressions
-        self.vrsp={i for i in eqs.atoms(Symbol) if repr(i)[-1]=='p'} # vars with 'p'
-        self.vrsp.update(vrsbc) # known vars at current step
-        self.ceqsi=self.ceqs.items() # ordered expressions
-        self.ceqsf=lambdify(self.vrsp,[i[1] for i in self.ceqsi],'numpy') # current lambda function
+        vrs=sorted(vrs-set(vrsbc)-set(params)-set([DT]), key=repr) # unknown vars at current step
+        vrsp={i for i in eqs.atoms(Symbol) if repr(i)[-1]=='p'}-set(params) # vars with 'p'
+        vrsp=sorted(vrsp, key=repr)+[i for i in vrsbc if i not in vrsp] # known vars at current step
+        vrsp+=[i for i in params if i not in vrsp] # parameters
+        vrsp.append(DT) # time step (the last known value)
+        form=None
+        sv=set(vrs)
+        leqs=[e for e in eqs if e.free_symbols & sv] # without equations of known vars ("xp=xp")
+        if mode in ('linear','auto'):
+            with profiling.phase('linearForm'):
+                form=linearForm(leqs, vrs, vrsp, [DT]+list(params)) if len(leqs)==len(vrs) else None
+        if mode=='linear' and not form:
+            raise ValueError('current equations are not linear')
+        if form: # with rows of eliminated unknowns v-s*r=0
+            A,B,b=form
+            iv=dict([(v,i) for i,v in enumerate(vrs)]); ik=dict([(v,i) for i,v in enumerate(vrsp)])
+            for n,(v,e) in enumerate(ea):
+                s,r=e.as_coeff_Mul()
+                i=len(vrs)+n
+                A.append((i,i,1.0)); b.append(0.0)
+                if r in iv: A.append((i,iv[r],-float(s)))
+                else: B.append((i,ik[r],float(s)))
+            return dict(vrsp=vrsp, vrsc=vrs+[v for v,e in ea], form=form)
+        if mode in ('blt','auto'): # explicit assignments and algebraic loops by blocks
+            try:
+                blocks=[]
+                with profiling.phase('blt'):
+                    ceqsi=bltEqs(leqs, vrs, vrsp, [DT]+list(params), blocks)+ea
+                vrsc=[a for a,e in ceqsi if not isinstance(a,Dummy)]
+                return dict(vrsp=vrsp, vrsc=vrsc, form=None, ceqsi=ceqsi, ceqsf=stepSource(ceqsi, vrsp), blocks=blocks)
+            except ValueError: # structurally singular or unsolvable block
+                if mode=='blt': raise
+        with profiling.phase('sympy solve'):
+            ceqsi=list(solve(eqs,vrs).items()) # ordered current expressions
+            ceqsi+=[(v,e.xreplace(dict(ceqsi))) for v,e in ea]
+        with profiling.phase('lambdify'):
+            f=lambdify([vrsp],[i[1] for i in ceqsi],'numpy') # current lambda function
+        return dict(vrsp=vrsp, vrsc=[i[0] for i in ceqsi], form=None, ceqsi=ceqsi, ceqsf=cache.lambdaSource(f))
+        
+    def createCurEqs(self, fnBC, mode='auto', params=()):
+        """Creates current 'fast equations' for unknowns self.vrsc
+        as function self.ceqsf of known values self.vrsp
+        mode - 'solve' (SymPy solve), 'linear' (factored matrix), 'blt' (solution by blocks of BLT order)
+        or 'auto' ('linear' if the equations are linear, else 'blt')
+        params - symbols of parameters (known values, which are constant during simulation),
+        parameters of components self.defaults are added to them"""
+        params=list(params)+sorted(set(self.defaults)-set(params), key=repr)
+        sig=(mode, tuple(fnBC.vrs), tuple(params), len(self.eqs), cache.enabled) # the key is built only if they or self.eqs change
+        if self.eqs is not getattr(self, 'keyEqs', None) or sig!=self.keySig: # not created yet or the system is changed
+            self.keyEqs, self.keySig = self.eqs, sig
+            self.key=cache.key(self.eqs, 'createCurEqs', mode, list(fnBC.vrs), params, cache.sourceHash(self.els)) if cache.enabled else None
+            self.params=params
+            with profiling.phase('createCurEqs'):
+                c=cache.load(self.key) # compiled model from the cache
+                if c is None:
+                    c=self.curEqs(fnBC, mode, params)
+                    cache.save(self.key, c)
+            self.vrsp, self.vrsc=c['vrsp'], c['vrsc']
+            if c['form']: # A(dt,params)*x=B(dt,params)*xp+b(dt,params,bc)
+                self.lins=LinSteps(c['form'], len(self.vrsc), self.vrsp, self.solver)
+                self.blocks=[]
+                self.ceqs=None # no explicit expressions
+                self.stepf=self.lins
+            else:
+                self.lins=None
+                self.ceqsi=c['ceqsi'] # ordered expressions
+                self.ceqs=dict(self.ceqsi) # current expressions
+                self.blocks=[LinSteps(form, len(form[2]), kb, self.solver) for form,kb in c.get('blocks',())]
+                if self.blocks: self.stepf=codegen.compileSource(c['ceqsf'], 'ceqsf', {'linBlock':self.linBlock})
+                else: self.stepf=cache.lambdaFunction(c['ceqsf']) # current lambda function
+        self.lin=self.lins.at((self.dt,)) if self.lins is not None and self.lins.syms==[DT] else None # for the fixed time step
+        self.ceqsf=profiling.wrap(self.stepf, 'step')
+        self.stepIndex() # if the variable index exists (changing of the system by event)
                          
-    def solveDyn(self, state, timeEnd, fnBC):
-        #solves the dynamic problem 
-        t=0.0 # time variable
-        T=[] # list of time values
-        Res=[] # list of results
-        
-        self.createCurEqs(fnBC)
-        ics={} # for self.solve()
-        start = time.time()
-        while t<timeEnd:
-            for k in state: # previous values "xp=x"...
-                if repr(k)[-1]=='p':
-                    state[k]=byName(state,repr(k)[:-1])
-                    ics[k]=byName(state,repr(k)[:-1]) # for self.solve()
-            
-            state.update(fnBC(state, t)) # update BC
-            #state=self.solv(state) # by sympy expression (slow)
-            state=self.solvN(state) # by numpy expression (fast)
-            
-            # ics.update(fnBC(state, t)) # update BC
-            # state=self.solve(ics) # by scipy.optimize.root (slow, for frequent events)
-            
-            print(t)
-            T.append(t)
-            Res.append(state) # save results
-            t+=dt # increase time value
-            
-            self.event(state) # event handler
-        end = time.time()
-        print('simulation time',end-start)
-        return T,Res
+    def linBlock(self, i, *k):
+        """values of unknowns of the linear block i of BLT for values k of its knowns (floats or arrays of instances)"""
+        k=np.array(k)
+        return self.blocks[i](k) if k.ndim==1 else self.blocks[i](k.T).T
+        
+    def compileIndex(self, state):
+        """Creates the variable index: each variable of state, parameters and the time step DT
+        get a column of the state vector"""
+        self.vrs=sorted(set(state)|set(self.params)|set([DT]), key=repr) # variables of columns
+        self.idx=dict([(v,i) for i,v in enumerate(self.vrs)]) # column of variable
+        names=dict([(repr(v),i) for i,v in enumerate(self.vrs)])
+        pairs=[(i,names[repr(v)[:-1]]) for i,v in enumerate(self.vrs)
+               if repr(v)[-1]=='p' and repr(v)[:-1] in names and v not in self.params] # "xp=x" pairs
+        self.ip=np.array([i for i,j in pairs], dtype=int) # columns of previous values
+        self.ib=np.array([j for i,j in pairs], dtype=int) # columns of current values
+        self.idt=self.idx[DT] # column of the time step
+        self.stepIndex()
+        
+    def vector(self, state): # state vector (absent parameters have default values, the time step is self.dt)
+        d=dict(self.defaults); d[DT]=self.dt
+        d.update(state)
+        return np.array([float(d[k]) for k in self.vrs])
+        
+    def stepIndex(self): # columns of known and unknown variables of current equations
+        if not hasattr(self,'idx') or not hasattr(self,'vrsc'): return
+        self.ik=np.array([self.idx[a] for a in self.vrsp], dtype=int)
+        self.ic=np.array([self.idx[a] for a in self.vrsc], dtype=int)
+        
+    def steps(self, timeEnd): # number of steps from 0 to timeEnd
+        return int(math.ceil(round(timeEnd/self.dt, 9)))
+        
+    def step(self, x, d, t, h, fnBC, b=None):
+        """Makes one step of size h to time t in place of the state vector x (d - its view)
+        fnBC - function fnBC(d, t) or BC, b - values of BC of time (see BC.values)"""
+        x[self.idt]=h
+        x[self.ip]=x[self.ib] # previous values "xp=x"...
+        if isinstance(fnBC, BC): fnBC.apply(self.idx, x, t, b) # compiled BC
+        else:
+            for k,v in fnBC(d, t).items(): # update BC
+                x[self.idx[k]]=v
+        x[self.ic]=self.ceqsf(x[self.ik]) # current values
+        
+    def adaptiveSteps(self, x, d, timeEnd, fnBC, rtol, atol, dtMin):
+        """Yields times of steps of variable size (made in place of x) controlled by step doubling:
+        the step h is compared with two steps h/2, the weighted error max|x2-x1|/(atol+rtol*|x2|)
+        of the state variables (variables with previous values) must be <=1.
+        atol - array of absolute tolerances of columns self.ib.
+        Sizes of steps are self.dt/2**k (self.dt is the max size), so matrices are reused.
+        The first step is the smallest (not less than dtMin) and ends at t=0 as the fixed step"""
+        h=self.dt
+        while h/2>=dtMin: h/=2
+        t=-h # time of the initial state
+        while t+h<timeEnd-h*1e-9:
+            x0=x.copy() # state before the step
+            self.step(x, d, t+h, h, fnBC)
+            x1=x[self.ib] # one full step
+            x[:]=x0
+            self.step(x, d, t+h/2, h/2, fnBC)
+            self.step(x, d, t+h, h/2, fnBC) # two half steps
+            x2=x[self.ib]
+            err=np.max(np.abs(x2-x1)/(atol+rtol*np.abs(x2))) if len(self.ib) else 0.0
+            if err<=1.0 or h/2<dtMin: # accept
+                t+=h
+                yield t
+                if err<0.25 and h<self.dt: h*=2
+            else: # reject
+                x[:]=x0
+                h/=2
+        
+    def iterDyn(self, state, timeEnd, fnBC, mode='auto', chunk=1024, every=1, tStart=0.0, tol=None, dtMin=None, atol=None):
+        """Solves the dynamic problem and yields results by chunks (memory does not grow)
+        state - dictionary with initial state
+        chunk - max number of saved steps in one chunk
+        every - save every k-th step, tStart - save only steps with t>=tStart
+        tol - relative tolerance of adaptive steps (see adaptiveSteps) or None (fixed step self.dt),
+        atol - absolute tolerance: number or dictionary {variable: value} (default tol),
+        dtMin - min size of adaptive steps (default self.dt/1024)
+        fnBC - function fnBC(d, t), which returns the dictionary of values of variables fnBC.vrs,
+        or the dictionary of SymPy expressions (see BC)
+        yields arrays of time values and Results of chunks"""
+        if tol is not None and self.scheme=='bdf2':
+            raise ValueError('adaptive steps are not supported by the scheme bdf2 (coefficients of the constant step)')
+        fnBC=boundary(fnBC)
+        self.createCurEqs(fnBC, mode)
+        self.compileIndex(state)
+        x=self.vector(state) # state vector
+        x[self.idt]=self.dt
+        d=Row(x, self.idx) # dict-like view of x for fnBC and event
+        if not isinstance(fnBC, BC): fnBC=profiling.wrap(fnBC, 'fnBC')
+        event=profiling.wrap(self.event, 'event')
+        T=np.empty(chunk); X=np.empty((chunk, len(self.vrs))) # chunk of results
+        j=0 # number of saved steps in chunk
+        n=self.steps(timeEnd) # number of fixed steps
+        if tol is None: # fixed step
+            times=(i*self.dt for i in range(n))
+        else:
+            a=atol if isinstance(atol, dict) else {}
+            a0=tol if atol is None or isinstance(atol, dict) else atol # default absolute tolerance
+            atol=np.array([a.get(self.vrs[i], a0) for i in self.ib]) # of state variables
+            times=self.adaptiveSteps(x, d, timeEnd, fnBC, tol, atol, dtMin or self.dt/1024)
+        B=None # values of BC of time of steps i..i+chunk
+        for i,t in enumerate(times):
+            if tol is None:
+                if isinstance(fnBC, BC) and i%chunk==0: B=fnBC.functions(self.idx)['values'](np.arange(i, min(i+chunk, n))*self.dt)
+                self.step(x, d, t, self.dt, fnBC, None if B is None else B[i%chunk])
+            if i%every==0 and t>=tStart: # save results
+                T[j]=t; X[j]=x; j+=1
+                if j==chunk:
+                    yield T,Result(X, self.vrs)
+                    T=np.empty(chunk); X=np.empty((chunk, len(self.vrs))); j=0
+            event(d) # event handler
+        if j: yield T[:j],Result(X[:j], self.vrs)
+        
+    def solveDyn(self, state, timeEnd, fnBC, mode='auto', tol=None, dtMin=None, atol=None):
+        """Solves the dynamic problem
+        state - dictionary with initial state
+        tol, dtMin, atol - adaptive steps (see iterDyn)
+        returns array of time values and Result"""
+        T=R=None # if there are no steps
+        with profiling.phase('simulation'):
+            chunks=list(self.iterDyn(state, timeEnd, fnBC, mode, max(self.steps(timeEnd),1), tol=tol, dtMin=dtMin, atol=atol))
+        if chunks:
+            T=np.concatenate([c[0] for c in chunks])
+            R=Result(np.concatenate([c[1].data for c in chunks]), self.vrs)
+        return T,R
+        
+    def kernelSource(self, bc):
+        """Returns source code of function kernel(X, x, T), which runs the whole time loop
+        over the state vector x and saves steps to X (see createKernel)"""
+        L=['def kernel(X, x, T):',
+           '    for i in range(X.shape[0]):',
+           '        t=T[i]']
+        for n,j in enumerate(self.ib): L.append('        s%d=x[%d]'%(n,j)) # previous values "xp=x"...
+        for n,j in enumerate(self.ip): L.append('        x[%d]=s%d'%(j,n))
+        if isinstance(bc, BC): L+=bc.lines(self.idx, range(len(bc.vrs)), indent='        ') # inlined BC
+        elif len(bc.vrs): # BC hook
+            args=''.join([', x[%d]'%self.idx[a] for a in getattr(bc,'args',())])
+            L.append('        b=bc(t%s)'%args)
+            for n,a in enumerate(bc.vrs): L.append('        x[%d]=b[%d]'%(self.idx[a],n))
+        if self.lins is not None: # x=M*k+m
+            L.append('        x[ic]=step(x[ik])')
+        else: # explicit expressions of current equations
+            names=dict([(a,'k%d'%n) for n,a in enumerate(self.vrsp)])
+            for n,a in enumerate(self.vrsp): L.append('        k%d=x[%d]'%(n,self.idx[a]))
+            names.update([(a,'x[%d]'%self.idx[a] if a in self.idx else 'a%d'%n)
+                          for n,(a,e) in enumerate(self.ceqsi)]) # ordered expressions use unknowns and auxiliary variables
+            pairs=[(names[a],e) for a,e in self.ceqsi]
+            L+=codegen.assigns(pairs, names, indent='        ', ordered=True)
+        L.append('        X[i,:]=x')
+        return '\n'.join(L)+'\n'
+        
+    def createKernel(self, bc, jit=True):
+        """Creates the generated function self.kernel(X, x, T) of the whole time loop.
+        Call it after createCurEqs and compileIndex.
+        bc - BC hook bc(t, *args) of plain floats, which returns the tuple of values of bc.vrs,
+        bc.args - state variables (values at the previous step) passed to bc,
+        or BC (SymPy expressions are inlined into the kernel).
+        jit - compile by numba.njit if numba is installed
+        (then the hook and the functions it calls must be supported by numba)
+        The kernel uses the time step self.dt (create it again after the change of self.dt)"""
+        if self.lin is not None: self.lin=self.lins.at((self.dt,)) # the time step could be changed
+        glb={'bc':bc, 'ik':self.ik, 'ic':self.ic}
+        inline=self.lin is not None and self.lin.lu is None # dense step inlined for numba
+        k=cache.key(getattr(bc,'exprs',[]), 'kernel', self.key, self.vrs, bc.vrs, getattr(bc,'args',()), isinstance(bc, BC),
+                    self.solver, inline, jit) # self.key includes the mode of createCurEqs
+        src=cache.load(k) # kernel source from the cache
+        if src is None:
+            with profiling.phase('kernelSource'):
+                src=self.kernelSource(bc)
+            if inline:
+                src=src.replace('step(x[ik])','np.dot(M, x[ik])+m')
+            cache.save(k, src)
+        if self.lin is not None:
+            jit=jit and self.lin.lu is None # sparse LU is Python only
+            glb.update(M=self.lin.M, m=self.lin.m) if self.lin.lu is None else glb.update(step=self.lin)
+        elif self.lins is not None: # coefficients of parameters, LinStep of their values
+            jit=False
+            glb.update(step=self.lins)
+        elif self.blocks: # linear blocks are solved by LinSteps
+            jit=False
+            glb.update(linBlock=self.linBlock)
+        self.kernelPy=codegen.compileSource(src, 'kernel', glb) # pure Python loop
+        self.kernel=codegen.compileSource(src, 'kernel', glb, jit) if jit else self.kernelPy
+        
+    def solveKernel(self, state, timeEnd, bc, mode='auto', jit=True):
+        """Solves the dynamic problem by the generated kernel (without event handling)
+        state - dictionary with initial state, bc - BC hook or dictionary of SymPy expressions (see createKernel)
+        returns array of time values and Result"""
+        bc=boundary(bc)
+        self.createCurEqs(bc, mode)
+        self.compileIndex(state)
+        self.createKernel(bc, jit)
+        return self.runKernel(state, timeEnd)
+        
+    def runKernel(self, state, timeEnd):
+        """Runs the created kernel (see createKernel) from state (can include parameters)
+        returns array of time values and Result"""
+        n=self.steps(timeEnd) # number of steps
+        T=np.arange(n)*self.dt # time values
+        X=np.empty((n, len(self.vrs))) # results
+        x=self.vector(state) # state vector
+        x[self.idt]=self.dt
+        with profiling.phase('kernel'):
+            try: self.kernel(X, x, T)
+            except Exception: # numba can't compile the BC hook
+                if self.kernel is self.kernelPy: raise
+                self.kernel=self.kernelPy
+                x=self.vector(state)
+                x[self.idt]=self.dt
+                self.kernel(X, x, T)
+        return T,Result(X, self.vrs)
         
+    def solveDynBatch(self, states, timeEnd, bc, params=(), P=None, mode='auto'):
+        """Solves the dynamic problem for N instances of the system together
+        (same topology, different parameters and initial states)
+        states - dictionary with initial state or list of N dictionaries
+        bc - BC hook bc(t, *args) of arrays (values of bc.args for all instances),
+        which returns the tuple of values (arrays or floats) of bc.vrs, or dictionary of SymPy expressions (see BC)
+        params - symbols of parameters, P - array (N, len(params)) of their values
+        returns array of time values and Result with data array (N, steps, vars)"""
+        if isinstance(states, dict): states=[states]*(len(P) if P is not None else 1)
+        N=len(states) # number of instances
+        bc=boundary(bc)
+        self.createCurEqs(bc, mode, params)
+        self.compileIndex(states[0])
+        x=np.empty((N, len(self.vrs))) # state vectors of instances
+        for j,st in enumerate(states):
+            x[j]=[float(st[k]) if k in st else self.defaults.get(k, np.nan) for k in self.vrs]
+        if P is not None: x[:,[self.idx[a] for a in params]]=P
+        x[:,self.idt]=self.dt
+        n=self.steps(timeEnd) # number of steps
+        T=np.arange(n)*self.dt # time values
+        X=np.empty((N, n, len(self.vrs))) # results
+        ibc=[self.idx[a] for a in bc.vrs]
+        iargs=[self.idx[a] for a in getattr(bc,'args',())]
+        with profiling.phase('simulation'):
+            for i in range(n):
+                x[:,self.ip]=x[:,self.ib] # previous values "xp=x"...
+                if isinstance(bc, BC): bc.functions(self.idx)['applyBatch'](x, T[i])
+                else:
+                    for j,v in zip(ibc, bc(T[i], *[x[:,j] for j in iargs])): # update BC
+                        x[:,j]=v
+                if self.lins is not None: x[:,self.ic]=self.lins(x[:,self.ik]) # current values
+                else:
+                    for j,v in zip(self.ic, self.ceqsf(x[:,self.ik].T)): # current values
+                        x[:,j]=v
+                X[:,i,:]=x # save results
+        return T,Result(X, self.vrs)
+
+    def stepsBatch(self, X, T, fnBC):
+        """Makes steps at times T in place of state vectors X (instances, vars),
+        fnBC is called for each instance, current equations are solved for all instances together"""
+        rows=[Row(x, self.idx) for x in X]
+        for t in T:
+            X[:,self.ip]=X[:,self.ib] # previous values "xp=x"...
+            if isinstance(fnBC, BC): fnBC.functions(self.idx)['applyBatch'](X, t)
+            else:
+                for d in rows: # update BC
+                    for k,v in fnBC(d, t).items(): d[k]=v
+            if self.lins is not None: X[:,self.ic]=self.lins(X[:,self.ik]) # current values
+            else:
+                for j,v in zip(self.ic, self.ceqsf(X[:,self.ik].T)): X[:,j]=v
+
+    def solvePeriodic(self, state, period, fnBC, mode='auto', tol=1e-8, maxIter=20):
+        """Periodic steady state for BC fnBC with period by Newton shooting:
+        finds the state of difference equations z (current values of variables with previous values),
+        which the map of one period returns to itself. Sensitivities of the map are obtained
+        by finite differences, the perturbed states are integrated together (see stepsBatch).
+        The time step is aligned to the period (period/n, near self.dt). Events are not handled.
+        Non-smooth BC (e.g. switching of the force by the sign of the velocity) can give the map
+        without a fixed point (e.g. period doubling), then the result is the solution of Levenberg-Marquardt,
+        the warning is issued and self.periodic (statistics of the last call) has converged=False.
+        state - dictionary with initial guess (e.g. the static state)
+        returns array of time values and Result of one period from the periodic state"""
+        fnBC=boundary(fnBC)
+        dt0=self.dt
+        n=max(int(round(period/self.dt)), 1) # steps of the period
+        self.dt=period/n
+        try:
+            with profiling.phase('periodic'):
+                self.createCurEqs(fnBC, mode)
+                self.compileIndex(state)
+                x=self.vector(state)
+                x[self.idt]=self.dt
+                T=np.arange(n)*self.dt # time values
+                m=len(self.ib)
+                J=np.empty((m,m))
+                def residual(z, J=None): # P(z)-z and its Jacobian (if J)
+                    X=np.tile(x, (1 if J is None else m+1, 1))
+                    X[:,self.ib]=z
+                    if J is not None: # perturbed states
+                        e=1e-7*(1.0+np.abs(z))
+                        X[np.arange(1,m+1),self.ib]+=e
+                    self.stepsBatch(X, T, fnBC)
+                    if J is not None: J[:]=((X[1:,self.ib]-X[0,self.ib])/e[:,None]).T-np.eye(m)
+                    return X[0,self.ib]-z
+                z=x[self.ib].copy()
+                converged=False
+                for it in range(maxIter): # Newton method
+                    f=residual(z, J)
+                    if np.abs(f).max()<=tol*(1.0+np.abs(z).max()):
+                        converged=True
+                        break
+                    try: z+=np.linalg.solve(J, -f)
+                    except np.linalg.LinAlgError: break # singular Jacobian
+                    if not np.isfinite(z).all(): break
+                if not converged: # Levenberg-Marquardt
+                    import scipy.optimize
+                    def fj(z): residual(z, J); return J.copy()
+                    z=scipy.optimize.root(residual, x[self.ib].copy(), jac=fj, method='lm').x
+                self.periodic=dict(iterations=it+1, converged=converged,
+                                   residual=float(np.abs(residual(z)).max()))
+                profiling.stat('periodic', self.periodic)
+                if not converged:
+                    warnings.warn('periodic steady state is not found (residual %g)'%self.periodic['residual'])
+                x[self.ib]=z
+                X=np.empty((n, len(self.vrs))) # results of the period
+                for i in range(n):
+                    self.stepsBatch(x[None], T[i:i+1], fnBC)
+                    X[i]=x
+            return T,Result(X, self.vrs)
+        finally:
+            self.dt=dt0
+
+    def export(self, path, state=None, bc=None):
+        """Writes the standalone module (only NumPy is required) of the system after createCurEqs
+        state - dictionary of initial state, bc - dictionary {variable: SymPy expression of t and variables}
+        (see export.system)"""
+        export.system(self, path, state, bc)
+
     def event(self, state): # event handler
         pass
+
+class Stepper(object):
+    """Online solution of the dynamic problem driven by the stream of BC samples
+    (e.g. measured positions of the polished rod): push(t, values) takes the sample of bc at time t
+    and makes steps of the fixed size s.dt up to t (BC are interpolated linearly between samples,
+    so times of samples can be irregular), then returns values of outputs at the time self.t (t-s.dt<self.t<=t).
+    Memory is constant: the state vector self.x, work arrays and the ring buffer self.history
+    of last steps (rows: time and outputs, see last). The step does not allocate arrays, if the current
+    equations are linear and solved by the dense matrix (see LinStep), events are not handled.
+    s - System, state - initial state at the time tStart-s.dt (e.g. the static solution),
+    bc - variables of samples, outputs - returned variables (e.g. the force on the plunger),
+    fnBC - optional function or dictionary of expressions of other BC (e.g. the force on the plunger by the velocity, see BC),
+    size - length of the ring buffer"""
+    def __init__(self, s, state, bc, outputs, fnBC=None, size=1024, mode='auto', params=()):
+        self.fnBC=boundary(fnBC or {})
+        def hook(d, t): pass # variables of all BC for createCurEqs
+        hook.vrs=tuple(bc)+tuple(self.fnBC.vrs)
+        s.createCurEqs(hook, mode, params)
+        s.compileIndex(state)
+        self.s=s
+        self.x=s.vector(state) # state vector
+        self.d=Row(self.x, s.idx) # its view for fnBC
+        self.ibc=np.array([s.idx[v] for v in bc], dtype=int) # columns of samples
+        self.iout=np.array([s.idx[v] for v in outputs], dtype=int) # columns of outputs
+        self.n=0 # number of steps
+        self.tStart=self.t=0.0 # time of the first step, time of the state
+        self.tb=None # time of the last sample
+        self.b=np.empty(len(bc)); self.db=np.empty(len(bc)); self.bi=np.empty(len(bc)) # sample, increment, interpolated
+        self.xb=np.empty(len(s.ib)); self.k=np.empty(len(s.ik)); self.c=np.empty(len(s.ic)) # work arrays
+        self.y=np.empty(len(outputs)) # returned values of outputs
+        self.history=np.full((size, 1+len(outputs)), np.nan) # ring buffer of steps
+        self.M=self.lin=None
+        if s.lins is not None: # coefficients are constant (the time step and parameters)
+            self.lin=s.lins.at(tuple(self.x[s.ik][s.lins.icoef].tolist()))
+            if self.lin.lu is None: self.M,self.m=self.lin.M,self.lin.m # x=M*k+m
+        
+    def step(self, t):
+        """makes one step to time t in place of self.x with BC values self.bi"""
+        s,x=self.s,self.x
+        np.take(x, s.ib, out=self.xb)
+        x[s.ip]=self.xb # previous values "xp=x"...
+        x[self.ibc]=self.bi
+        if isinstance(self.fnBC, BC): self.fnBC.apply(s.idx, x, t)
+        else:
+            for k,v in self.fnBC(self.d, t).items(): self.d[k]=v
+        np.take(x, s.ik, out=self.k)
+        if self.M is not None:
+            np.dot(self.M, self.k, out=self.c)
+            self.c+=self.m
+            x[s.ic]=self.c
+        elif self.lin is not None: x[s.ic]=self.lin(self.k)
+        else: x[s.ic]=s.ceqsf(self.k)
+        row=self.history[self.n%len(self.history)]
+        row[0]=t
+        np.take(x, self.iout, out=row[1:])
+        self.n+=1
+        self.t=t
+        
+    def push(self, t, values):
+        """takes the sample values of bc at time t, makes steps up to t,
+        returns values of outputs (the array is reused by the next push)"""
+        if self.tb is None: # the first sample, the state is before it
+            self.tStart=t; self.t=t-self.s.dt
+            self.tb=t-self.s.dt; self.b[:]=values
+        if t<=self.tb: raise ValueError('time of the sample %g is not after %g'%(t, self.tb))
+        np.subtract(values, self.b, out=self.db)
+        h=self.s.dt
+        while True:
+            tn=self.tStart+self.n*h # time of the next step
+            if tn>t+h*1e-9: break
+            np.multiply(self.db, (tn-self.tb)/(t-self.tb), out=self.bi)
+            self.bi+=self.b
+            self.step(tn)
+        self.b[:]=values; self.tb=t
+        np.take(self.x, self.iout, out=self.y)
+        return self.y
+        
+    def last(self, n=None):
+        """returns the array of last n steps (rows: time and outputs) from the ring buffer"""
+        n=min(n or self.n, self.n, len(self.history))
+        i=np.arange(self.n-n, self.n)%len(self.history)
+        return self.history[i]
+
+class Hybrid(object):
+    """Variable structure system: modes (topology variants) with guarded transitions.
+    All modes are compiled before the simulation, so the switch of the mode is O(1).
+    modes - dict {name: (System, fnBC)}, fnBC - function or dictionary of SymPy expressions (see BC)
+    trans - list of transitions (source, guard, target) or (source, guard, target, mapping)
+    guard - SymPy expression of state variables or function guard(d),
+    the transition fires when the guard changes its sign from <=0 to >0
+    mapping - function mapping(d), which changes the state d at the switch
+    Modes can share the System only if their BC have the same variables"""
+    def __init__(self, modes, trans, mode='auto'):
+        self.modes=dict([(m,(s,boundary(fnBC))) for m,(s,fnBC) in modes.items()])
+        self.trans=dict([(m,[]) for m in modes]) # transitions of each mode
+        for tr in trans:
+            self.trans[tr[0]].append((tr[1], tr[2], tr[3] if len(tr)>3 else None))
+        bcs={} # BC of each System
+        for s,fnBC in self.modes.values(): # compile all modes
+            if set(bcs.setdefault(s, fnBC).vrs)!=set(fnBC.vrs): # the compiled equations of one mode would be lost
+                raise ValueError('modes share the System with different BC variables')
+            s.createCurEqs(fnBC, mode)
+        self.events=[] # switches (t, source, target)
+        
+    def guard(self, g): # guard as function of the state vector x and its view d
+        if not isinstance(g, Basic): return lambda x, d: g(d)
+        vs=sorted(g.free_symbols, key=repr)
+        f=lambdify(vs, g, 'math')
+        cols=[self.idx[v] for v in vs]
+        return lambda x, d: f(*[x[i] for i in cols])
+        
+    def compileIndex(self, state):
+        """Creates the variable index shared by all modes
+        (variables, which are absent in state, are 0.0)
+        returns the full state"""
+        state=dict(state)
+        for s,fnBC in self.modes.values():
+            state.setdefault(DT, s.dt)
+            for k,v in s.defaults.items(): state.setdefault(k, v)
+            for v in list(s.vrsp)+list(s.vrsc)+list(fnBC.vrs): state.setdefault(v, 0.0)
+        for s,fnBC in self.modes.values(): s.compileIndex(state)
+        self.vrs, self.idx = s.vrs, s.idx
+        self.guards=dict([(m,[(self.guard(g),m2,f) for g,m2,f in L]) for m,L in self.trans.items()])
+        return state
+        
+    def iterDyn(self, state, timeEnd, mode, chunk=1024):
+        """Solves the dynamic problem starting in mode and yields results by chunks (see System.iterDyn).
+        The crossing time of the guard is located inside the step by linear interpolation,
+        the state is interpolated to this time and the time grid of the new mode starts from it."""
+        state=self.compileIndex(state)
+        x=np.array([float(state[k]) for k in self.vrs]) # state vector
+        d=Row(x, self.idx)
+        s,fnBC=self.modes[mode]; G=self.guards[mode]
+        g0=[g(x,d) for g,m,f in G] # guards before the step
+        self.events=[]
+        T=np.empty(chunk); X=np.empty((chunk, len(self.vrs))) # chunk of results
+        j=0 # number of saved steps in chunk
+        t0,k=0.0,0 # start of the time grid of the mode, number of step
+        while t0+k*s.dt<timeEnd-s.dt*1e-9:
+            t=t0+k*s.dt
+            x0=x.copy() # state before the step
+            s.step(x, d, t, s.dt, fnBC)
+            k+=1
+            g1=[g(x,d) for g,m,f in G]
+            e=[(g0[i]/(g0[i]-g1[i]),i) for i in range(len(G)) if g0[i]<=0<g1[i]] # fired transitions
+            if e: # switch of the mode at the first crossing
+                theta,i=min(e)
+                x[:]=x0+theta*(x-x0) # state at the crossing
+                t=t-(1.0-theta)*s.dt
+                g,target,mapping=G[i]
+                if mapping: mapping(d)
+                self.events.append((t, mode, target))
+                mode=target; s,fnBC=self.modes[mode]; G=self.guards[mode]
+                t0,k=t,1
+                g1=[g(x,d) for g,m,f in G]
+            g0=g1
+            T[j]=t; X[j]=x; j+=1 # save results
+            if j==chunk:
+                yield T,Result(X, self.vrs)
+                T=np.empty(chunk); X=np.empty((chunk, len(self.vrs))); j=0
+        if j: yield T[:j],Result(X[:j], self.vrs)
+        
+    def solveDyn(self, state, timeEnd, mode):
+        """Solves the dynamic problem starting in mode
+        returns array of time values and Result"""
+        T=R=None
+        with profiling.phase('simulation'):
+            chunks=list(self.iterDyn(state, timeEnd, mode))
+        if chunks:
+            T=np.concatenate([c[0] for c in chunks])
+            R=Result(np.concatenate([c[1].data for c in chunks]), self.vrs)
+        return T,R
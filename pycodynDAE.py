@@ -2,13 +2,18 @@
 """
 Base classes for the easy-to-understand and modify component-oriented acausal hybrid modeling
 Differential-algebraic equations with Assimulo solvers.
+Switching of Piecewise (and Abs) is handled by state events of IDA with discrete modes (see System.events).
 Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
 
 import numpy as np
 from sympy import *
+import cache, codegen, profiling, eliminate, statics, export
 
 t=Symbol('t')
 
+def derivative(v): # derivative variable of v (name_x -> name_Dx)
+    return Symbol(v.name.replace('_','_D',1))
+
 class Translational1D(object):
     """Base class of mechanical 1D components that have translational motion"""
     def __init__(self, name, args):
@@ -65,18 +70,21 @@ class Force(Translational1D):
 class System(object):
     """System of components connected by flanges"""
     def __init__(self, els, eqs):
-        self.els=els # components list
-        self.elsd=dict([(e.name,e) for e in els]) # same, but dict.
-        self.eqs=[] # list of system equations
-        for e in self.els: # for each component
-            self.eqs+=e.eqs # join with component equations
-        self.eqs=self.eqs+eqs # join with additional equations
-        self.eqs=Tuple(*self.eqs)
-        
-    def residualArgs(self,eq):
+        with profiling.phase('System'):
+            self.els=els # components list
+            self.elsd=dict([(e.name,e) for e in els]) # same, but dict.
+            self.eqs=[] # list of system equations
+            for e in self.els: # for each component
+                self.eqs+=e.eqs # join with component equations
+            self.eqs=self.eqs+eqs # join with additional equations
+            self.eqs=Tuple(*self.eqs)
+            self.statics={} # compiled static problems by equations and inputs
+        
+    def residualArgs(self,eq,params=()):
         "returns ordered arguments for residual (functions and derivatives of eq)"
         ss=eq.atoms(Symbol) # set of equation symbols
         ss.discard(t) # without t
+        ss-=set(params) # without parameters
         dss=dict([(i.name,i) for i in ss]) # dict name:symbol
         y=set();yd=set() # function; derivative
         for a in ss:
@@ -93,22 +101,262 @@ class System(object):
         yd=yd_+list(yd-yyd)
         return y,yd
         
-    def residual(self,t,y,yd): # residuals for Assimulo
-        yyd=np.concatenate([[t],y,yd])[:self.nv]
-        r=self.lambdfun(*yyd)
-        return np.array(r)
+    def aliases(self, eq, keep=()):
+        """Eliminates alias equations (x_a=x_b, f_a=-f_b) of eq and aliases of their derivatives
+        (see eliminate.aliases)
+        returns equations and mapping {eliminated variable: s*representative}"""
+        with profiling.phase('aliases'):
+            ss=set(Tuple(*eq).free_symbols)
+            key=lambda v: (derivative(v) not in ss, repr(v)) # variables with derivatives are representatives
+            eqs,alias=eliminate.aliases(eq, keep, key=key, group=lambda v: 'D' in v.name)
+            dm={} # aliases of derivatives
+            for v,e in alias.items():
+                dv=derivative(v)
+                if dv in ss and dv not in keep:
+                    s,r=e.as_coeff_Mul()
+                    dm[dv]=s*derivative(r)
+            eqs=[e.xreplace(dm) for e in eqs]
+            alias.update(dm)
+            return Tuple(*[e for e in eqs if e!=True]), alias
+        
+    def column(self, v, Y, Yd=None):
+        """returns values of variable v from results Y (and Yd for derivatives)
+        also for variables eliminated by aliases"""
+        if v in self.alias:
+            s,r=self.alias[v].as_coeff_Mul()
+            return float(s)*self.column(r, Y, Yd)
+        if v in self.y: return np.asarray(Y)[:,self.y.index(v)]
+        return np.asarray(Yd)[:,self.yd.index(v)]
+        
+    def readArgs(self, L, exprs, pk):
+        """appends to lines L the reading of arguments y, yd, p used by exprs
+        returns names of symbols"""
+        names={t:'t'}
+        free=set().union(*[e.free_symbols for e in exprs])
+        for a,vs in (('y',self.y),('yd',self.yd),('p',pk)): # read by index
+            for i,v in enumerate(vs):
+                if v in free:
+                    names[v]='%s%d'%(a,i)
+                    L.append('    %s%d=%s[%d]'%(a,i,a,i))
+        return names
+        
+    def residualSource(self, eq, pk):
+        """returns source code of function residual(out, t, y, yd, p),
+        which writes residuals of eq into the preallocated array out"""
+        eq0=[e.rhs-e.lhs for e in eq]
+        L=['def residual(out, t, y, yd, p):']
+        names=self.readArgs(L, eq0, pk)
+        L+=codegen.assigns([('out[%d]'%i,e) for i,e in enumerate(eq0)], names)
+        L.append('    return out')
+        return '\n'.join(L)+'\n'
+        
+    def jacobianSource(self, eq, pk):
+        """returns source code of function jacobian(J, c, t, y, yd, p),
+        which writes nonzero elements of dense Jacobian dF/dy+c*dF/dyd of eq into the zeroed array J,
+        and the list of their indexes (i, j)"""
+        r=dict([(v,Symbol(v.name, real=True)) for v in self.y+self.yd]) # real symbols (for Abs, sign)
+        ri=dict([(b,a) for a,b in r.items()])
+        c=Dummy('c')
+        J={}
+        for i,e in enumerate(eq):
+            f=(e.rhs-e.lhs).xreplace(r)
+            for j,v in enumerate(self.y): J[i,j]=f.diff(r[v])
+            for j,v in enumerate(self.yd): J[i,j]=J.get((i,j),0)+c*f.diff(r[v])
+        J=[(ij, e.xreplace(ri)) for ij,e in sorted(J.items()) if e!=0]
+        pairs=[('J[%d,%d]'%ij, e) for ij,e in J]
+        L=['def jacobian(J, c, t, y, yd, p):']
+        names=self.readArgs(L, [e for n,e in pairs], pk)
+        names[c]='c'
+        L+=codegen.assigns(pairs, names)
+        L.append('    return J')
+        return '\n'.join(L)+'\n', [ij for ij,e in J]
+        
+    def residual(self,t,y,yd,sw=None): # residuals for Assimulo (array self.out is overwritten by the next call)
+        return self.resfun(self.out, t, y, yd, self.pv)
+        
+    def events(self, eq, params=()):
+        """Extracts switching of Piecewise of eq (also Abs) into state events:
+        each switching function g of conditions (g<0, g>=0...) gets the discrete mode variable
+        (1.0 if g>=0 else 0.0), which replaces conditions, so in each mode the residual is smooth
+        returns equations, switching functions and mode variables"""
+        eq=Tuple(*eq).replace(Abs, lambda g: Piecewise((g, g>=0), (-g, True)))
+        G,modes,reps=[],[],{}
+        for pw in sorted(eq.atoms(Piecewise), key=repr):
+            for r in sorted(Tuple(*[c for e,c in pw.args]).atoms(Rel), key=repr):
+                g=r.lhs-r.rhs
+                if isinstance(r,(Eq,Ne)) or g.free_symbols<=set(params): continue # not a switching
+                pos=isinstance(r,(Gt,Ge)) # condition of the mode g>=0
+                if g.could_extract_minus_sign(): g,pos=-g,not pos
+                if g not in G:
+                    G.append(g)
+                    modes.append(Symbol('mode%d'%len(modes)))
+                q=modes[G.index(g)]
+                reps[r]=q>0.5 if pos else q<0.5
+        return eq.xreplace(reps), G, modes
+        
+    def rootsSource(self, G, pk):
+        """returns source code of function roots(out, t, y, yd, p),
+        which writes values of switching functions G into the preallocated array out"""
+        L=['def roots(out, t, y, yd, p):']
+        names=self.readArgs(L, G, pk)
+        L+=codegen.assigns([('out[%d]'%i,g) for i,g in enumerate(G)], names)
+        L.append('    return out')
+        return '\n'.join(L)+'\n'
+        
+    def createRoots(self, G, pk, jit=False):
+        """Creates the function self.rootfun of switching functions G (after createResidual)"""
+        G=Tuple(*G)
+        while True: # eliminated variables by representatives
+            g=G.xreplace(self.alias)
+            if g==G: break
+            G=g
+        unknown=G.free_symbols-set(self.y+self.yd+pk+[t])
+        if unknown: raise ValueError('switching functions of unknown variables %s'%sorted(unknown, key=repr))
+        self.gout=np.zeros(len(G)) # preallocated values
+        self.rootfun=codegen.compileSource(self.rootsSource(G, pk), 'roots', jit=jit)
+        
+    def stateEvents(self, t, y, yd, sw=None): # switching functions for Assimulo (array self.gout is overwritten)
+        return self.rootfun(self.gout, t, y, yd, self.pv)
+        
+    def handleEvent(self, solver, info):
+        """switches modes of crossed switching functions and restarts IDA from consistent values"""
+        for i,e in enumerate(info[0]):
+            if e: solver.sw[i]=e>0 # 1 - crossing upwards
+        self.pv[self.imodes]=solver.sw
+        self.nevents+=1
+        solver.make_consistent('IDA_YA_YDP_INIT')
+        
+    def createJacobian(self, eq, pk, jit=False):
+        """Creates the function self.jacfun of the Jacobian (see jacobianSource),
+        the preallocated matrix self.J and indexes self.jij of its nonzero elements"""
+        k=cache.key(eq, 'jacobian', self.y, self.yd, pk, cache.sourceHash(self.els))
+        c=cache.load(k)
+        if c is None:
+            eq=self.aliases(eq,pk)[0]
+            with profiling.phase('createJacobian'):
+                c=self.jacobianSource(eq, pk)
+            cache.save(k, c)
+        src,self.jij=c
+        self.jacfun=codegen.compileSource(src, 'jacobian', jit=jit)
+        self.J=np.zeros((len(self.out),len(self.y))) # elements out of self.jij stay zero
+        self.jsp=None # sparse Jacobian (the pattern is created once)
+        
+    def sparsePattern(self):
+        """Creates the CSC matrix self.jsp of the pattern of self.J
+        and rows self.jr, columns self.jc of its elements in CSC order"""
+        import scipy.sparse
+        n,m=self.J.shape
+        ij=np.array(self.jij, dtype=int).reshape(-1,2)
+        keys=np.unique(ij[:,1]*n+ij[:,0]) # CSC order: by columns, then by rows
+        self.jr,self.jc=keys%n,keys//n
+        indptr=np.searchsorted(self.jc, np.arange(m+1))
+        self.jsp=scipy.sparse.csc_matrix((np.zeros(len(keys)), self.jr, indptr), shape=(n,m))
+        
+    def jacobian(self, c, t, y, yd, sw=None, sparse=False):
+        """returns Jacobian dF/dy+c*dF/dyd for Assimulo (dense array or sparse CSC matrix,
+        both are overwritten by the next call)"""
+        J=self.jacfun(self.J, c, t, y, yd, self.pv)
+        if sparse:
+            if self.jsp is None: self.sparsePattern()
+            self.jsp.data[:]=J[self.jr,self.jc]
+            return self.jsp
+        return J
+        
+    def jacv(self, t, y, yd, res, v, c, sw=None): # Jacobian-vector product by sparse Jacobian
+        return self.jacobian(c, t, y, yd, sparse=True).dot(v)
             
-    def solveDAE(self, eq, state, stopTime=10.0):
+    def applyBC(self, eq, bc):
+        """returns equations eq with boundary conditions bc {variable: SymPy expression of t and variables}
+        (the same dictionary as for pycodyn, see pycodyn.BC), derivatives of variables with BC of time
+        are replaced by derivatives of expressions (e.g. the velocity of the upper point)"""
+        reps=dict([(v,sympify(e)) for v,e in bc.items()])
+        fs=Tuple(*eq).free_symbols
+        for v,e in list(reps.items()):
+            dv=derivative(v)
+            if dv in fs and dv not in reps:
+                if e.free_symbols-set([t]): raise ValueError('derivative %s of BC of state variables'%dv)
+                reps[dv]=e.diff(t)
+        return Tuple(*eq).xreplace(reps)
+
+    def solveDAE(self, eq, state, stopTime=10.0, ncp=0, params=None, jac='dense', jit=False, bc=None, events=True):
         """Solves dynamic task with Assimulo (ODASSL, IDA)
-        state - dictionary with initial state"""
-        y,yd=self.residualArgs(eq)
-        self.y=y
-        self.yd=yd
-        self.nv=len(y+yd)+1 # number of arguments for lambdfun (with t)
-        eq0=[e.rhs-e.lhs for e in eq]
-        self.lambdfun=lambdify([t]+y+yd,eq0,'numpy')
-        #import inspect
-        #print(inspect.getsource(self.lambdfun))
+        state - dictionary with initial state
+        ncp - number of communication points (0 - internal steps of the solver)
+        params - dictionary with values of parameters (symbols of eq, which are constant)
+        jac - analytic Jacobian: 'dense', 'sparse' (CSC matrix for Jacobian-vector products
+        of the iterative linear solver SPGMR) or None (finite differences of IDA)
+        jit - compile the residual and the Jacobian by numba.njit if numba is installed
+        bc - dictionary of boundary conditions (see applyBC)
+        events - switching of Piecewise by state events (see events)"""
+        if bc: eq=self.applyBC(eq, bc)
+        sim=self.createDAE(eq, state, params, jac, jit, events)
+        with profiling.phase('simulation'):
+            T, Y, Yd = sim.simulate(stopTime, ncp)
+        self.statistics(sim)
+        #sim.plot()
+        return T, Y, Yd 
+        
+    def statistics(self, sim): # save options and statistics of the solver to the profile
+        if not profiling.active: return
+        profiling.stat('IDA options', dict(sim.get_options()))
+        st=getattr(sim,'statistics',None)
+        if st is not None: profiling.stat('IDA', dict([(k,st[k]) for k in st.keys()]))
+        if getattr(self,'imodes',None): profiling.stat('events', self.nevents)
+        
+    def iterDAE(self, eq, state, stopTime=10.0, window=1.0, ncp=0, params=None, jac='dense', jit=False, bc=None, events=True):
+        """Solves dynamic task with Assimulo by time windows and yields results of windows
+        (memory does not grow with stopTime)
+        window - duration of window, ncp - number of communication points in window
+        yields arrays T, Y, Yd of windows"""
+        if bc: eq=self.applyBC(eq, bc)
+        sim=self.createDAE(eq, state, params, jac, jit, events)
+        tw=0.0 # end of window
+        n=0 # number of points returned by previous windows
+        while tw<stopTime:
+            tw=min(tw+window, stopTime)
+            with profiling.phase('simulation'):
+                T, Y, Yd = sim.simulate(tw, ncp)
+            self.statistics(sim)
+            T, Y, Yd = np.array(T)[n:], np.array(Y)[n:], np.array(Yd)[n:]
+            sol=[getattr(sim,a,None) for a in ('t_sol','y_sol','yd_sol')]
+            if all([isinstance(i,list) for i in sol]): # release the solution of the solver
+                for i in sol: del i[:]
+                n=0
+            else: n+=len(T)
+            yield T, Y, Yd
+        
+    def createResidual(self, eq, params=None, jac='dense', jit=False):
+        """Creates the residual self.residual (and the Jacobian self.jacobian) of eq
+        jit - compile the residual and the Jacobian by numba.njit if numba is installed"""
+        params=params or {}
+        pk=sorted(params, key=repr)
+        k=cache.key(eq, 'solveDAE', pk, cache.sourceHash(self.els))
+        with profiling.phase('createResidual'):
+            c=cache.load(k) # generated residual from the cache
+            if c is None:
+                eq,alias=self.aliases(eq,pk)
+                self.y,self.yd=self.residualArgs(eq,pk)
+                with profiling.phase('residualSource'):
+                    c=self.y,self.yd,self.residualSource(eq,pk),alias,len(eq)
+                cache.save(k, c)
+            y,yd,src,self.alias,n=c
+            self.y=y
+            self.yd=yd
+            self.pv=np.array([params[i] for i in pk], dtype=float) # values of parameters
+            self.out=np.zeros(n) # preallocated residuals
+            self.resfun=codegen.compileSource(src, 'residual', jit=jit)
+            if jac: self.createJacobian(eq, pk, jit)
+        
+    def createDAE(self, eq, state, params=None, jac='dense', jit=False, events=True):
+        """Creates the residual (and the Jacobian) and returns Assimulo solver IDA of the problem
+        events - switching of Piecewise by state events (see events)"""
+        params=dict(params or {})
+        G,modes=[],[]
+        if events:
+            eq,G,modes=self.events(eq, params)
+            params.update([(q,1.0) for q in modes]) # modes are parameters of the residual
+        self.createResidual(eq, params, jac, jit)
+        y,yd=self.y,self.yd
         
         y0=[state[i] for i in y] # initial conditions
         yd0=[state[i] for i in yd]
@@ -117,25 +365,51 @@ class System(object):
         if dn>0: yd0+=[0.0]*dn
         else: y0+=[0.0]*abs(dn)
         
+        self.imodes=[] # indexes of modes in self.pv
+        sw0=None # initial modes
+        if G:
+            pk=sorted(params, key=repr)
+            self.createRoots(G, pk, jit)
+            self.imodes=[pk.index(q) for q in modes]
+            sw0=[bool(g>=0) for g in self.rootfun(self.gout, 0.0, np.array(y0,dtype=float), np.array(yd0,dtype=float), self.pv)]
+            self.pv[self.imodes]=sw0
+            self.nevents=0
+        
         from assimulo.problem import Overdetermined_Problem,Implicit_Problem
         from assimulo.solvers import ODASSL,IDA
         
         # model = Overdetermined_Problem(self.residual, y0=y0, yd0=yd0)
         # sim = ODASSL(model)
         
-        model = Implicit_Problem(self.residual, y0=y0, yd0=yd0)
+        model = Implicit_Problem(profiling.wrap(self.residual,'residual'), y0=y0, yd0=yd0, sw0=sw0)
         model.algvar = [1]*len(yd)+[0]*dn #[1,1,1,0,0,0,0,0] 
+        if jac=='sparse': model.jacv = profiling.wrap(self.jacv,'jacobian')
+        elif jac: model.jac = profiling.wrap(self.jacobian,'jacobian')
+        if G:
+            model.state_events = profiling.wrap(self.stateEvents,'roots')
+            model.handle_event = self.handleEvent
         sim = IDA(model)
         sim.suppress_alg = True
-        print(sim.get_options())
+        if jac=='sparse': sim.linear_solver = 'SPGMR'
+        if jac: sim.usejac = True # also for jacv of SPGMR
+        return sim
         
-        T, Y, Yd = sim.simulate(stopTime)
-        #sim.plot()
-        return T, Y, Yd 
+    def export(self, path, eq, state=None, params=None):
+        """Writes the standalone module (only NumPy is required) of the residual and the Jacobian of eq
+        state - dictionary of initial state, params - values of parameters (see export.dae)"""
+        export.dae(self, path, eq, state, params)
+        
+    def static(self, eq, inputs):
+        """returns the static problem of eq compiled once for known variables inputs (see statics.Static)"""
+        k=(eq, frozenset(inputs))
+        if k not in self.statics:
+            self.statics[k]=statics.Static(eq, sorted(inputs, key=repr))
+        return self.statics[k]
         
     def solve(self,eq,ics): # for static tasks
-        eq=eq.subs(ics)
-        return solve(eq) # sympy solver
+        st=self.static(Tuple(*eq), ics) # compiled with ics as arguments
+        with profiling.phase('static solve'):
+            return st(ics)
 
 def prnt(eq): # eqations printing        
     print('\nEquations=')
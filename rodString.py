@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Builder of the multi-section sucker rod string (Euler method).
+[s1]---[m1]-+-[s2]---[m2]-+- ... -[sN]---[mN]-+
+            |             |                   |
+           [f1]          [f2]                [fN]+[fp]
+The equations of the string are banded, so they are solved by the band LU (see BandLU).
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+from pycodyn import *
+
+class RodString(System):
+    """Chain of sections of the rod string
+    sections - list of (c, d, m, weight) of sections (numbers or SymPy symbols of parameters),
+    weight is applied at the lower end of the section.
+    Boundary conditions: position of the upper point self.top and force on the plunger self.plunger
+    Classes of components can be replaced in subclasses (e.g. by trapComponents)"""
+    solver='banded'
+    Mass, SpringDamper, Force = Mass, SpringDamper, Force # classes of components
+    def __init__(self, sections, eqs=()):
+        self.springs=[]; self.masses=[]; self.forces=[]
+        for i,(c,d,m,w) in enumerate(sections):
+            self.springs.append(self.SpringDamper(name='s%d'%(i+1), c=c, d=d))
+            self.masses.append(self.Mass(name='m%d'%(i+1), m=m))
+            self.forces.append(self.Force(name='f%d'%(i+1), f=w))
+        self.fp=self.Force(name='fp') # force on the plunger
+        peqs=[]
+        for i,(s,m,f) in enumerate(zip(self.springs, self.masses, self.forces)):
+            peqs+=s.pinEqs(1,[m.pins[0]])
+            lower=self.springs[i+1] if i+1<len(sections) else self.fp # next section or plunger
+            peqs+=m.pinEqs(1,[lower.pins[0], f.pins[0]])
+        System.__init__(self, els=self.springs+self.masses+self.forces+[self.fp], eqs=peqs+list(eqs))
+        self.top=self.springs[0].x1 # position of the upper point
+        self.plunger=self.fp.f # force on the plunger
+
+    def staticICs(self, plunger):
+        """returns ICs of the static problem (string at rest, upper point at 0) with force plunger"""
+        ics={self.top:0.0, self.springs[0].x1p:0.0, self.plunger:plunger}
+        for e in self.masses+self.springs: # zero velocities and accelerations
+            for k in ('v','vp','a','ap','v1p','v2p'):
+                if isinstance(getattr(e,k,None), Symbol): ics[getattr(e,k)]=0.0
+        return ics
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Long-running simulation service of dynamometer cards of rod strings (see rodString.py)
+with warm compiled models and batching of requests (only the standard library and NumPy).
+The asyncio server (localhost HTTP or HTTP over the Unix socket) groups concurrent requests
+with the same topology (number of sections, time step) into one vectorized batch (see System.solveDynBatch),
+batches are solved in a process pool, each worker process keeps the LRU of compiled models.
+Request (POST /card, JSON):
+    {"sections": [[c, d, m, weight], ...], "stroke": 2.1, "spm": 6.4, "fr": -18499.0, "periods": 2, "dt": 0.1}
+    sections - stiffness, damping, mass and weight of sections, stroke - stroke of the upper point (m),
+    spm - strokes per minute, fr - liquid weight above the plunger, periods - number of simulated periods
+Response: the card of the last period {"t": [...], "x": [...], "f": [...], "xp": [...], "batch": size}
+    x, f - position and force of the upper point, xp - position of the plunger, batch - size of the batch
+GET /stats returns statistics of the service.
+Usage:
+    python service.py [--port 8765] [--unix /tmp/pycodyn.sock] [--workers 2] [--warm 2,5]
+    card=service.post({"sections": [[114926.0, 5458.0, 2112.0, -18494.0]]}) # client
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import time, json, signal, socket, asyncio, argparse, traceback
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+defaults=dict(stroke=2.1, spm=6.4, fr=-18499.0, periods=2, dt=0.1) # default values of the request
+maxModels=8 # max number of compiled models of the worker process
+models=OrderedDict() # LRU of compiled models of the worker process {topology: Model}
+
+class Model(object):
+    """Compiled model of the string of n sections with the time step dt,
+    values of parameters of sections and BC are arguments (see System.solveDynBatch)"""
+    def __init__(self, n, dt):
+        import numpy as np
+        import rodString
+        from sympy import symbols
+        self.params=[]
+        sections=[]
+        for i in range(n):
+            p=symbols('c%d d%d m%d w%d'%((i+1,)*4)) # stiffness, damping, mass, weight
+            sections.append(p)
+            self.params+=p
+        A,N,FR=symbols('A n fr') # amplitude, frequency, liquid weight
+        self.params+=[A,N,FR]
+        s=self.s=rodString.RodString(sections)
+        s.dt=dt
+        def bc(t, v, A, n, fr):
+            """boundary conditions at time t for bc.vrs of all instances (arrays)"""
+            F=np.where(v>0, fr, 0.0) # force on the pump plunger
+            return A*np.sin(2*np.pi*n*t), F*np.tanh(np.abs(v)/0.01)
+        bc.vrs=s.top, s.plunger
+        bc.args=s.masses[-1].v, A, N, FR
+        self.bc=bc
+        s.createCurEqs(bc, 'auto', self.params)
+
+    def run(self, reqs):
+        """simulates requests reqs together, returns list of cards (or errors)"""
+        import numpy as np
+        s=self.s
+        res=[None]*len(reqs)
+        ok,states,P=[],[],[]
+        for j,r in enumerate(reqs):
+            try: # static problem of the instance
+                p=[float(v) for sc in r['sections'] for v in sc]+[r['stroke']/2, r['spm']/60.0, r['fr']]
+                ics=s.staticICs(r['fr'])
+                ics.update(zip(self.params, p))
+                states.append(s.solve(ics)); P.append(p); ok.append(j)
+            except Exception as e:
+                res[j]=dict(error='%s: %s'%(type(e).__name__, e))
+        if not ok: return res
+        ends=[reqs[j]['periods']*60.0/reqs[j]['spm'] for j in ok] # end times of instances
+        T,R=s.solveDynBatch(states, max(ends), self.bc, self.params, np.array(P))
+        x,f,xp=R[s.top],R[s.springs[0].f1],R[s.masses[-1].x]
+        for i,(j,end) in enumerate(zip(ok, ends)):
+            k=(T>end-60.0/reqs[j]['spm'])&(T<end) # last period
+            if not np.isfinite(x[i][k]).all() or not np.isfinite(f[i][k]).all():
+                res[j]=dict(error='the solution is not finite')
+            else:
+                res[j]=dict(t=T[k].tolist(), x=x[i][k].tolist(), f=f[i][k].tolist(), xp=xp[i][k].tolist(), batch=len(ok))
+        return res
+
+def model(key):
+    """returns the compiled model of topology key (n, dt) from the LRU of the worker process"""
+    if key in models: models.move_to_end(key)
+    else:
+        models[key]=Model(*key)
+        if len(models)>maxModels: models.popitem(last=False) # least recently used
+    return models[key]
+
+def init(size, warm):
+    """initializer of the worker process: sets the size of the LRU and compiles models of topologies warm"""
+    global maxModels
+    maxModels=size
+    for key in warm: model(key)
+
+def runBatch(key, reqs):
+    """solves requests reqs of topology key in the worker process"""
+    return model(key).run(reqs)
+
+def request(r):
+    """returns the request r (dictionary) with default values and its topology, raises ValueError"""
+    if not isinstance(r, dict) or not r.get('sections'): raise ValueError('sections are required')
+    r=dict(defaults, **r)
+    if any([len(sc)!=4 for sc in r['sections']]): raise ValueError('section is [c, d, m, weight]')
+    for k in ('stroke','spm','fr','dt'): r[k]=float(r[k])
+    r['periods']=int(r['periods'])
+    if r['spm']<=0 or r['dt']<=0 or r['periods']<1: raise ValueError('spm, dt and periods must be positive')
+    return r, (len(r['sections']), r['dt'])
+
+class Service(object):
+    """asyncio service, which batches concurrent requests with the same topology
+    window - time (s) of collecting of the batch, maxBatch - max size of the batch"""
+    def __init__(self, workers=None, window=0.01, maxBatch=64, size=maxModels, warm=()):
+        self.window=window; self.maxBatch=maxBatch
+        self.pool=ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'), # without sockets of the server
+                                      initializer=init, initargs=(size, list(warm)))
+        self.queues={} # waiting requests of topologies {topology: [(request, future), ...]}
+        self.stats=dict(requests=0, errors=0, batches=0, instances=0, time=0.0, start=time.time())
+
+    async def card(self, r):
+        """returns the card of the request r (dictionary)"""
+        r,key=request(r)
+        loop=asyncio.get_running_loop()
+        fut=loop.create_future()
+        q=self.queues.setdefault(key, [])
+        q.append((r, fut))
+        if len(q)>=self.maxBatch: self.flush(key, q)
+        elif len(q)==1: loop.call_later(self.window, self.flush, key, q)
+        return await fut
+
+    def flush(self, key, q):
+        """sends waiting requests q of topology key to the process pool as one batch"""
+        if self.queues.get(key) is not q: return # already sent (full batch)
+        del self.queues[key]
+        asyncio.ensure_future(self.batch(key, q))
+
+    async def batch(self, key, q):
+        start=time.time()
+        try:
+            res=await asyncio.get_running_loop().run_in_executor(self.pool, runBatch, key, [r for r,f in q])
+        except Exception as e: # e.g. failure of compilation or the worker process
+            res=[dict(error='%s: %s'%(type(e).__name__, e))]*len(q)
+        self.stats['batches']+=1
+        self.stats['instances']+=len(q)
+        self.stats['time']+=time.time()-start
+        for (r,f),x in zip(q, res):
+            if not f.done(): f.set_result(x)
+
+    async def handle(self, reader, writer):
+        """handles one HTTP request of the connection"""
+        status,res='200 OK',None
+        try:
+            method,path=(await reader.readline()).decode('latin-1').split()[:2]
+            headers={}
+            while True:
+                line=(await reader.readline()).decode('latin-1').strip()
+                if not line: break
+                k,v=line.split(':', 1)
+                headers[k.strip().lower()]=v.strip()
+            body=await reader.readexactly(int(headers.get('content-length', 0)))
+            if method=='POST' and path=='/card':
+                self.stats['requests']+=1
+                res=await self.card(json.loads(body.decode('utf-8')))
+                if 'error' in res: status='422 Unprocessable Entity'
+            elif method=='GET' and path=='/stats':
+                res=dict(self.stats, uptime=time.time()-self.stats['start'], waiting=sum(map(len, self.queues.values())))
+            else: status,res='404 Not Found',dict(error='unknown path %s %s'%(method, path))
+        except (ValueError, KeyError, TypeError) as e: # bad request
+            status,res='400 Bad Request',dict(error='%s: %s'%(type(e).__name__, e))
+        except Exception as e:
+            status,res='500 Internal Server Error',dict(error='%s: %s'%(type(e).__name__, e))
+            traceback.print_exc()
+        if not status.startswith('200'): self.stats['errors']+=1
+        data=json.dumps(res).encode('utf-8')
+        writer.write(('HTTP/1.1 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n'
+                      %(status, len(data))).encode('latin-1')+data)
+        try: await writer.drain()
+        finally: writer.close()
+
+async def serve(host='127.0.0.1', port=8765, unix=None, **kw):
+    """runs the service on localhost port or Unix socket unix, kw - arguments of Service"""
+    svc=Service(**kw)
+    await asyncio.get_running_loop().run_in_executor(svc.pool, len, ()) # start of worker processes
+    if unix: server=await asyncio.start_unix_server(svc.handle, unix)
+    else: server=await asyncio.start_server(svc.handle, host, port)
+    print('pycodyn service on %s'%(unix or '%s:%d'%(host, port)))
+    try: asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel) # stop
+    except (NotImplementedError, AttributeError): pass # Windows
+    try:
+        async with server: await server.serve_forever()
+    finally:
+        svc.pool.shutdown()
+
+def post(r, path='/card', host='127.0.0.1', port=8765, unix=None, method='POST'):
+    """client: sends request r (dictionary) to the service, returns the response (dictionary)"""
+    body=json.dumps(r).encode('utf-8') if r is not None else b''
+    if unix:
+        sock=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix)
+    else: sock=socket.create_connection((host, port))
+    with sock:
+        sock.sendall(('%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                      %(method, path, len(body))).encode('latin-1')+body)
+        f=sock.makefile('rb')
+        f.readline() # status line
+        n=0
+        for line in iter(f.readline, b'\r\n'):
+            k,v=line.decode('latin-1').split(':', 1)
+            if k.strip().lower()=='content-length': n=int(v)
+        return json.loads(f.read(n).decode('utf-8'))
+
+if __name__=='__main__':
+    ap=argparse.ArgumentParser(description='Simulation service of dynamometer cards of rod strings')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--unix', help='Unix socket instead of the TCP port')
+    ap.add_argument('--workers', type=int, help='number of worker processes (number of cores if omitted)')
+    ap.add_argument('--window', type=float, default=0.01, help='time (s) of collecting of the batch')
+    ap.add_argument('--models', type=int, default=maxModels, help='size of the LRU of compiled models')
+    ap.add_argument('--warm', help='numbers of sections of models compiled at start, e.g. 2,5')
+    a=ap.parse_args()
+    warm=[(int(n), defaults['dt']) for n in a.warm.split(',')] if a.warm else []
+    try: asyncio.run(serve(a.host, a.port, a.unix, workers=a.workers, window=a.window, size=a.models, warm=warm))
+    except (KeyboardInterrupt, asyncio.CancelledError): pass
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Writers of simulation results by chunks (see System.iterDyn, System.iterDAE).
+Each sink has methods write(T, R) and close(). Rows are time value and the values of columns.
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import struct, zipfile, os, io, tempfile
+import numpy as np
+
+class Sink(object):
+    """Base class of sinks
+    columns - symbols or names of saved variables (None - all variables)"""
+    def __init__(self, columns=None):
+        self.columns=columns
+        self.cols=None # indexes of columns
+        self.rows=0 # number of written rows
+
+    def rowsOf(self, T, R): # array of rows [t, columns...]
+        if self.cols is None:
+            if self.columns is None: self.columns=R.vrs
+            self.cols=[R.idx[c] for c in self.columns]
+            self.names=['t']+[c if isinstance(c,str) else repr(c) for c in self.columns]
+            self.open()
+        return np.column_stack([T, R.data[:,self.cols]])
+
+    def write(self, T, R):
+        rows=self.rowsOf(T, R)
+        self.writeRows(rows)
+        self.rows+=len(rows)
+
+    def open(self): pass
+    def writeRows(self, rows): pass
+    def close(self): pass
+
+class CsvSink(Sink):
+    """CSV file with the header row of names"""
+    def __init__(self, path, columns=None, delimiter=';', fmt='%.10g'):
+        Sink.__init__(self, columns)
+        self.path=path; self.delimiter=delimiter; self.fmt=fmt
+    def open(self):
+        self.f=open(self.path,'w')
+        self.f.write(self.delimiter.join(self.names)+'\n')
+    def writeRows(self, rows):
+        np.savetxt(self.f, rows, fmt=self.fmt, delimiter=self.delimiter)
+    def close(self):
+        if self.cols is not None: self.f.close()
+
+def npyHeader(shape, size=128):
+    """returns .npy header (version 1.0) of float64 array with fixed size in bytes"""
+    h="{'descr': '<f8', 'fortran_order': False, 'shape': %r, }"%(tuple(shape),)
+    magic=b'\x93NUMPY\x01\x00'
+    h=h.ljust(size-len(magic)-2-1)+'\n'
+    return magic+struct.pack('<H',len(h))+h.encode('latin1')
+
+class NpySink(Sink):
+    """.npy file of array (rows, 1+columns) growing by chunks
+    (the header is rewritten with the final shape on close)"""
+    def __init__(self, path, columns=None):
+        Sink.__init__(self, columns)
+        self.path=path
+    def open(self):
+        self.f=open(self.path,'wb')
+        self.f.write(npyHeader((0, len(self.names))))
+    def writeRows(self, rows):
+        self.f.write(np.ascontiguousarray(rows, dtype='<f8').tobytes())
+    def close(self):
+        if self.cols is None: return
+        self.f.seek(0)
+        self.f.write(npyHeader((self.rows, len(self.names))))
+        self.f.close()
+
+class NpzSink(NpySink):
+    """.npz file with arrays data (rows, 1+columns) and names"""
+    def __init__(self, path, columns=None):
+        fd,tmp=tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        NpySink.__init__(self, tmp, columns)
+        self.npz=path
+    def close(self):
+        if self.cols is None: return
+        NpySink.close(self)
+        b=io.BytesIO()
+        np.save(b, np.array(self.names))
+        with zipfile.ZipFile(self.npz, 'w', zipfile.ZIP_STORED, allowZip64=True) as z:
+            z.write(self.path, 'data.npy') # by blocks, without loading to memory
+            z.writestr('names.npy', b.getvalue())
+        os.remove(self.path)
+
+class MemmapSink(Sink):
+    """memory-mapped .npy array (rows, 1+columns) with preallocated number of rows
+    (self.array is available during simulation, unused rows are NaN)"""
+    def __init__(self, path, rows, columns=None):
+        Sink.__init__(self, columns)
+        self.path=path; self.maxRows=rows
+    def open(self):
+        self.array=np.lib.format.open_memmap(self.path, mode='w+', dtype=float, shape=(self.maxRows, len(self.names)))
+        self.array[:]=np.nan
+    def writeRows(self, rows):
+        self.array[self.rows:self.rows+len(rows)]=rows
+    def close(self):
+        if self.cols is not None: self.array.flush()
+
+class Hdf5Sink(Sink):
+    """HDF5 file with resizable dataset (requires h5py)"""
+    def __init__(self, path, columns=None, dataset='data'):
+        Sink.__init__(self, columns)
+        self.path=path; self.dataset=dataset
+    def open(self):
+        import h5py
+        self.f=h5py.File(self.path, 'w')
+        self.d=self.f.create_dataset(self.dataset, (0, len(self.names)), maxshape=(None, len(self.names)), dtype='f8', chunks=True)
+        self.d.attrs['names']=[n.encode() for n in self.names]
+    def writeRows(self, rows):
+        self.d.resize(self.rows+len(rows), axis=0)
+        self.d[self.rows:]=rows
+    def close(self):
+        if self.cols is not None: self.f.close()
+
+class DAEResult(object):
+    """Result-like view of arrays Y of Assimulo with columns of variables y"""
+    def __init__(self, Y, y):
+        self.data=np.asarray(Y)
+        self.vrs=list(y)
+        self.idx=dict([(v,i) for i,v in enumerate(self.vrs)])
+        self.idx.update([(repr(v),i) for i,v in enumerate(self.vrs)])
+
+def stream(chunks, sinks, y=None):
+    """writes chunks (T, R) of iterDyn or (T, Y, Yd) of iterDAE to the list of sinks
+    y - variables of columns of Y or pycodynDAE.System (for iterDAE)
+    returns number of rows"""
+    rows=0
+    try:
+        for c in chunks:
+            T,R=c[0],c[1]
+            if not hasattr(R,'idx'): R=DAEResult(R, getattr(y,'y',y))
+            for s in sinks: s.write(T, R)
+            rows+=len(T)
+    finally:
+        for s in sinks: s.close()
+    return rows
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Static problems compiled once with the known inputs as arguments (for many load cases).
+Linear problems are solved by the factorized matrix (see pycodyn.LinStep),
+nonlinear ones - by Newton method with the analytic Jacobian, warm-started from the previous solution.
+Usage:
+    st=Static(s.eqs, [f2.f, m1.v, ...]) # or s.static(ics)
+    d=st({f2.f:-34692.0, m1.v:0.0, ...}) # dictionary of all variables
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+import numpy as np
+from sympy import Tuple, Equality
+import codegen, eliminate, profiling
+
+class Static(object):
+    """Static problem of equations eqs with known inputs (symbols)
+    solver - solver of linear equations (see pycodyn.LinStep)
+    key, group - see eliminate.aliases"""
+    tol=1e-10 # relative tolerance of Newton steps
+    maxIter=50 # max number of Newton iterations
+    def __init__(self, eqs, inputs, solver='auto', key=repr, group=None):
+        from pycodyn import linearForm, LinStep
+        with profiling.phase('static compile'):
+            self.inputs=list(inputs)
+            eqs,amap=eliminate.aliases([e for e in eqs if e!=True], self.inputs, key, group)
+            ki=set(self.inputs)
+            eqs=[e for e in eqs if e.free_symbols-ki] # without equations of inputs only
+            self.vrs=sorted(Tuple(*eqs).free_symbols-ki, key=repr) # unknowns
+            n,m=len(self.vrs),len(eqs)
+            self.shape=m,n # equations, unknowns
+            if m<n: raise ValueError('underdetermined static problem: %d equations, %d unknowns'%(m, n))
+            form=linearForm(eqs, self.vrs, self.inputs)
+            if form and m==n: # A*x=B*k+b
+                self.lin=LinStep(form, n, len(self.inputs), solver)
+            elif form: # redundant equations, x=M*k+m by least squares
+                A,B,b=form
+                Ad=np.zeros((m,n)); Bd=np.zeros((m,len(self.inputs)))
+                for i,j,c in A: Ad[i,j]+=c
+                for i,j,c in B: Bd[i,j]+=c
+                X=np.linalg.lstsq(Ad, np.column_stack([Bd,b]), rcond=None)[0]
+                M,c=X[:,:-1],X[:,-1]
+                self.lin=lambda k: M.dot(k)+c
+            else:
+                self.lin=None
+                self.fun,self.jac=self.functions(eqs)
+                self.x=np.zeros(n) # initial guess (the previous solution)
+            cols=dict([(v,i) for i,v in enumerate(self.vrs+self.inputs)])
+            self.names=self.vrs+self.inputs+list(amap) # variables of the solution
+            self.ia=np.array([cols[e.as_coeff_Mul()[1]] for e in amap.values()], dtype=int) # eliminated: s*[x,k][ia]
+            self.sa=np.array([float(e.as_coeff_Mul()[0]) for e in amap.values()])
+
+    def functions(self, eqs):
+        """returns compiled residual fun(x, k, F) and Jacobian jac(x, k, J) of nonlinear equations"""
+        F=[e.lhs-e.rhs if isinstance(e, Equality) else e for e in eqs]
+        iv=dict([(v,i) for i,v in enumerate(self.vrs)])
+        J=[((i,iv[v]), f.diff(v)) for i,f in enumerate(F) for v in sorted(f.free_symbols&set(iv), key=repr)]
+        names=dict([(v,'x[%d]'%i) for i,v in enumerate(self.vrs)])
+        names.update([(v,'k[%d]'%i) for i,v in enumerate(self.inputs)])
+        src='def fun(x, k, F):\n'+'\n'.join(codegen.assigns([('F[%d]'%i,f) for i,f in enumerate(F)], names))+'\n'
+        src+='def jac(x, k, J):\n'+'\n'.join(codegen.assigns([('J[%d,%d]'%ij,d) for ij,d in J], names) or ['    pass'])+'\n'
+        return codegen.compileSource(src, 'fun'), codegen.compileSource(src, 'jac')
+
+    def solveVector(self, k):
+        """returns vector of unknowns self.vrs for vector of inputs k"""
+        if self.lin is not None: return self.lin(k)
+        m,n=self.shape
+        x=self.x.copy(); F=np.empty(m); J=np.zeros((m,n))
+        converged=False
+        for i in range(self.maxIter): # Newton method
+            self.fun(x, k, F)
+            J[:]=0.0
+            self.jac(x, k, J)
+            try: dx=np.linalg.solve(J, -F) if m==n else np.linalg.lstsq(J, -F, rcond=None)[0] # Gauss-Newton
+            except np.linalg.LinAlgError: break # singular Jacobian
+            x+=dx
+            if not np.isfinite(x).all(): break
+            if np.abs(dx).max()<=self.tol*(1.0+np.abs(x).max()):
+                converged=True
+                break
+        if not converged: # Levenberg-Marquardt from the previous solution
+            import scipy.optimize
+            def f(x): self.fun(x, k, F); return F.copy()
+            def fj(x): J[:]=0.0; self.jac(x, k, J); return J.copy()
+            x=scipy.optimize.root(f, self.x, jac=fj, method='lm').x
+        self.x=x # warm start of the next solution
+        return x.copy()
+
+    def __call__(self, values):
+        """returns dictionary of all variables for dictionary of inputs values"""
+        k=np.array([float(values[v]) for v in self.inputs])
+        xk=np.concatenate([self.solveVector(k), k])
+        return dict(zip(self.names, np.concatenate([xk, self.sa*xk[self.ia]]).tolist()))
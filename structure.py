@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Structural analysis of systems of equations: incidence of equations and variables,
+maximum matching and block lower triangular (BLT) order by strongly connected components (Tarjan).
+Only the blocks (algebraic loops) must be solved simultaneously, other equations are explicit assignments.
+Copyright © Volodymyr Kopei, 2017, 2019 email: vkopey@gmail.com"""
+
+def incidence(eqs, vrs):
+    """returns list of sorted indexes of variables vrs in each equation of eqs"""
+    iv=dict([(v,i) for i,v in enumerate(vrs)])
+    return [sorted([iv[s] for s in e.free_symbols if s in iv]) for e in eqs]
+
+def matching(inc, n):
+    """Maximum matching of equations with incidence inc and n variables (augmenting paths)
+    returns lists: variable of each equation and equation of each variable (None - unmatched)"""
+    me=[None]*len(inc) # variable of equation
+    mv=[None]*n # equation of variable
+    for i,a in enumerate(inc): # cheap initial matching
+        for j in a:
+            if mv[j] is None:
+                me[i]=j; mv[j]=i
+                break
+    for i in range(len(inc)):
+        if me[i] is not None: continue
+        parent={} # variable: equation from which it is reached
+        stack=[(i, iter(inc[i]))] # depth-first search without recursion
+        found=None
+        while stack and found is None:
+            e,it=stack[-1]
+            for j in it:
+                if j in parent: continue
+                parent[j]=e
+                if mv[j] is None: found=j # free variable - augmenting path
+                else: stack.append((mv[j], iter(inc[mv[j]])))
+                break
+            else: stack.pop()
+        j=found
+        while j is not None: # augment the matching along the path
+            e=parent[j]
+            prev=me[e]
+            me[e]=j; mv[j]=e
+            j=None if e==i else prev
+    return me, mv
+
+def components(graph):
+    """Strongly connected components of graph (list of lists of successors) by Tarjan algorithm
+    returns list of components, each component is emitted after the components reachable from it"""
+    index={}; low={}; onStack=set(); stack=[]; comps=[]
+    for root in range(len(graph)):
+        if root in index: continue
+        work=[(root, iter(graph[root]))]
+        index[root]=low[root]=len(index)
+        stack.append(root); onStack.add(root)
+        while work:
+            v,it=work[-1]
+            for w in it:
+                if w not in index: # go deeper
+                    index[w]=low[w]=len(index)
+                    stack.append(w); onStack.add(w)
+                    work.append((w, iter(graph[w])))
+                    break
+                elif w in onStack: low[v]=min(low[v], index[w])
+            else: # all successors are visited
+                work.pop()
+                if work: low[work[-1][0]]=min(low[work[-1][0]], low[v])
+                if low[v]==index[v]: # root of the component
+                    c=[]
+                    while True:
+                        w=stack.pop(); onStack.discard(w)
+                        c.append(w)
+                        if w==v: break
+                    comps.append(sorted(c))
+    return comps
+
+def blt(eqs, vrs):
+    """Block lower triangular order of equations eqs with unknowns vrs
+    returns list of blocks (equations, variables) in the order of solution
+    raises ValueError if the system is structurally singular"""
+    inc=incidence(eqs, vrs)
+    me,mv=matching(inc, len(vrs))
+    if len(eqs)!=len(vrs) or None in me:
+        raise ValueError('structurally singular system: %d equations, %d unknowns, %d matched'%(
+                         len(eqs), len(vrs), len(me)-me.count(None)))
+    graph=[[mv[j] for j in inc[i] if j!=me[i]] for i in range(len(eqs))] # equation -> equations of its variables
+    return [([eqs[i] for i in c], [vrs[me[i]] for i in c]) for c in components(graph)]
+
+def levels(graph, root, seen):
+    """Breadth-first search from root in undirected graph, neighbours by increasing degree
+    returns list of levels (lists of vertices), seen - set of visited vertices"""
+    level=[root]; seen.add(root); L=[]
+    while level:
+        L.append(level)
+        nxt=[]
+        for v in level:
+            for w in sorted(graph[v], key=lambda w:len(graph[w])):
+                if w not in seen:
+                    seen.add(w); nxt.append(w)
+        level=nxt
+    return L
+
+def bandOrder(graph):
+    """Reverse Cuthill-McKee order of vertices of undirected graph (list of lists of neighbours),
+    which gives the small bandwidth of the matrix. Each connected component starts
+    from the pseudo-peripheral vertex (end of the longest path found by repeated searches)
+    returns list of vertices"""
+    order=[]; done=set()
+    for root in range(len(graph)):
+        if root in done: continue
+        L=levels(graph, root, set())
+        while True: # pseudo-peripheral vertex
+            v=min(L[-1], key=lambda w:len(graph[w]))
+            L2=levels(graph, v, set())
+            if len(L2)<=len(L): break
+            root,L=v,L2
+        for level in levels(graph, root, done): order+=level
+    return order[::-1]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Tests of the benchmark suite (small cases in this process)"""
+
+import json
+import bench
+
+def test_cases():
+    # cases of engines report metrics without errors
+    for case in [('euler','string',2), ('trapezoidal','string',2), ('dae','string',2), ('euler','main1.py',None)]:
+        r=bench.run(case)
+        assert 'error' not in r, r.get('error')
+        assert r['unknowns']>0 and r['build']>0 and r['total']>=r['build']
+        if case[0]=='dae': assert r['residual/s']>0
+        else: assert r['steps/s']>0 and r['simulation']>0
+    assert [c for c in bench.cases([2], 'string') if c[0]=='dae']==[('dae','string',2)]
+
+def test_compare(tmp_path, capsys):
+    # ratios of metrics of the same cases
+    old=dict(cases=[dict(engine='euler', model='string', n=2, build=2.0, simulation=4.0)])
+    new=dict(cases=[dict(engine='euler', model='string', n=2, build=1.0, simulation=1.0)])
+    for n,r in (('old',old), ('new',new)): json.dump(r, open(str(tmp_path/n), 'w'))
+    bench.compare(str(tmp_path/'old'), str(tmp_path/'new'))
+    line=capsys.readouterr().out.split('\n')[1].split()
+    assert line[:3]==['euler','string','2'] and [float(x) for x in line[3:]]==[0.5, 0.25]
+
+def test_pumping(monkeypatch):
+    # the scenario of events passes the flag and the Piecewise load of the plunger to solveDAE
+    import pycodynDAE
+    from sympy import Piecewise
+    calls=[]
+    def solveDAE(s, eq, state, stopTime, bc=None, events=True):
+        calls.append((stopTime, events, [e for e in bc.values() if isinstance(e, Piecewise)]))
+        return [0.0], [], []
+    monkeypatch.setattr(pycodynDAE.System, 'solveDAE', solveDAE)
+    for ev in (False, True): bench.pumping(2, events=ev)
+    assert [c[1] for c in calls]==[False, True] and all([len(c[2])==1 and abs(c[0]-2*60/6.4)<1e-12 for c in calls])
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Tests of the cache of compiled models"""
+
+import os
+import pytest
+from sympy import Symbol, Eq, lambdify
+import cache, pycodyn
+import rodString
+
+@pytest.fixture
+def tmpcache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'enabled', True)
+    monkeypatch.setattr(cache, 'path', str(tmp_path))
+    monkeypatch.setattr(cache, 'memory', {})
+    return tmp_path
+
+def test_key():
+    # the order of equations does not matter, other parts do
+    x,y=Symbol('x'),Symbol('y')
+    eqs=[Eq(x, 2*y), Eq(y, 1)]
+    assert cache.key(eqs, 'a')==cache.key(eqs[::-1], 'a')
+    assert cache.key(eqs, 'a')!=cache.key(eqs, 'b')
+    assert cache.key(eqs, 'a')!=cache.key(eqs[:1], 'a')
+
+def test_save_load(tmpcache, monkeypatch):
+    # entries are saved to files, least recently used are evicted
+    cache.save('k1', [1, 2])
+    monkeypatch.setattr(cache, 'memory', {}) # other process
+    assert cache.load('k1')==[1, 2] and cache.load('k2') is None
+    monkeypatch.setattr(cache, 'maxSize', 2*os.path.getsize(str(tmpcache/'k1.pkl')))
+    os.utime(str(tmpcache/'k1.pkl'), (0, 0))
+    cache.save('k2', [3, 4])
+    cache.save('k3', [5, 6])
+    assert sorted(os.listdir(str(tmpcache)))==['k2.pkl', 'k3.pkl']
+
+def test_lambda():
+    # functions are created from the source without SymPy
+    x=Symbol('x')
+    f=cache.lambdaFunction(cache.lambdaSource(lambdify([x], [x**2, 2*x], 'numpy')))
+    assert list(f(3.0))==[9.0, 6.0]
+
+def test_compiled_model(tmpcache, monkeypatch):
+    # the second model with the same equations does not run SymPy
+    s=rodString.RodString([(1e5, 5e3, 4000.0, -35000.0)]*2)
+    s.createCurEqs(pycodyn.boundary({s.top: 0.0, s.plunger: 0.0}))
+    def curEqs(*args): raise AssertionError('curEqs is called')
+    s2=rodString.RodString([(1e5, 5e3, 4000.0, -35000.0)]*2)
+    monkeypatch.setattr(s2, 'curEqs', curEqs)
+    s2.createCurEqs(pycodyn.boundary({s2.top: 0.0, s2.plunger: 0.0}))
+    assert s2.vrsc==s.vrsc
+
+def test_warm_key(tmpcache, monkeypatch):
+    # the key is built again only after the change of the system
+    s=rodString.RodString([(1e5, 5e3, 4000.0, -35000.0)]*2)
+    bc=pycodyn.boundary({s.top: 0.0, s.plunger: 0.0})
+    s.createCurEqs(bc)
+    def key(*args): raise AssertionError('key is built')
+    monkeypatch.setattr(cache, 'key', key)
+    s.createCurEqs(bc)
+    s.eqs=list(s.eqs)
+    with pytest.raises(AssertionError): s.createCurEqs(bc)
+
+def test_source_hash(monkeypatch):
+    # the hash depends on the modules of the symbolic phase
+    import structure
+    h=cache.sourceHash(())
+    monkeypatch.setattr(cache, 'hashes', {})
+    monkeypatch.setattr(structure, '__file__', cache.__file__+'-absent')
+    assert cache.sourceHash(())!=h
+
+def test_memory(tmpcache, monkeypatch):
+    # the process holds only the least recently used entries and functions
+    monkeypatch.setattr(cache, 'memorySize', 2)
+    monkeypatch.setattr(cache, 'functions', {})
+    for k in ('k1', 'k2'): cache.save(k, k)
+    cache.load('k1')
+    cache.save('k3', 'k3')
+    assert list(cache.memory)==['k1', 'k3'] and cache.load('k2')=='k2' # from the file
+    for i in range(3): cache.lambdaFunction('def f%d(x):\n    return x\n'%i)
+    assert len(cache.functions)==2
+    cache.clear()
+    assert not cache.memory and not cache.functions and not os.listdir(str(tmpcache))
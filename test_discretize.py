@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Tests of the discretization of continuous components by integration schemes"""
+
+import pytest
+import numpy as np
+from sympy import Symbol
+import pycodynDAE as dae
+from pycodyn import System
+
+def fall(scheme, h, history=None):
+    """returns the max error of the position of the mass under the constant force (x=-(t+h)**2/4)
+    history - previous values {variable: value} (default - rest)"""
+    m=dae.Mass(name='m', m=2.0)
+    f=dae.Force(name='f', f=-1.0)
+    s=System(els=[m,f], eqs=m.pinEqs(1,[f.pins[0]]), scheme=scheme)
+    s.dt=h
+    state={m.x:0.0, m.v:0.0, m.a:-0.5, m.Dv:-0.5, m.Dx:0.0, m.f1:0.0, m.f2:-1.0, Symbol('f_x'):0.0}
+    for p,v in s.history: state[p]=state[v]
+    state.update(history or {})
+    T,R=s.solveDyn(state, 1.0, {m.f1: 0.0})
+    return np.abs(R[m.x]+0.25*(T+h)**2).max()
+
+def test_history():
+    # new variables of previous values and their pairs
+    m=dae.Mass(name='m', m=2.0)
+    s=System(els=[m], eqs=[], scheme='bdf2')
+    assert sorted([repr(p) for p,v in s.history])==['m_vp', 'm_vpp', 'm_xp', 'm_xpp']
+    assert all([repr(p).rstrip('p')==repr(v) for p,v in s.history])
+
+def test_order():
+    # euler has the 1st order, trapezoid and bdf2 are exact for the constant acceleration
+    e=[fall('euler', h) for h in (0.1, 0.05)]
+    assert e[1]==pytest.approx(e[0]/2)
+    assert fall('trapezoid', 0.1)<=1e-12
+    h=0.1 # history of the motion at -2h, -3h
+    hist={Symbol('m_xp'):-0.25*h**2, Symbol('m_xpp'):-h**2, Symbol('m_vp'):0.5*h, Symbol('m_vpp'):h}
+    assert fall('bdf2', h, hist)<=1e-12
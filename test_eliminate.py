@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Tests of the elimination of aliases"""
+
+import pytest
+from sympy import symbols, Eq
+import eliminate, pycodyn, rodString
+
+def test_aliases():
+    # chains of aliases a=b, a=-b are replaced by one representative, kept variables are preferred
+    a,b,c,d,x=symbols('a b c d x')
+    eqs=[Eq(a, b), Eq(c, -b), Eq(d, c), Eq(x, 2*a+d), Eq(b, a)]
+    res,amap=eliminate.aliases(eqs, keep=[c])
+    assert amap=={a: -c, b: -c, d: c}
+    assert res==[Eq(x, -c)]
+    with pytest.raises(ValueError):
+        eliminate.aliases([Eq(a, b), Eq(a-b, 1)])
+
+def test_aliases_key():
+    # the same key of x and xp gives the same choice in their sets, groups separate aliases
+    x,y,xp,yp=symbols('x y xp yp')
+    key=lambda v: repr(v).rstrip('p')
+    res,amap=eliminate.aliases([Eq(y, x), Eq(yp, xp)], key=key)
+    assert amap=={y: x, yp: xp}
+    res,amap=eliminate.aliases([Eq(y, xp)], group=lambda v: repr(v).endswith('p'))
+    assert amap=={} and res==[Eq(y, xp)]
+
+def test_system_aliases():
+    # connections of flanges of the string are eliminated, kept variables (BC) remain
+    s=rodString.RodString([(1e5, 5e3, 4000.0, -35000.0)]*2)
+    eqs,amap=pycodyn.aliases(s.eqs, [s.top, s.plunger])
+    fs=set().union(*[e.free_symbols for e in eqs])
+    assert len(eqs)+len(amap)==len(s.eqs) and not set(amap)&fs and set([s.top, s.plunger])<=fs
+    assert all([pycodyn.isPrev(v)==pycodyn.isPrev(r.free_symbols.pop()) for v,r in amap.items()])
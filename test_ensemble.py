@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Tests of the ensemble runner (ensemble)"""
+
+import os
+import numpy as np
+import ensemble
+
+def build(): # model of the worker process
+    def case(p):
+        if p[0]==13: os._exit(1) # crash of the solver
+        if p[0]==7: raise ValueError('convergence failure')
+        return p*np.arange(3)
+    return case
+
+def test_results():
+    P=np.arange(10.0)[:,None]
+    res,errors=ensemble.runEnsemble(build, P, (3,), workers=2, chunk=3)
+    assert list(errors)==[7] and 'convergence failure' in errors[7]
+    assert np.isnan(res[7]).all()
+    ok=[i for i in range(10) if i!=7]
+    assert (res[ok]==P[ok]*np.arange(3)).all()
+
+def test_crash_of_worker():
+    # only the case, which terminates its worker process, fails
+    P=np.arange(40.0)[:,None]
+    res,errors=ensemble.runEnsemble(build, P, (3,), workers=2, chunk=2)
+    assert sorted(errors)==[7,13] and errors[13]=='worker process terminated'
+    ok=[i for i in range(40) if i not in (7,13)]
+    assert (res[ok]==P[ok]*np.arange(3)).all()
+    assert np.isnan(res[13]).all()
+
+def fail(): # build of the model fails
+    raise RuntimeError('no model')
+
+def test_build_failure():
+    res,errors=ensemble.runEnsemble(fail, np.zeros((4,1)), (1,), workers=2, chunk=1)
+    assert sorted(errors)==[0,1,2,3] and np.isnan(res).all()
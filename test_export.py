@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests of the export of compiled models to standalone modules"""
+
+import importlib.util
+import pytest
+import numpy as np
+from pycodyn import BC
+import benchResidual
+from test_pycodyn import string, bc
+
+def load(path):
+    """imports the exported module from path"""
+    spec=importlib.util.spec_from_file_location('exported', path)
+    m=importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(m)
+    return m
+
+@pytest.mark.parametrize('mode', ['linear', 'solve'])
+def test_system(tmp_path, mode):
+    # the module without SymPy gives the results of solveDyn
+    s,d=string(2)
+    T,R=s.solveDyn(d, 3.0, bc(s), mode)
+    p=str(tmp_path/'model.py')
+    s.export(p, d, bc(s))
+    src=open(p).read()
+    assert 'sympy' not in src and 'import pycodyn' not in src
+    m=load(p)
+    T2,X=m.simulate(timeEnd=3.0)
+    assert (T==T2).all()
+    for v in s.vrsc: assert np.abs(X[:,m.idx[repr(v)]]-R[v]).max()<=1e-9*(1+np.abs(R[v]).max())
+
+def test_blocks(tmp_path):
+    # linear blocks of BLT solved at run time are not exported
+    s,d=string(30)
+    s.createCurEqs(BC(bc(s)), 'blt')
+    with pytest.raises(ValueError):
+        s.export(str(tmp_path/'model.py'), d, bc(s))
+
+def test_dae(tmp_path):
+    # the exported residual and Jacobian equal the residual and the Jacobian of the system
+    s,eq,state=benchResidual.model()
+    p=str(tmp_path/'dae.py')
+    s.export(p, eq, state)
+    m=load(p)
+    y=np.array([float(state[i]) for i in s.y])+0.1
+    yd=np.array([float(state[i]) for i in s.yd]+[0.0]*(len(s.y)-len(s.yd)))-0.2
+    r=s.residual(1.0, y, yd).copy()
+    assert m.y==[repr(v) for v in s.y]
+    assert np.abs(m.residual(np.zeros(len(r)), 1.0, y, yd, m.p)-r).max()<=1e-12*(1+np.abs(r).max())
+    J=s.jacobian(10.0, 1.0, y, yd)
+    assert np.abs(m.jacobian(np.zeros(J.shape), 10.0, 1.0, y, yd, m.p)-J).max()<=1e-12*np.abs(J).max()
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Tests of the profiling instrumentation"""
+
+import json
+import profiling
+from test_pycodyn import string, bc
+
+def test_profile(tmp_path):
+    # phases of building and simulation are recorded only inside the profile
+    with profiling.Profile() as p:
+        s,d=string(2)
+        T,R=s.solveDyn(d, 1.0, bc(s))
+        profiling.stat('solver', dict(steps=len(T)))
+    assert profiling.active is None
+    assert p.phases['step'][0]==10 and p.phases['simulation'][0]==1
+    assert set(['System', 'createCurEqs']) <= set(p.phases)
+    r=json.loads(p.json(str(tmp_path/'p.json')))
+    assert r['stats']['solver']['steps']==10 and r==json.load(open(str(tmp_path/'p.json')))
+    f=lambda x: x
+    assert profiling.wrap(f, 'f') is f and profiling.phase('x') is profiling.noTimer
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""Tests of the Euler engine (pycodyn)"""
+
+import pytest
+import numpy as np
+from sympy import Symbol, sin, pi, tanh, Piecewise, symbols
+from pycodyn import t, isPrev, System, BC, Hybrid, Stepper
+import rodString, cache
+import pycodynDAE as dae
+
+fr=-18499.0 # liquid weight above the plunger
+
+def string(n):
+    """returns the n-section string (the same string for any n) and its static state"""
+    s=rodString.RodString([(1e5*n, 5e3*n, 4000.0/n, -35000.0/n)]*n)
+    return s, s.solve(s.staticICs(fr))
+
+def bc(s): # harmonic motion of the upper point, force on the plunger by the sign of its velocity
+    return {s.top: 1.05*sin(2*pi*6.4/60*t), s.plunger: Piecewise((fr, s.masses[-1].v>0), (0.0, True))}
+
+def test_blt_large_block():
+    # the block with coefficients of DT is solved numerically at run time (not by SymPy)
+    s,d=string(30)
+    T,R=s.solveDyn(d, 5.0, bc(s), 'linear')
+    s2,d2=string(30)
+    T2,R2=s2.solveDyn(d2, 5.0, bc(s2), 'blt')
+    assert s2.lins is None and len(s2.blocks)==1
+    f,f2=R[s.springs[0].f1], R2[s2.springs[0].f1]
+    assert np.abs(f-f2).max()<=1e-9*np.abs(f).max()
+    s2.dt=0.05 # other time step without compilation
+    T3,R3=s2.solveDyn(d2, 5.0, bc(s2), 'blt')
+    assert len(T3)==100 and np.isfinite(R3.data).all()
+
+def parametric(n):
+    """returns the n-section string with parameters c_i d_i m_i w_i, their symbols and default values"""
+    sections=[symbols('c%d d%d m%d w%d'%((i+1,)*4)) for i in range(n)]
+    s=rodString.RodString(sections)
+    return s, [p for sc in sections for p in sc], [1e5*n, 5e3*n, 4000.0/n, -35000.0/n]*n
+
+@pytest.mark.parametrize('solver', ['banded', 'auto'])
+def test_linsteps_groups(solver):
+    # instances with different parameters are grouped and solved together, the cache of LinStep is LRU
+    s,params,p0=parametric(2)
+    s.solver=solver
+    P=np.array([p0]*6)*(1+0.01*np.array([0,0,1,2,3,3]))[:,None]
+    ics=s.staticICs(fr)
+    states=[s.solve(dict(list(ics.items())+list(zip(params, p)))) for p in P]
+    def bcb(t, v): return 1.05*np.sin(2*np.pi*6.4/60*t), np.where(v>0, fr, 0.0)
+    bcb.vrs=s.top,s.plunger
+    bcb.args=s.masses[-1].v,
+    s.createCurEqs(bcb, 'auto', params)
+    s.lins.maxSteps=2
+    T,R=s.solveDynBatch(states, 3.0, bcb, params, P)
+    assert len(s.lins.groups[1][1])==4 # groups of equal parameters
+    for j in (5,0,3): # single instances, the least recently used LinStep is removed
+        T1,R1=s.solveDynBatch(states[j:j+1], 3.0, bcb, params, P[j:j+1])
+        assert np.abs(R1.data[0]-R.data[j]).max()<=1e-8*np.abs(R.data[j]).max()
+    assert len(s.lins.steps)==2 and P[3,0] in list(s.lins.steps)[-1]
+
+def test_solvN():
+    # one step by the dictionary of the state equals the step of solveDyn
+    s,d=string(2)
+    T,R=s.solveDyn(d, 0.1, {s.top: 0.01, s.plunger: fr})
+    d0=dict(d); d0.update({s.top: 0.01, s.plunger: fr})
+    for v in s.vrsp: # previous values "xp=x"
+        x=Symbol(repr(v)[:-1])
+        if isPrev(v) and x in d: d0[v]=d[x]
+    st=s.solvN(d0)
+    for v in s.vrsc: assert abs(st[v]-R[v][0])<=1e-9*(1+abs(R[v][0]))
+
+def test_periodic():
+    # the period from the periodic state returns to this state, the failure of Newton method is reported
+    s,d=string(2)
+    smooth={s.top: 1.05*sin(2*pi*6.4/60*t), s.plunger: fr*(1-sin(2*pi*6.4/60*t))/2}
+    T,R=s.solvePeriodic(d, 60/6.4, smooth)
+    assert s.periodic['converged']
+    s.dt=T[1] # the time step aligned to the period
+    T2,R2=s.solveDyn(d, 10*60/6.4, smooth) # transient process is damped
+    x=s.masses[-1].x
+    assert np.abs(R[x]-R2[x][-len(T):]).max()<=1e-6*np.abs(R[x]).max()
+    with pytest.warns(UserWarning, match='periodic steady state'):
+        s.solvePeriodic(d, 60/6.4, smooth, maxIter=1)
+    assert not s.periodic['converged']
+
+def test_adaptive_steps():
+    # with the smooth force on the plunger adaptive steps are more accurate than the same number of fixed steps
+    s,d=string(2)
+    smooth={s.top: 1.05*sin(2*pi*6.4/60*t), s.plunger: fr*(1+tanh(s.masses[-1].v/0.01))/2}
+    x=s.masses[-1].x
+    def run(dt, **kw):
+        s.dt=dt
+        return s.solveDyn(d, 10.0, smooth, **kw)
+    Tr,Rr=run(0.1/256) # reference
+    def error(T, R): # at the common times with the reference
+        i=np.clip(np.searchsorted(Tr, T-1e-7), 0, len(Tr)-1)
+        c=np.abs(Tr[i]-T)<1e-6
+        return np.abs(R[x][c]-Rr[x][i[c]]).max()
+    Tf,Rf=run(0.1/16)
+    Ta,Ra=run(0.1, tol=1e-4)
+    assert len(Ta)<len(Tf) and error(Ta, Ra)<error(Tf, Rf)
+    assert Ta[0]==0.0 and np.diff(Ta).max()<=0.1*(1+1e-9)
+
+def test_adaptive_bdf2():
+    # bdf2 has coefficients of the constant step
+    m=dae.Mass(name='m', m=1.0)
+    f=dae.Force(name='f', f=-1.0)
+    s=System(els=[m,f], eqs=m.pinEqs(1,[f.pins[0]]), scheme='bdf2')
+    with pytest.raises(ValueError):
+        s.solveDyn({}, 1.0, {}, tol=1e-3)
+
+def test_kernel_cache(tmp_path, monkeypatch):
+    # the cached kernel source depends on the solver of the linear step
+    monkeypatch.setattr(cache, 'enabled', True)
+    monkeypatch.setattr(cache, 'path', str(tmp_path))
+    monkeypatch.setattr(cache, 'memory', {})
+    res=[]
+    for solver in ('dense', 'banded', 'dense'):
+        s,d=string(2)
+        s.solver=solver
+        T,R=s.solveKernel(d, 1.0, {s.top: 0.01*t, s.plunger: fr}, 'linear', jit=False)
+        res.append(R.data)
+    assert np.abs(res[1]-res[0]).max()<=1e-9*np.abs(res[0]).max() and (res[2]==res[0]).all()
+
+def test_linear_mode():
+    # the factored linear step gives the same results as explicit expressions of SymPy solve
+    res=[]
+    for mode in ('linear', 'solve'):
+        s,d=string(2)
+        T,R=s.solveDyn(d, 3.0, bc(s), mode)
+        res.append(R.data)
+    assert s.lins is None and s.ceqs
+    s,d=string(2)
+    s.createCurEqs(BC(bc(s)), 'auto')
+    assert s.ceqs is None and s.lin is s.lins.at((s.dt,)) # factored once for the time step
+    assert np.abs(res[0]-res[1]).max()<=1e-9*np.abs(res[1]).max()
+
+def test_result():
+    # results are one array (steps, variables) with columns by symbols and names, fnBC reads the state vector
+    s,d=string(2)
+    v=s.masses[-1].v
+    def fnBC(d, t): # the same BC as bc(s)
+        return {s.top: 1.05*np.sin(2*np.pi*6.4/60*t), s.plunger: fr if d[v]>0 else 0.0}
+    fnBC.vrs=s.top,s.plunger
+    T,R=s.solveDyn(d, 3.0, fnBC)
+    T2,R2=s.solveDyn(d, 3.0, bc(s))
+    assert R.data.shape==(30, len(s.vrs)) and np.allclose(T, np.arange(30)*0.1)
+    assert np.abs(R.data-R2.data).max()<=1e-9*np.abs(R2.data).max()
+    assert (R[v]==R[repr(v)]).all() and (R[T>1.0][v]==R[v][11:]).all()
+    assert (R.structured()[repr(v)]==R[v]).all()
+
+@pytest.mark.parametrize('mode,jit', [('linear', False), ('linear', True), ('blt', False)])
+def test_kernel(mode, jit):
+    # the generated loop of all steps (numba if installed) gives the results of solveDyn
+    s,d=string(2)
+    s.solver='dense' # the dense step is inlined for numba
+    T,R=s.solveDyn(d, 3.0, bc(s), mode)
+    T2,R2=s.solveKernel(d, 3.0, bc(s), mode, jit)
+    assert (T==T2).all() and np.abs(R.data-R2.data).max()<=1e-9*np.abs(R.data).max()
+    def hook(t, v): return 1.05*np.sin(2*np.pi*6.4/60*t), (fr if v>0 else 0.0)
+    hook.vrs=s.top,s.plunger
+    hook.args=s.masses[-1].v,
+    T3,R3=s.solveKernel(d, 3.0, hook, mode, jit)
+    assert np.abs(R.data-R3.data).max()<=1e-9*np.abs(R.data).max()
+
+@pytest.mark.parametrize('mode', ['linear', 'blt'])
+def test_batch(mode):
+    # instances with different parameters and states are simulated together as one by one
+    s,params,p0=parametric(2)
+    P=np.array([p0]*3)*np.array([[1.0], [0.95], [1.1]])
+    ics=s.staticICs(fr)
+    states=[s.solve(dict(list(ics.items())+list(zip(params, p)))) for p in P]
+    T,R=s.solveDynBatch(states, 3.0, bc(s), params, P, mode)
+    assert R.data.shape==(3, 30, len(s.vrs))
+    for j in range(3): # the same string with numerical parameters
+        s1=rodString.RodString([tuple(P[j,i:i+4].tolist()) for i in (0,4)])
+        T1,R1=s1.solveDyn(s1.solve(s1.staticICs(fr)), 3.0, bc(s1), mode)
+        for v in s1.vrsc: assert np.abs(R[v][j]-R1[v]).max()<=1e-8*(1+np.abs(R1[v]).max())
+
+def test_hybrid():
+    # the mode is switched at the crossing of the guard located inside the step
+    s,d=string(2)
+    w=2*np.pi*6.4/60
+    top=1.05*sin(w*t)
+    h=Hybrid(modes={'free':(s, {s.top: top, s.plunger: 0.0}), 'loaded':(s, {s.top: top, s.plunger: fr})},
+             trans=[('free', s.top-0.5, 'loaded')])
+    T,R=h.solveDyn(d, 3.0, 'free')
+    (te,a,b),=h.events
+    assert (a,b)==('free','loaded') and abs(te-np.arcsin(0.5/1.05)/w)<=1e-3
+    T2,R2=s.solveDyn(d, 3.0, {s.top: top, s.plunger: 0.0})
+    i=np.searchsorted(T, te)
+    assert T[i]==te and (T[:i]==T2[:i]).all() and np.abs(R[:i][s.masses[-1].x]-R2[:i][s.masses[-1].x]).max()<=1e-12
+    assert (R[s.plunger][:i]==0.0).all() and (R[s.plunger][i+1:]==fr).all()
+    assert np.allclose(T[i+1:]-te, 0.1*np.arange(1, len(T)-i)) # the time grid of the new mode
+    with pytest.raises(ValueError): # the System of two modes is compiled for different BC variables
+        Hybrid(modes={'free':(s, {s.top: top, s.plunger: 0.0}), 'fixed':(s, {s.top: top, s.masses[-1].x: 0.0})},
+               trans=[('free', s.top-0.5, 'fixed')])
+
+def test_time_step(monkeypatch):
+    # the time step is the argument of the compiled model, its change does not run SymPy
+    s,d=string(2)
+    T,R=s.solveDyn(d, 1.0, bc(s))
+    def curEqs(*args): raise AssertionError('curEqs is called')
+    monkeypatch.setattr(s, 'curEqs', curEqs)
+    s.dt=0.01
+    T,R=s.solveDyn(d, 1.0, bc(s))
+    s2,d2=string(2)
+    s2.dt=0.01
+    T2,R2=s2.solveDyn(d2, 1.0, bc(s2))
+    assert len(T)==100 and np.abs(R.data-R2.data).max()<=1e-9*np.abs(R2.data).max()
+
+def test_kernel_parameters():
+    # one compiled kernel serves all values of parameters
+    s,params,p0=parametric(2)
+    ics=s.staticICs(fr)
+    b=BC(bc(s))
+    for k,p in enumerate((p0, [1.1*a for a in p0])):
+        state=s.solve(dict(list(ics.items())+list(zip(params, p))))
+        if k==0:
+            s.createCurEqs(b, 'linear', params)
+            s.compileIndex(state)
+            s.createKernel(b, jit=False)
+        T,R=s.runKernel(state, 3.0)
+        s1=rodString.RodString([tuple(p[i:i+4]) for i in (0,4)])
+        T1,R1=s1.solveDyn(s1.solve(s1.staticICs(fr)), 3.0, bc(s1), 'linear')
+        for v in s1.vrsc: assert np.abs(R[v]-R1[v]).max()<=1e-8*(1+np.abs(R1[v]).max())
+
+def test_stepper():
+    # irregular samples of BC are interpolated to fixed steps, outputs are the results of solveDyn
+    s,d=string(2)
+    plunger={s.plunger: Piecewise((fr, s.masses[-1].v>0), (0.0, True))}
+    out=s.springs[0].f1
+    st=Stepper(s, d, [s.top], [out], plunger, size=8)
+    times=[0.0, 0.25, 0.3, 0.72, 1.0, 1.01, 1.5, 2.33, 2.9, 3.0]
+    for tk in times:
+        y=st.push(tk, [0.3*tk]) # linear BC is interpolated exactly
+    with pytest.raises(ValueError): st.push(3.0, [0.9])
+    s2,d2=string(2)
+    b=dict(plunger); b[s2.top]=0.3*t
+    T,R=s2.solveDyn(d2, 3.05, b)
+    assert st.n==31 and st.t==pytest.approx(3.0) and y[0]==pytest.approx(R[out][-1], rel=1e-9)
+    h=st.last()
+    assert len(h)==8 and np.allclose(h[:,0], T[-8:]) and np.allclose(h[:,1], R[out][-8:], rtol=1e-9)
+
+def test_bc():
+    # expressions of BC are compiled for columns: BC of time for the time grid, BC of state in the step
+    s,d=string(2)
+    v=s.masses[-1].v
+    b=BC(bc(s))
+    assert b.args==(v,) and b.itime==[0] and b.istate==[1]
+    idx={s.top: 0, s.plunger: 1, v: 2}
+    x=np.array([0.0, 0.0, 0.5])
+    b.apply(idx, x, 2.0)
+    assert list(x[:2])==[pytest.approx(1.05*np.sin(2*np.pi*6.4/60*2.0)), fr]
+    assert b({v: -0.5}, 2.0)=={s.top: pytest.approx(x[0]), s.plunger: 0.0} # as fnBC
+    B=b.functions(idx)['values'](np.array([1.0, 2.0]))
+    assert B.shape==(2, 1) and B[1,0]==pytest.approx(x[0])
+    x[2]=-0.5
+    b.apply(idx, x, 3.0, B[1]) # the value of BC of time is given
+    assert x[0]==B[1,0] and x[1]==0.0
+    X=np.array([[0.0, 0.0, 0.5], [0.0, 0.0, -0.5]])
+    b.functions(idx)['applyBatch'](X, 2.0)
+    assert (X[:,0]==x[0]).all() and list(X[:,1])==[fr, 0.0]
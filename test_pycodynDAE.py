@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Tests of the DAE engine (pycodynDAE) without Assimulo: residual, Jacobian, events"""
+
+import numpy as np
+import benchResidual
+
+def test_residual_lambdified():
+    # the generated in-place residual equals the lambdified residual of equations with eliminated aliases
+    s,eq,state=benchResidual.model()
+    s.createResidual(eq, jac=None)
+    y=np.array([float(state[i]) for i in s.y])+0.1
+    yd=np.array([float(state[i]) for i in s.yd]+[0.0]*(len(s.y)-len(s.yd)))-0.2
+    r=benchResidual.lambdified(s, eq)(1.0, y, yd)
+    assert np.abs(r-s.residual(1.0, y, yd)).max()<=1e-9*(1+np.abs(r).max())
+
+def test_jacobian():
+    # the analytic Jacobian dF/dy+c*dF/dyd equals finite differences of the residual, sparse equals dense
+    s,eq,state=benchResidual.model()
+    s.createResidual(eq, jac='sparse')
+    y=np.array([float(state[i]) for i in s.y])+0.1
+    yd=np.array([float(state[i]) for i in s.yd]+[0.0]*(len(s.y)-len(s.yd)))-0.2
+    c=10.0
+    J=s.jacobian(c, 1.0, y, yd).copy() # overwritten by the next call
+    F=s.residual(1.0, y, yd).copy()
+    Jf=np.empty_like(J)
+    for j in range(len(y)):
+        e=1e-6*(1+abs(y[j]))
+        dy=np.zeros(len(y)); dy[j]=e
+        Jf[:,j]=(s.residual(1.0, y+dy, yd)-F)/e+c*(s.residual(1.0, y, yd+dy)-F)/e
+    assert np.abs(J-Jf).max()<=1e-4*(1+np.abs(J).max())
+    assert s.jacobian(c, 1.0, y, yd) is s.J # preallocated
+    S=s.jacobian(c, 1.0, y, yd, sparse=True)
+    assert np.abs(S.toarray()-J).max()<=1e-12*np.abs(J).max()
+    S2=s.jacobian(2*c, 1.0, y, yd, sparse=True) # the pattern is reused
+    assert S2 is S and np.abs(S2.toarray()-s.jacobian(2*c, 1.0, y, yd)).max()<=1e-12*np.abs(J).max()
+    v=np.arange(len(y), dtype=float)
+    assert np.allclose(s.jacv(1.0, y, yd, F, v, 2*c), s.jacobian(2*c, 1.0, y, yd).dot(v))
+
+def test_residual_jit():
+    # the residual compiled by numba writes the same values into the preallocated array
+    s,eq,state=benchResidual.model()
+    s.createResidual(eq, jac=None)
+    y=np.array([float(state[i]) for i in s.y])+0.1
+    yd=np.array([float(state[i]) for i in s.yd]+[0.0]*(len(s.y)-len(s.yd)))-0.2
+    r=s.residual(1.0, y, yd).copy()
+    s.createResidual(eq, jac=None, jit=True)
+    r2=s.residual(1.0, y, yd)
+    assert r2 is s.out and np.abs(r-r2).max()<=1e-12*(1+np.abs(r).max())
+
+def test_events():
+    # Piecewise is switched by the mode variable, the residual of each mode is the residual of its side
+    s,eq,state=benchResidual.model()
+    eq2,G,modes=s.events(eq)
+    assert [repr(g) for g in G]==['m2_v'] and len(modes)==1
+    params=dict([(q,1.0) for q in modes])
+    pk=sorted(params, key=repr)
+    s.createResidual(eq2, params, jac=None)
+    s.createRoots(G, pk)
+    f=benchResidual.lambdified(s, eq) # with Piecewise
+    iv=s.y.index(G[0])
+    for v in (0.3, -0.3):
+        y=np.array([float(state[i]) for i in s.y])+0.1
+        yd=np.array([float(state[i]) for i in s.yd]+[0.0]*(len(s.y)-len(s.yd)))-0.2
+        y[iv]=v
+        s.pv[:]=v>=0 # mode of the sign of the switching function
+        r=f(1.0, y, yd)
+        assert np.abs(s.residual(1.0, y, yd)-r).max()<=1e-9*(1+np.abs(r).max())
+        assert list(s.stateEvents(1.0, y, yd))==[v]
+    class Solver(object): # crossing downwards
+        sw=[True]
+        def make_consistent(self, how): self.how=how
+    solver=Solver()
+    s.imodes=[pk.index(modes[0])]; s.nevents=0
+    s.handleEvent(solver, ([-1], False))
+    assert solver.sw==[False] and list(s.pv)==[0.0] and s.nevents==1 and solver.how=='IDA_YA_YDP_INIT'
+
+def test_sparse_solver(monkeypatch):
+    # IDA with SPGMR calls the Jacobian-vector product of the sparse Jacobian (the solver is a fake of Assimulo)
+    import sys, types
+    class Implicit_Problem(object):
+        def __init__(self, res, y0, yd0, sw0=None): self.res, self.y0, self.yd0 = res, y0, yd0
+    class IDA(object):
+        usejac=False; linear_solver='DENSE'
+        def __init__(self, model): self.model=model
+        def simulate(self, tf, ncp): # a Newton iteration of IDA uses the Jacobian only if usejac
+            y,yd=np.array(self.model.y0, dtype=float), np.array(self.model.yd0, dtype=float)
+            r=self.model.res(0.0, y, yd)
+            if self.usejac and self.linear_solver=='SPGMR': self.model.jacv(0.0, y, yd, r, r, 1.0)
+            elif self.usejac: self.model.jac(1.0, 0.0, y, yd)
+            return [0.0], [y], [yd]
+    monkeypatch.setitem(sys.modules, 'assimulo', types.ModuleType('assimulo'))
+    monkeypatch.setitem(sys.modules, 'assimulo.problem', types.SimpleNamespace(Implicit_Problem=Implicit_Problem, Overdetermined_Problem=None))
+    monkeypatch.setitem(sys.modules, 'assimulo.solvers', types.SimpleNamespace(IDA=IDA, ODASSL=None))
+    s,eq,state=benchResidual.model()
+    calls=[]
+    jacv=s.jacv
+    monkeypatch.setattr(s, 'jacv', lambda *args: calls.append(args) or jacv(*args))
+    s.solveDAE(eq, state, 1.0, jac='sparse', events=False)
+    assert len(calls)==1
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Tests of the multi-section rod string and the band LU"""
+
+import pytest
+import numpy as np
+import pycodyn
+from test_pycodyn import string, bc, fr
+
+def test_band_lu():
+    # the band LU of the permuted band matrix solves as the dense solver
+    n=40
+    rng=np.random.RandomState(1)
+    A=np.diag(4.0+rng.rand(n))+np.diag(rng.rand(n-1), 1)+np.diag(rng.rand(n-2), -2)
+    p=rng.permutation(n) # equations in the random order
+    T=[(p[i],j,A[i,j]) for i,j in zip(*np.nonzero(A))]
+    lu=pycodyn.BandLU(T, n)
+    r=rng.rand(n, 3)
+    assert lu.kl+lu.ku<=6 # symmetric pattern of the band
+    rp=np.empty_like(r)
+    rp[p]=r # right sides of equations
+    assert np.abs(lu.solve(rp)-np.linalg.solve(A, r)).max()<=1e-12
+
+def test_static():
+    # the upper section holds weights of all sections and the plunger force
+    s,d=string(5)
+    assert abs(d[s.springs[0].f1]+5*(-35000.0/5)+fr)<=1e-6*abs(fr)
+
+@pytest.mark.parametrize('solver', ['dense', 'sparse'])
+def test_solvers(solver):
+    # banded, dense and sparse steps of the long string give the same results
+    s,d=string(30)
+    T,R=s.solveDyn(d, 2.0, bc(s), 'linear')
+    assert s.lin.lu.kl+s.lin.lu.ku<=30<len(s.vrsc)/10 # narrow band
+    s2,d2=string(30)
+    s2.solver=solver
+    T2,R2=s2.solveDyn(d2, 2.0, bc(s2), 'linear')
+    assert np.abs(R.data-R2.data).max()<=1e-9*np.abs(R.data).max()
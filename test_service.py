@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Tests of the simulation service of dynamometer cards"""
+
+import asyncio
+import pytest
+import numpy as np
+import service
+
+section=[114926.0, 5458.0, 2112.0, -18494.0]
+
+def test_request():
+    # default values and the topology of the request
+    r,key=service.request({'sections': [section]*2, 'spm': 8})
+    assert key==(2, 0.1) and r['spm']==8.0 and r['periods']==2
+    for bad in ({}, {'sections': [[1.0, 2.0]]}, {'sections': [section], 'dt': 0}):
+        with pytest.raises(ValueError): service.request(bad)
+
+def test_model(monkeypatch):
+    # requests of one topology are solved together, the LRU keeps maxModels compiled models
+    monkeypatch.setattr(service, 'models', service.OrderedDict())
+    monkeypatch.setattr(service, 'maxModels', 1)
+    reqs=[service.request({'sections': [section], 'stroke': a})[0] for a in (2.1, 1.0)]
+    c1,c2=service.runBatch((1, 0.1), reqs)
+    assert c1['batch']==2 and len(c1['t'])==94 and c1['t'][0]>60/6.4-0.1
+    assert max(c1['x'])==pytest.approx(1.05, rel=1e-2) and max(c2['x'])==pytest.approx(0.5, rel=1e-2)
+    c,=service.runBatch((1, 0.1), reqs[:1])
+    assert c['batch']==1 and np.allclose(c['f'], c1['f'])
+    service.model((2, 0.1))
+    assert list(service.models)==[(2, 0.1)]
+
+def test_service():
+    # concurrent requests are batched, the HTTP server returns cards and errors
+    async def run():
+        svc=service.Service(workers=1, window=0.2)
+        try:
+            cards=await asyncio.gather(*[svc.card({'sections': [section], 'stroke': a}) for a in (2.1, 1.5, 1.0)])
+            server=await asyncio.start_server(svc.handle, '127.0.0.1', 0)
+            port=server.sockets[0].getsockname()[1]
+            loop=asyncio.get_running_loop()
+            card=await loop.run_in_executor(None, lambda: service.post({'sections': [section]}, port=port))
+            bad=await loop.run_in_executor(None, lambda: service.post({'sections': []}, port=port))
+            stats=await loop.run_in_executor(None, lambda: service.post(None, '/stats', port=port, method='GET'))
+            server.close()
+            return cards, card, bad, stats
+        finally:
+            svc.pool.shutdown()
+    cards,card,bad,stats=asyncio.run(run())
+    assert [c['batch'] for c in cards]==[3, 3, 3] and card['f']==cards[0]['f']
+    assert 'error' in bad and stats['requests']==2 and stats['errors']==1 and stats['batches']==2
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Tests of the streaming of results by chunks (System.iterDyn, sinks)"""
+
+import numpy as np
+import sinks
+from test_pycodyn import string, bc
+
+def test_stream(tmp_path):
+    # chunks of iterDyn are the results of solveDyn, sinks write the same rows
+    s,d=string(2)
+    T,R=s.solveDyn(d, 5.0, bc(s))
+    v=s.masses[-1].v
+    chunks=list(s.iterDyn(d, 5.0, bc(s), chunk=16, every=2, tStart=1.0))
+    assert [len(c[0]) for c in chunks]==[16, 4]
+    assert np.abs(np.concatenate([c[1][v] for c in chunks])-R[T>=1.0-1e-9][v][::2]).max()<=1e-12
+    p=str(tmp_path)
+    out=[sinks.CsvSink(p+'/r.csv', [v]), sinks.NpySink(p+'/r.npy', [v]),
+         sinks.NpzSink(p+'/r.npz', [v]), sinks.MemmapSink(p+'/m.npy', 100, [v])]
+    assert sinks.stream(s.iterDyn(d, 5.0, bc(s), chunk=16), out)==50
+    a=np.column_stack([T, R[v]])
+    assert np.abs(np.loadtxt(p+'/r.csv', delimiter=';', skiprows=1)-a).max()<=1e-8*np.abs(a).max()
+    assert (np.load(p+'/r.npy')==a).all()
+    z=np.load(p+'/r.npz')
+    assert (z['data']==a).all() and list(z['names'])==['t', repr(v)]
+    m=np.load(p+'/m.npy')
+    assert (m[:50]==a).all() and np.isnan(m[50:]).all()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Tests of the compiled static problems"""
+
+import pytest
+import numpy as np
+from sympy import symbols, Eq, tanh
+import statics
+
+def test_linear():
+    # the linear problem is factored once, aliases are restored in the solution
+    x,y,z,a,b=symbols('x y z a b')
+    st=statics.Static([Eq(x+y, a), Eq(x-y, b), Eq(z, -x)], [a, b])
+    assert st.lin is not None
+    for av,bv in ((1.0, 0.0), (3.0, 1.0)):
+        d=st({a: av, b: bv})
+        assert d[x]==pytest.approx((av+bv)/2) and d[y]==pytest.approx((av-bv)/2) and d[z]==pytest.approx(-d[x])
+    with pytest.raises(ValueError):
+        statics.Static([Eq(x+y, a)], [a])
+
+def test_nonlinear():
+    # Newton method with the analytic Jacobian, warm start from the previous solution
+    x,y,f=symbols('x y f')
+    st=statics.Static([Eq(1000*x+50*tanh(x/0.01), f), Eq(y, x**2)], [f])
+    assert st.lin is None
+    for fv in (10.0, 100.0, -20.0):
+        d=st({f: fv})
+        assert 1000*d[x]+50*np.tanh(d[x]/0.01)==pytest.approx(fv) and d[y]==pytest.approx(d[x]**2)
+    assert st.x[0]==d[x]
+
+def test_system_static():
+    # the static problem of the string is compiled once for its inputs
+    import rodString
+    s=rodString.RodString([(1e5, 5e3, 4000.0, -35000.0)]*2)
+    ics=s.staticICs(-18499.0)
+    d=s.solve(ics)
+    ics[s.plunger]=0.0
+    d2=s.solve(ics)
+    assert len(s.statics)==1
+    k=1/1e5+1/1e5 # flexibility of the string
+    assert d[s.masses[-1].x]-d2[s.masses[-1].x]==pytest.approx(-18499.0*k)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Tests of the structural analysis (matching, BLT, band order)"""
+
+import pytest
+from sympy import symbols, Eq
+import structure
+
+def test_blt():
+    # blocks are emitted in the order of solution, the algebraic loop is one block
+    x,y,z,u=symbols('x y z u')
+    eqs=[Eq(u, y*z), Eq(y+z, x), Eq(x, 1), Eq(y-z, 2)]
+    blocks=structure.blt(eqs, [u,x,y,z])
+    assert [sorted(map(str, bv)) for be,bv in blocks]==[['x'], ['y','z'], ['u']]
+    known=set()
+    for be,bv in blocks: # each block uses only known variables and its own
+        assert all(s in known|set(bv) for e in be for s in e.free_symbols)
+        known|=set(bv)
+    with pytest.raises(ValueError):
+        structure.blt([Eq(x, 1), Eq(x, 2), Eq(y, z)], [x,y,z])
+
+def test_matching():
+    # augmenting paths find the perfect matching after the bad initial matching
+    inc=[[0,1], [0], [1,2]]
+    me,mv=structure.matching(inc, 3)
+    assert me==[1,0,2] and mv==[1,0,2]
+
+def test_band_order():
+    # the chain numbered randomly gets the bandwidth 1
+    p=[5,2,7,0,3,6,1,4]
+    graph=[[] for i in p]
+    for a,b in zip(p, p[1:]): graph[a].append(b); graph[b].append(a)
+    q=structure.bandOrder(graph)
+    pos=dict([(v,i) for i,v in enumerate(q)])
+    assert sorted(q)==list(range(8)) and max([abs(pos[a]-pos[b]) for a,b in zip(p, p[1:])])==1
@@ -9,8 +9,8 @@ class Mass(Translational1D):
         Translational1D.__init__(self, name, locals()) # виклик конструктора базового класу
         
         self.eqs=[Eq(self.m*self.a, self.f1+self.f2),
-                  Eq((self.a+self.ap)/2, (self.v-self.vp)/dt),
-                  Eq((self.v+self.vp)/2, (self.x-self.xp)/dt)] # система рівнянь
+                  Eq((self.a+self.ap)/2, (self.v-self.vp)/DT),
+                  Eq((self.v+self.vp)/2, (self.x-self.xp)/DT)] # система рівнянь
         self.pins=[dict(x=self.x, xp=self.xp, f=self.f1),
                    dict(x=self.x, xp=self.xp, f=self.f2)] # два фланця
 
@@ -20,8 +20,8 @@ class SpringDamper(Translational1D):
         
         self.eqs=[Eq(self.c*(self.x2-self.x1)+self.d*self.vrel, self.f2),
                   Eq(-self.f2, self.f1),
-                  Eq((self.v1+self.v1p)/2, (self.x1-self.x1p)/dt),
-                  Eq((self.v2+self.v2p)/2, (self.x2-self.x2p)/dt),
+                  Eq((self.v1+self.v1p)/2, (self.x1-self.x1p)/DT),
+                  Eq((self.v2+self.v2p)/2, (self.x2-self.x2p)/DT),
                   Eq(self.vrel, self.v2-self.v1)] # система рівнянь
         
         self.pins=[dict(x=self.x1, xp=self.x1p, f=self.f1),